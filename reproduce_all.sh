@@ -3,6 +3,23 @@
 # Directory containing the plotting scripts
 SCRIPT_DIR="./scripts"
 
+# PAM_STRICT=1: missing inputs and plotting errors fail the script, and the
+# run stops at the first failing script
+STRICT="${PAM_STRICT:-0}"
+export PAM_STRICT="$STRICT"
+
+# Per-run log directory, so concurrent runs (e.g. dataset variants selected
+# with PAM_PKL_DIR / PAM_PLOTS_DIR) never write to the same file
+LOG_DIR=$(mktemp -d "${TMPDIR:-/tmp}/pam_reproduce.XXXXXX") || exit 1
+
+# The scripts run from $SCRIPT_DIR, so make relative roots absolute first
+for var in PAM_PKL_DIR PAM_PLOTS_DIR PAM_LOGS_DIR; do
+    case "${!var}" in
+        ""|/*) ;;
+        *) export "$var=$PWD/${!var}" ;;
+    esac
+done
+
 echo "=== Reproducing all Python scripts under $SCRIPT_DIR ==="
 
 # Enter scripts directory
@@ -11,24 +28,37 @@ cd "$SCRIPT_DIR" || {
     exit 1
 }
 
+FAILED=()
+
 # Run every Python script
 for script in *.py; do
     echo "----------------------------------------"
     echo "📄 Running: $script"
     echo "----------------------------------------"
 
-    python3 "$script" 2>&1 | tee /tmp/pam_reproduce_log.txt
+    LOG_FILE="$LOG_DIR/${script%.py}.log"
+    python3 "$script" 2>&1 | tee "$LOG_FILE"
     STATUS=${PIPESTATUS[0]}
 
     # Surface lines mentioning saved outputs
-    grep -iE 'saving to|saved at|\.pdf' /tmp/pam_reproduce_log.txt | sed 's/^/💾 /'
+    grep -iE 'saving to|saved at|\.pdf' "$LOG_FILE" | sed 's/^/💾 /'
 
     if [ $STATUS -eq 0 ]; then
         echo "✅ $script ran successfully"
     else
         echo "❌ $script failed with exit code $STATUS"
+        FAILED+=("$script")
+        if [ "$STRICT" = "1" ]; then
+            echo "Strict mode: stopping after the first failure"
+            break
+        fi
     fi
 done
 
 echo "=== Done running all scripts ==="
+echo "Logs: $LOG_DIR"
 
+if [ ${#FAILED[@]} -gt 0 ]; then
+    echo "❌ ${#FAILED[@]} script(s) failed: ${FAILED[*]}"
+    exit 1
+fi
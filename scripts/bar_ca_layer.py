@@ -3,9 +3,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import logging
-import pickle
 import matplotlib
 
+from common.cube import ca_layer_counts, cube_path, load_cube
+from common.data import LINK_DIRECTIONS, input_exists, load_bands
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.report import log_report, missing_input, record_failure, record_input_failure
+from common.schema import SchemaError
+from common.summary import count_rows, default_stats_format, write_summary
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -33,9 +42,11 @@ DATA_TYPE_CONFIG = {
     'filename_prefix': 'bar_ca_layers'
 }
 
-def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band_type='mmWave', plot_mode='values', integrity_suffix=""):
+def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band_type='mmWave', plot_mode='values', integrity_suffix="", stats_format=None):
     """
-    Plot bar charts for CA data showing layer distribution across different CA types
+    Plot bar charts for CA data showing layer distribution across different CA types.
+    With stats_format ('csv' or 'parquet') the layer counts and percentages of
+    every figure are written next to it.
     """
     try:
         if data_type != 'LAYERS':
@@ -45,49 +56,40 @@ def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band
         config = DATA_TYPE_CONFIG
         plot_mode = 'values'
         
-        if band_type == 'mmWave':
-            target_operators = ['ATT', 'Verizon']
-        else:
-            target_operators = ['ATT', 'TMobile', 'Verizon']
+        operator_index = load_operator_index()
         
-        for operator in target_operators:
-            ca_data = all_ca_stats.get(operator, {})
-            if not ca_data:
-                logger.warning(f"{operator} has no {band_type} data, skipping")
-                continue
-            
-            available_ca_types = []
+        def has_data(ca_data, ca_type):
+            if 'counts' in ca_data[ca_type]:
+                return sum(ca_data[ca_type]['counts'].values()) > 0
+            return len(ca_data[ca_type]['values']) > 0
+        
+        for operator, available_ca_types in operator_index.plan_ca_groups(all_ca_stats, band_type, has_data):
+            ca_data = all_ca_stats[operator]
             ca_layer_stats = {}
             
-            for ca_type in ['NonCA', '2CA', '3CA', '4CA', '5CA', '6CA', '7CA', '8CA']:
-                if ca_type in ca_data and len(ca_data[ca_type]['values']) > 0:
-                    layer_values = ca_data[ca_type]['values']
-                    
-                    layer_counts = {}
+            for ca_type in available_ca_types:
+                layer_counts = {}
+                if 'counts' in ca_data[ca_type]:
+                    # Pre-counted layers (CA x MIMO count cube)
+                    for layer_value, count in ca_data[ca_type]['counts'].items():
+                        layer_key = f'{int(layer_value)} Layer'
+                        layer_counts[layer_key] = layer_counts.get(layer_key, 0) + count
+                    total_count = sum(layer_counts.values())
+                else:
+                    layer_values = np.asarray(ca_data[ca_type]['values'])
                     total_count = len(layer_values)
-                    
-                    for layer_value in layer_values:
+
+                    for layer_value, count in zip(*np.unique(layer_values, return_counts=True)):
                         layer_key = f'{int(layer_value)} Layer'
-                        layer_counts[layer_key] = layer_counts.get(layer_key, 0) + 1
-                    
-                    layer_percentages = {layer: (count/total_count)*100 for layer, count in layer_counts.items()}
-                    
-                    ca_layer_stats[ca_type] = {
-                        'percentages': layer_percentages,
-                        'total_count': total_count
-                    }
-                    available_ca_types.append(ca_type)
-            
-            if band_type == 'mmWave':
-                if operator == 'ATT':
-                    allowed_types = {'NonCA', '4CA', '8CA'}
-                    available_ca_types = [ct for ct in available_ca_types if ct in allowed_types]
-                elif operator == 'Verizon':
-                    allowed_types = {'NonCA', '4CA', '6CA', '8CA'}
-                    available_ca_types = [ct for ct in available_ca_types if ct in allowed_types]
-            
-            if not available_ca_types:
-                continue
+                        layer_counts[layer_key] = layer_counts.get(layer_key, 0) + int(count)
+                
+                layer_percentages = {layer: (count/total_count)*100 for layer, count in layer_counts.items()}
+                
+                ca_layer_stats[ca_type] = {
+                    'percentages': layer_percentages,
+                    'counts': layer_counts,
+                    'total_count': total_count
+                }
             
             fig, ax = plt.subplots(figsize=(8, 7))
             
@@ -125,9 +127,8 @@ def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band
                 bottom = [b + v for b, v in zip(bottom, values)]
             
             x_labels = []
-            ca_to_num = {'NonCA': '1', '2CA': '2', '3CA': '3', '4CA': '4', '5CA': '5', '6CA': '6', '7CA': '7', '8CA': '8'}
             for ca_type in available_ca_types:
-                x_labels.append(ca_to_num.get(ca_type, ca_type))
+                x_labels.append(operator_index.ca_to_num.get(ca_type, ca_type))
             
             ax.set_xticks(x)
             ax.set_xticklabels(x_labels)
@@ -156,14 +157,18 @@ def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band
                 ax.set_ylim(0, 126)
                 plt.yticks(range(0, 101, 20))
             
-            plt.tight_layout()
+            tight_layout()
             
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            plots_dir = os.path.join(current_dir, '..', 'plots')
+            plots_dir = plots_root()
             os.makedirs(plots_dir, exist_ok=True)
             
             filename = f'bar_ca_layers_{band_type}_{operator}_{link_direction.lower()}'
-            plt.savefig(os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf'), dpi=300, bbox_inches='tight')
+            save_path = os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf')
+            save_figure(save_path, dpi=300, bbox_inches='tight')
+            if stats_format:
+                layer_counts_by_ca = {ca_type: ca_layer_stats[ca_type]['counts'] for ca_type in available_ca_types}
+                write_summary(count_rows(layer_counts_by_ca, 'ca_type', 'layer', band=band_type, operator=operator),
+                              save_path, stats_format)
             
             plt.close()
             logger.info(f"Saved plot: {filename}{integrity_suffix}.pdf")
@@ -172,44 +177,50 @@ def plot_bar_ca_data(all_ca_stats, data_type='LAYERS', link_direction='DL', band
         logger.error(f"An error occurred during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'bar_ca_layers_{band_type}_{link_direction.lower()}', e)
 
-def main():
-    integrity_suffix = "_with_integrity"
+def main(stats_format=None):
+    stats_format = stats_format or default_stats_format()
+    integrity_suffix = figure_suffix()
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+    pkl_dir = pkl_root()
     
-    pkl_filename = os.path.join(pkl_dir, 'bar_ca_layer_dl.pkl')
-    if not os.path.exists(pkl_filename):
-        logger.warning(f"Pickle file not found: {pkl_filename}")
-        return
-
-    with open(pkl_filename, 'rb') as f:
-        pkl_data = pickle.load(f)
-        
-    all_ca_stats_low = pkl_data['Low']
-    all_ca_stats_mid = pkl_data['Mid']
-    all_ca_stats_mmwave = pkl_data['mmWave']
+    cube_filename = cube_path(pkl_dir)
+    cube = load_cube(cube_filename) if cube_filename else None
     
-    band_stats = [
-        (all_ca_stats_low, 'Low'),
-        (all_ca_stats_mid, 'Mid'), 
-        (all_ca_stats_mmwave, 'mmWave')
-    ]
-    
-    for stats, band_type in band_stats:
-        if stats:
-            logger.info(f"Plotting {band_type} band DL LAYERS...")
-            plot_bar_ca_data(
-                stats,
-                data_type='LAYERS',
-                link_direction='DL',
-                band_type=band_type,
-                plot_mode='values',
-                integrity_suffix=integrity_suffix
-            )
+    for link_direction in LINK_DIRECTIONS:
+        pkl_filename = os.path.join(pkl_dir, f'bar_ca_layer_{link_direction.lower()}.pkl')
+        if cube is not None:
+            # Layer counts per CA type from the CA x MIMO count cube
+            pkl_data = ca_layer_counts(cube, load_operator_index().band_class, link_direction)
+        elif input_exists(pkl_filename):
+            # One band in memory at a time (with partitioned pickles)
+            pkl_data = load_bands(pkl_filename)
+        else:
+            if link_direction == 'DL':
+                missing_input(pkl_filename)
+            continue
+        
+        try:
+            for band_type in ('Low', 'Mid', 'mmWave'):
+                if pkl_data.get(band_type):
+                    logger.info(f"Plotting {band_type} band {link_direction} LAYERS...")
+                    plot_bar_ca_data(
+                        pkl_data[band_type],
+                        data_type='LAYERS',
+                        link_direction=link_direction,
+                        band_type=band_type,
+                        plot_mode='values',
+                        integrity_suffix=integrity_suffix,
+                        stats_format=stats_format
+                    )
+                if cube is None:
+                    pkl_data.release(band_type)
+        except SchemaError as e:
+            record_input_failure(pkl_filename, e)
             
     logger.info("Plotting completed.")
+    log_report()
 
 if __name__ == "__main__":
     main()
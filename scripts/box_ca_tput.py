@@ -4,9 +4,20 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import logging
-import pickle
 import matplotlib
 
+from common.bootstrap import bootstrap_groups, draw_ci
+from common.boxes import draw_boxes, side_by_side
+from common.columns import MCS_COL, RSRP_COL, CQI_COL, BANDWIDTH_COL, LAYERS_COL
+from common.data import direction_pickles, load_bands
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.report import log_report, record_failure, record_input_failure
+from common.schema import SchemaError
+from common.summary import box_summary, default_stats_format, write_summary
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,44 +48,48 @@ DATA_TYPE_CONFIGS = {
     },
     'MCS': {
         'use_tca_tt': False,  # Use direct values for other metrics
-        'data_col': 'Layer1 DL MCS (Avg)',
+        'data_col': MCS_COL,
         'ylabel': 'MCS',
         'title_suffix': 'MCS',
         'filename_prefix': 'box_ca_mcs'
     },
     'RSRP': {
         'use_tca_tt': False,
-        'data_col': 'RF Serving SS-RSRP [dBm]',
+        'data_col': RSRP_COL,
         'ylabel': 'RSRP (dBm)',
         'title_suffix': 'RSRP',
         'filename_prefix': 'box_ca_rsrp'
     },
     'CQI': {
         'use_tca_tt': False,
-        'data_col': 'RF CQI',
+        'data_col': CQI_COL,
         'ylabel': 'CQI',
         'title_suffix': 'CQI',
         'filename_prefix': 'box_ca_cqi'
     },
     'BANDWIDTH': {
         'use_tca_tt': False,
-        'data_col': 'RF BandWidth',
+        'data_col': BANDWIDTH_COL,
         'ylabel': 'Bandwidth (MHz)',
         'title_suffix': 'Bandwidth',
         'filename_prefix': 'box_ca_bandwidth'
     },
     'LAYERS': {
         'use_tca_tt': False,
-        'data_col': 'Layer1 DL Layer Num (Mode)',
+        'data_col': LAYERS_COL,
         'ylabel': 'MIMO Layers',
         'title_suffix': 'MIMO Layers',
         'filename_prefix': 'box_ca_layers'
     }
 }
 
-def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_type='mmWave', plot_mode='Tca', integrity_suffix=""):
+def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_type='mmWave', plot_mode='Tca', integrity_suffix="", stats_format=None,
+                     ci_overlay=None, ci_statistic='median', n_resamples=10000):
     """
-    Plot box charts for CA data across different CA types
+    Plot box charts for CA data across different CA types.
+    With stats_format ('csv' or 'parquet') the box statistics of every figure
+    are written next to it. ci_overlay ('errorbar' or 'notch') adds bootstrap
+    CIs of ci_statistic ('median' or 'mean') to every box.
     """
     try:
         # Get data type configuration
@@ -85,59 +100,45 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
         if not use_tca_tt:
             plot_mode = 'values'
         
-        # Define which operators to plot for each band type
-        if band_type == 'mmWave':
-            # Only ATT and Verizon have mmWave data
-            target_operators = ['ATT', 'Verizon']
-        else:
-            # All operators have Low/Mid band data
-            target_operators = ['ATT', 'TMobile', 'Verizon']
+        if ci_overlay == 'notch' and ci_statistic != 'median':
+            raise ValueError("Notches can only show median CIs")
         
-        # Create separate charts for each target operator
-        for operator in target_operators:
-            ca_data = all_ca_stats.get(operator, {})
-            
-            if not ca_data:
-                logger.warning(f"{operator} has no {band_type} data, skipping")
-                continue
-            
-            # Get all available CA types with data
-            available_ca_types = []
-            for ca_type in ['NonCA', '2CA', '3CA', '4CA', '5CA', '6CA', '7CA', '8CA']:
-                if ca_type in ca_data:
-                    if use_tca_tt:
-                        # TPUT data with Tca/Tt structure
-                        if plot_mode == 'Tca' and len(ca_data[ca_type]['Tca']) > 0:
-                            available_ca_types.append(ca_type)
-                        elif plot_mode == 'Tt' and len(ca_data[ca_type]['Tt']) > 0:
-                            available_ca_types.append(ca_type)
-                        elif plot_mode == 'Tca_vs_Tt' and (len(ca_data[ca_type]['Tca']) > 0 or len(ca_data[ca_type]['Tt']) > 0):
-                            available_ca_types.append(ca_type)
-                    else:
-                        # Other data types with 'values' structure
-                        if plot_mode == 'values' and len(ca_data[ca_type]['values']) > 0:
-                            available_ca_types.append(ca_type)
-            
-            # Apply operator-specific CA filters for mmWave plotting only
-            if band_type == 'mmWave':
-                if operator == 'ATT':
-                    allowed_types = {'NonCA', '4CA', '8CA'}
-                    available_ca_types = [ct for ct in available_ca_types if ct in allowed_types]
-                elif operator == 'Verizon':
-                    allowed_types = {'NonCA', '4CA', '6CA', '8CA'}
-                    available_ca_types = [ct for ct in available_ca_types if ct in allowed_types]
+        # Resolve operators and their plottable CA types (including the
+        # operator-specific CA filters from operators.toml) before creating any figure
+        def has_data(ca_data, ca_type):
+            if use_tca_tt:
+                # TPUT data with Tca/Tt structure
+                if plot_mode == 'Tca_vs_Tt':
+                    return len(ca_data[ca_type]['Tca']) > 0 or len(ca_data[ca_type]['Tt']) > 0
+                return len(ca_data[ca_type][plot_mode]) > 0
+            # Other data types with 'values' structure
+            return len(ca_data[ca_type]['values']) > 0
+        
+        operator_index = load_operator_index()
+        ca_to_num = operator_index.ca_to_num
+        
+        # Create separate charts for each operator with data
+        for operator, available_ca_types in operator_index.plan_ca_groups(all_ca_stats, band_type, has_data):
+            ca_data = all_ca_stats[operator]
             
-            if not available_ca_types:
-                logger.warning(f"{operator} has no valid {band_type} data for {plot_mode}, skipping")
-                continue
+            # Bootstrap every box of this figure in one batch across the process pool
+            cis = {}
+            if ci_overlay:
+                series = ['Tca', 'Tt'] if plot_mode == 'Tca_vs_Tt' else [plot_mode]
+                groups = {(ca_type, s): ca_data[ca_type][s] for ca_type in available_ca_types
+                          for s in series if len(ca_data[ca_type][s]) > 0}
+                cis = bootstrap_groups(groups, ci_statistic, n_resamples)
             
             # Create new chart
             fig, ax = plt.subplots(figsize=(8, 7))
+            summary_rows = []
+            box_labels = []
             
             # Prepare data for plotting
             plot_data = []
             plot_labels = []
             plot_positions = []
+            plot_cis = []
             
             if plot_mode in ['Tca', 'Tt', 'values']:
                 # Single data type plotting
@@ -145,49 +146,28 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
                     data = ca_data[ca_type][plot_mode]
                     if len(data) > 0:
                         plot_data.append(data)
+                        if ci_overlay:
+                            plot_cis.append(cis[(ca_type, plot_mode)])
+                        box_labels.append((cis.get((ca_type, plot_mode)), {'band': band_type, 'operator': operator, 'ca_type': ca_type, 'series': plot_mode}))
                         # Map CA label to numeric CC count for x-axis label
-                        ca_to_num = {'NonCA': '1', '2CA': '2', '3CA': '3', '4CA': '4', '5CA': '5', '6CA': '6', '7CA': '7', '8CA': '8'}
                         plot_labels.append(ca_to_num.get(ca_type, ca_type))
                         plot_positions.append(i + 1)
                 
                 # Create box plot
                 if plot_data:
-                    bp = ax.boxplot(plot_data, positions=plot_positions, labels=plot_labels,
-                                   patch_artist=True, showfliers=True, widths=0.5)
-                    
-                    # Customize box plot colors and line styles
-                    uniform_color = 'lightblue'  # Single color for all boxes in single mode
-                    for patch in bp['boxes']:
-                        patch.set_facecolor(uniform_color)
-                        patch.set_alpha(0.7)
-                        patch.set_linewidth(4)  # Make box outline thicker
-                    
-                    # Customize median lines (make them red and thicker)
-                    for median in bp['medians']:
-                        median.set_color('orange')
-                        median.set_linewidth(5)
-                    
-                    # Customize whiskers (make them thicker)
-                    for whisker in bp['whiskers']:
-                        whisker.set_linewidth(4)
-                    
-                    # Customize caps (make them thicker)
-                    for cap in bp['caps']:
-                        cap.set_linewidth(4)
-                    
-                    # Customize outlier markers
-                    for flier in bp['fliers']:
-                        flier.set_markeredgewidth(3)
+                    # Single color for all boxes in single mode
+                    _, stats = draw_boxes(ax, plot_data, plot_positions, labels=plot_labels,
+                                          notch_cis=plot_cis if ci_overlay == 'notch' else None)
+                    summary_rows = [box_summary(box, ci, **labels) for box, (ci, labels) in zip(stats, box_labels)]
+                    if ci_overlay == 'errorbar':
+                        draw_ci(ax, plot_positions, plot_cis)
             
             elif plot_mode == 'Tca_vs_Tt':
                 # Comparison plotting with paired boxes
-                position = 1
-                xtick_positions = []
-                xtick_labels = []
-                
-                # Define consistent colors for Tca vs Tt comparison
-                tca_color = 'lightblue'      # Uniform color for all Tca boxes
-                tt_color = 'lightcoral'     # Uniform color for all Tt boxes
+                series_colors = {
+                    'Tca': 'lightblue',   # Uniform color for all Tca boxes
+                    'Tt': 'lightcoral',   # Uniform color for all Tt boxes
+                }
                 
                 # Adjust spacing and width based on number of CA types
                 num_ca_types = len(available_ca_types)
@@ -201,64 +181,37 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
                     box_width = 0.28
                     spacing = 0.35
                 
-                for ca_type in available_ca_types:
-                    tca_data = ca_data[ca_type]['Tca']
-                    tt_data = ca_data[ca_type]['Tt']
-                    
-                    # Plot Tca box if data exists
-                    if len(tca_data) > 0:
-                        bp1 = ax.boxplot([tca_data], positions=[position], widths=box_width,
-                                        patch_artist=True, showfliers=True)
-                        bp1['boxes'][0].set_facecolor(tca_color)
-                        bp1['boxes'][0].set_alpha(0.7)
-                        bp1['boxes'][0].set_linewidth(4)  # Make box outline thicker
-                        
-                        # Customize Tca box elements
-                        bp1['medians'][0].set_color('orange')
-                        bp1['medians'][0].set_linewidth(5)
-                        for whisker in bp1['whiskers']:
-                            whisker.set_linewidth(4)
-                        for cap in bp1['caps']:
-                            cap.set_linewidth(4)
-                        for flier in bp1['fliers']:
-                            flier.set_markeredgewidth(3)
-                    
-                    # Plot Tt box if data exists
-                    if len(tt_data) > 0:
-                        bp3 = ax.boxplot([tt_data], positions=[position + spacing], widths=box_width,
-                                        patch_artist=True, showfliers=True)
-                        bp3['boxes'][0].set_facecolor(tt_color)
-                        bp3['boxes'][0].set_alpha(0.7)
-                        bp3['boxes'][0].set_linewidth(4)  # Make box outline thicker
-                        
-                        # Customize Tt box elements
-                        bp3['medians'][0].set_color('orange')
-                        bp3['medians'][0].set_linewidth(5)
-                        for whisker in bp3['whiskers']:
-                            whisker.set_linewidth(4)
-                        for cap in bp3['caps']:
-                            cap.set_linewidth(4)
-                        for flier in bp3['fliers']:
-                            flier.set_markeredgewidth(3)
-                    
-                    # Store position and label for x-axis
-                    xtick_positions.append(position + spacing/2)  # Center between Tca and Tt
-                    
-                    # Map CA label to numeric CC count for x-axis label
-                    ca_to_num = {'NonCA': '1', '2CA': '2', '3CA': '3', '4CA': '4', '5CA': '5', '6CA': '6', '7CA': '7', '8CA': '8'}
-                    xtick_labels.append(ca_to_num.get(ca_type, ca_type))
-                    
-                    # Adjust position increment based on spacing to avoid overlap
-                    position += spacing + 0.6  # Add extra space between CA type groups
+                # Tca and Tt side by side for every CA type, extra space between CA type groups
+                group_positions, xtick_positions = side_by_side(num_ca_types, len(series_colors), spacing)
+                plot_colors = []
+                for ca_type, positions in zip(available_ca_types, group_positions):
+                    for series, position in zip(series_colors, positions):
+                        values = ca_data[ca_type][series]
+                        # Plot the box if data exists
+                        if len(values) > 0:
+                            box_labels.append((cis.get((ca_type, series)), {'band': band_type, 'operator': operator, 'ca_type': ca_type, 'series': series}))
+                            plot_data.append(values)
+                            plot_positions.append(position)
+                            plot_colors.append(series_colors[series])
+                            if ci_overlay:
+                                plot_cis.append(cis[(ca_type, series)])
                 
-                # Set custom x-axis ticks and labels
+                # All Tca and Tt boxes in one call
+                _, stats = draw_boxes(ax, plot_data, plot_positions, widths=box_width, colors=plot_colors,
+                                      notch_cis=plot_cis if ci_overlay == 'notch' else None)
+                summary_rows = [box_summary(box, ci, **labels) for box, (ci, labels) in zip(stats, box_labels)]
+                if ci_overlay == 'errorbar':
+                    draw_ci(ax, plot_positions, plot_cis, box_width)
+                
+                # Set custom x-axis ticks and labels, centred between Tca and Tt;
+                # map CA label to numeric CC count for x-axis label
                 ax.set_xticks(xtick_positions)
-                ax.set_xticklabels(xtick_labels)
+                ax.set_xticklabels([ca_to_num.get(ca_type, ca_type) for ca_type in available_ca_types])
                 
                 # Add legend for Tca vs Tt
                 from matplotlib.patches import Patch
-                legend_elements = [Patch(facecolor=tca_color, alpha=0.7, label=r'T$_{CA}$'),
-                                  Patch(facecolor=tt_color, alpha=0.7, label=r'T$_{TOTAL}$')]
+                legend_elements = [Patch(facecolor=series_colors['Tca'], alpha=0.7, label=r'T$_{CA}$'),
+                                  Patch(facecolor=series_colors['Tt'], alpha=0.7, label=r'T$_{TOTAL}$')]
                 ax.legend(handles=legend_elements, loc='upper left')
             
             # Set chart title and labels
@@ -285,11 +238,10 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
             ax.grid(True, alpha=0.3)
             
             # Adjust layout to prevent label cutoff
-            plt.tight_layout()
+            tight_layout()
             
-            # Create save directory (relative to this script)
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            plots_dir = os.path.join(current_dir, '..', 'plots')
+            # Create save directory (plots/ unless PAM_PLOTS_DIR is set)
+            plots_dir = plots_root()
             os.makedirs(plots_dir, exist_ok=True)
             
             # Create filename using consistent format
@@ -300,8 +252,10 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
             
             # Save with appropriate suffix based on integrity filtering
             save_path = os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf')
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            save_figure(save_path, dpi=300, bbox_inches='tight')
             logger.info(f"Saved plot to {save_path}")
+            if stats_format:
+                write_summary(summary_rows, save_path, stats_format)
             
             plt.close()
         
@@ -309,8 +263,10 @@ def plot_box_ca_data(all_ca_stats, data_type='TPUT', link_direction='DL', band_t
         logger.error(f"An error occurred during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'box_ca_{data_type.lower()}_{band_type}_{link_direction.lower()}', e)
 
-def main():
+def main(data_types=None, stats_format=None, ci_overlay=None):
+    stats_format = stats_format or default_stats_format()
     # Control variables for different data types
     TPUT = 1
     MCS = 1
@@ -324,12 +280,10 @@ def main():
     Tt = 0
     Tca_vs_Tt = 1
     
-    # Default integrity suffix since we process "with_integrity" data by default
-    integrity_suffix = "_with_integrity"
+    integrity_suffix = figure_suffix()
     
     # Define directory for pkl files
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+    pkl_dir = pkl_root()
     
     data_types_to_process = []
     if TPUT == 1: data_types_to_process.append('TPUT')
@@ -339,41 +293,36 @@ def main():
     if BANDWIDTH == 1: data_types_to_process.append('BANDWIDTH')
     if LAYERS == 1: data_types_to_process.append('LAYERS')
     
+    # Restrict to the requested data types (used by tools that re-render a subset)
+    if data_types is not None:
+        data_types_to_process = [dt for dt in data_types_to_process if dt in data_types]
+    
     for data_type in data_types_to_process:
         logger.info(f"Plotting {data_type} data...")
         
-        pkl_filename = os.path.join(pkl_dir, f'box_ca_{data_type.lower()}_dl.pkl')
-        if not os.path.exists(pkl_filename):
-            logger.warning(f"Pickle file not found: {pkl_filename}")
-            continue
-            
-        with open(pkl_filename, 'rb') as f:
-            pkl_data = pickle.load(f)
+        for link_direction, pkl_filename in direction_pickles(pkl_dir, f'box_ca_{data_type.lower()}'):
+            try:
+                # One band in memory at a time (with partitioned pickles)
+                pkl_data = load_bands(pkl_filename)
             
-        all_ca_stats_low = pkl_data['Low']
-        all_ca_stats_mid = pkl_data['Mid']
-        all_ca_stats_mmwave = pkl_data['mmWave']
-        
-        # Plot the results for all three frequency bands
-        band_stats = [
-            (all_ca_stats_low, 'Low'),
-            (all_ca_stats_mid, 'Mid'), 
-            (all_ca_stats_mmwave, 'mmWave')
-        ]
-        
-        for stats, band_type in band_stats:
-            if stats:
-                if data_type == 'TPUT':
-                    if Tca == 1:
-                        plot_box_ca_data(stats, data_type, 'DL', band_type, 'Tca', integrity_suffix)
-                    if Tt == 1:
-                        plot_box_ca_data(stats, data_type, 'DL', band_type, 'Tt', integrity_suffix)
-                    if Tca_vs_Tt == 1:
-                        plot_box_ca_data(stats, data_type, 'DL', band_type, 'Tca_vs_Tt', integrity_suffix)
-                else:
-                    plot_box_ca_data(stats, data_type, 'DL', band_type, 'values', integrity_suffix)
+                # Plot the results for all three frequency bands
+                for band_type in pkl_data:
+                    if pkl_data[band_type]:
+                        if data_type == 'TPUT':
+                            if Tca == 1:
+                                plot_box_ca_data(pkl_data[band_type], data_type, link_direction, band_type, 'Tca', integrity_suffix, stats_format, ci_overlay=ci_overlay)
+                            if Tt == 1:
+                                plot_box_ca_data(pkl_data[band_type], data_type, link_direction, band_type, 'Tt', integrity_suffix, stats_format, ci_overlay=ci_overlay)
+                            if Tca_vs_Tt == 1:
+                                plot_box_ca_data(pkl_data[band_type], data_type, link_direction, band_type, 'Tca_vs_Tt', integrity_suffix, stats_format, ci_overlay=ci_overlay)
+                        else:
+                            plot_box_ca_data(pkl_data[band_type], data_type, link_direction, band_type, 'values', integrity_suffix, stats_format, ci_overlay=ci_overlay)
+                    pkl_data.release(band_type)
+            except SchemaError as e:
+                record_input_failure(pkl_filename, e)
 
     logger.info("Plotting completed.")
+    log_report()
 
 if __name__ == "__main__":
     main()
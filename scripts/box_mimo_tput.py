@@ -3,9 +3,20 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import logging
-import pickle
 import matplotlib
 
+from common.bootstrap import bootstrap_groups, draw_ci
+from common.boxes import draw_boxes
+from common.columns import TPUT_COL, MCS_COL, RSRP_COL, CQI_COL, BANDWIDTH_COL
+from common.data import direction_pickles, load_bands
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.report import log_report, record_failure, record_input_failure
+from common.schema import SchemaError
+from common.summary import box_summary, default_stats_format, write_summary
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -25,40 +36,44 @@ except Exception as e:
 
 DATA_TYPE_COLUMNS = {
     'TPUT': {
-        'data_col': 'Layer2 MAC DL Throughput [Mbps]',
+        'data_col': TPUT_COL,
         'ylabel': 'Throughput (Mbps)',
         'title_suffix': 'Throughput',
         'filename_prefix': 'box_mimo_tput'
     },
     'MCS': {
-        'data_col': 'Layer1 DL MCS (Avg)',
+        'data_col': MCS_COL,
         'ylabel': 'MCS',
         'title_suffix': 'MCS',
         'filename_prefix': 'box_mimo_mcs'
     },
     'RSRP': {
-        'data_col': 'RF Serving SS-RSRP [dBm]',
+        'data_col': RSRP_COL,
         'ylabel': 'RSRP (dBm)',
         'title_suffix': 'RSRP',
         'filename_prefix': 'box_mimo_rsrp'
     },
     'CQI': {
-        'data_col': 'RF CQI',
+        'data_col': CQI_COL,
         'ylabel': 'CQI',
         'title_suffix': 'CQI',
         'filename_prefix': 'box_mimo_cqi'
     },
     'BANDWIDTH': {
-        'data_col': 'RF BandWidth',
+        'data_col': BANDWIDTH_COL,
         'ylabel': 'Bandwidth (MHz)',
         'title_suffix': 'Bandwidth',
         'filename_prefix': 'box_mimo_bandwidth'
     }
 }
 
-def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', band_type='mmWave', integrity_suffix=""):
+def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', band_type='mmWave', integrity_suffix="", stats_format=None,
+                       ci_overlay=None, ci_statistic='median', n_resamples=10000):
     """
-    Plot box charts for MIMO layer data across different MIMO layers
+    Plot box charts for MIMO layer data across different MIMO layers.
+    With stats_format ('csv' or 'parquet') the box statistics of every figure
+    are written next to it. ci_overlay ('errorbar' or 'notch') adds bootstrap
+    CIs of ci_statistic ('median' or 'mean') to every box.
     """
     try:
         if data_type not in DATA_TYPE_COLUMNS:
@@ -66,10 +81,10 @@ def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', ba
         
         data_config = DATA_TYPE_COLUMNS[data_type]
         
-        if band_type == 'mmWave':
-            target_operators = ['ATT', 'Verizon']
-        else:
-            target_operators = ['ATT', 'TMobile', 'Verizon']
+        if ci_overlay == 'notch' and ci_statistic != 'median':
+            raise ValueError("Notches can only show median CIs")
+        
+        target_operators = load_operator_index().operators(band_type)
         
         for operator in target_operators:
             mimo_data = all_mimo_stats.get(operator, {})
@@ -86,9 +101,17 @@ def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', ba
             if not available_mimo_layers:
                 continue
             
+            # Bootstrap every box of this figure in one batch across the process pool
+            cis = {}
+            if ci_overlay:
+                cis = bootstrap_groups({layer: mimo_data[layer] for layer in available_mimo_layers},
+                                       ci_statistic, n_resamples)
+            
             fig, ax = plt.subplots(figsize=(8, 7))
             
             plot_data = []
+            summary_rows = []
+            box_labels = []
             plot_labels = []
             plot_positions = []
             
@@ -96,31 +119,19 @@ def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', ba
                 data_values = mimo_data[mimo_layer]
                 if len(data_values) > 0:
                     plot_data.append(data_values)
+                    box_labels.append((cis.get(mimo_layer), {'band': band_type, 'operator': operator, 'mimo_layer': mimo_layer}))
                     plot_labels.append(f'{mimo_layer}')
                     plot_positions.append(i + 1)
             
             if plot_data:
-                bp = ax.boxplot(plot_data, positions=plot_positions, labels=plot_labels,
-                               patch_artist=True, showfliers=True, widths=0.5)
-                
-                uniform_color = 'lightblue'
-                for patch in bp['boxes']:
-                    patch.set_facecolor(uniform_color)
-                    patch.set_alpha(0.7)
-                    patch.set_linewidth(4)
-                
-                for median in bp['medians']:
-                    median.set_color('orange')
-                    median.set_linewidth(5)
-                
-                for whisker in bp['whiskers']:
-                    whisker.set_linewidth(4)
+                plot_cis = [cis[layer] for layer in available_mimo_layers] if ci_overlay else []
+                _, stats = draw_boxes(ax, plot_data, plot_positions, labels=plot_labels,
+                                      notch_cis=plot_cis if ci_overlay == 'notch' else None)
+                # Summary rows from the statistics of the drawn boxes
+                summary_rows = [box_summary(box, ci, **labels) for box, (ci, labels) in zip(stats, box_labels)]
                 
-                for cap in bp['caps']:
-                    cap.set_linewidth(4)
-                
-                for flier in bp['fliers']:
-                    flier.set_markeredgewidth(3)
+                if ci_overlay == 'errorbar':
+                    draw_ci(ax, plot_positions, plot_cis)
             
             ax.set_xlabel('MIMO Layers')
             ax.set_ylabel(data_config['ylabel'])
@@ -135,14 +146,16 @@ def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', ba
                 plt.yticks(range(60, 101, 20))
             
             ax.grid(True, alpha=0.3)
-            plt.tight_layout()
+            tight_layout()
             
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            plots_dir = os.path.join(current_dir, '..', 'plots')
+            plots_dir = plots_root()
             os.makedirs(plots_dir, exist_ok=True)
             
             filename = f'{data_config["filename_prefix"]}_{band_type}_{operator}_{link_direction.lower()}'
-            plt.savefig(os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf'), dpi=300, bbox_inches='tight')
+            save_path = os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf')
+            save_figure(save_path, dpi=300, bbox_inches='tight')
+            if stats_format:
+                write_summary(summary_rows, save_path, stats_format)
             
             plt.close()
             logger.info(f"Saved plot: {filename}{integrity_suffix}.pdf")
@@ -151,47 +164,43 @@ def plot_box_mimo_data(all_mimo_stats, data_type='TPUT', link_direction='DL', ba
         logger.error(f"An error occurred during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'box_mimo_{data_type.lower()}_{band_type}_{link_direction.lower()}', e)
 
-def main():
-    integrity_suffix = "_with_integrity"
+def main(data_types=None, stats_format=None, ci_overlay=None):
+    stats_format = stats_format or default_stats_format()
+    integrity_suffix = figure_suffix()
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+    pkl_dir = pkl_root()
     
     data_types_to_process = ['TPUT', 'MCS', 'RSRP', 'CQI', 'BANDWIDTH']
+    if data_types is not None:
+        data_types_to_process = [dt for dt in data_types_to_process if dt in data_types]
     
     for data_type in data_types_to_process:
         logger.info(f"Plotting {data_type} data...")
         
-        pkl_filename = os.path.join(pkl_dir, f'box_mimo_{data_type.lower()}_dl.pkl')
-        if not os.path.exists(pkl_filename):
-            logger.warning(f"Pickle file not found: {pkl_filename}")
-            continue
-            
-        with open(pkl_filename, 'rb') as f:
-            pkl_data = pickle.load(f)
+        for link_direction, pkl_filename in direction_pickles(pkl_dir, f'box_mimo_{data_type.lower()}'):
+            try:
+                # One band in memory at a time (with partitioned pickles)
+                pkl_data = load_bands(pkl_filename)
             
-        all_mimo_stats_low = pkl_data['Low']
-        all_mimo_stats_mid = pkl_data['Mid']
-        all_mimo_stats_mmwave = pkl_data['mmWave']
-        
-        band_stats = [
-            (all_mimo_stats_low, 'Low'),
-            (all_mimo_stats_mid, 'Mid'), 
-            (all_mimo_stats_mmwave, 'mmWave')
-        ]
-        
-        for stats, band_type in band_stats:
-            if stats:
-                plot_box_mimo_data(
-                    stats,
-                    data_type=data_type,
-                    link_direction='DL',
-                    band_type=band_type,
-                    integrity_suffix=integrity_suffix
-                )
+                for band_type in pkl_data:
+                    if pkl_data[band_type]:
+                        plot_box_mimo_data(
+                            pkl_data[band_type],
+                            data_type=data_type,
+                            link_direction=link_direction,
+                            band_type=band_type,
+                            integrity_suffix=integrity_suffix,
+                            stats_format=stats_format,
+                            ci_overlay=ci_overlay
+                        )
+                    pkl_data.release(band_type)
+            except SchemaError as e:
+                record_input_failure(pkl_filename, e)
         
     logger.info("Plotting completed.")
+    log_report()
 
 if __name__ == "__main__":
     main()
@@ -4,9 +4,18 @@ import matplotlib.pyplot as plt
 import os
 import logging
 import re
-import pickle
 import matplotlib
 
+from common.cube import cube_path, load_cube, ca_type_distribution
+from common.data import load_counts
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import pkl_root, plots_root
+from common.report import log_report, missing_input, record_failure, record_input_failure
+from common.schema import SchemaError
+from common.summary import count_rows, default_stats_format, write_summary
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -56,10 +65,9 @@ def classify_5g_type(band, frequency):
         else: return '5G mmWave'
     return None
 
-def plot_ca_distribution(operator_data, link_direction='UL'):
+def plot_ca_distribution(operator_data, link_direction='UL', stats_format=None):
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        plots_dir = os.path.join(current_dir, '..', 'plots')
+        plots_dir = plots_root()
         os.makedirs(plots_dir, exist_ok=True)
         
         ca_colors = {
@@ -86,12 +94,14 @@ def plot_ca_distribution(operator_data, link_direction='UL'):
         else:
             ca_order = ['UL NonCA', 'UL 2CA', 'UL 3CA', 'UL 4CA', 'UL 5CA', 'UL 6CA', 'UL 7CA', 'UL 8CA']
         
+        operator_index = load_operator_index()
+        
         for operator, band_data in operator_data.items():
             if not band_data:
                 continue
             
-            if operator == 'TMobile':
-                band_data = {b: v for b, v in band_data.items() if b not in ('n66', 'n260')}
+            if operator_index.excluded_bands(operator):
+                band_data = operator_index.filter_bands(operator, band_data)
                 if not band_data:
                     continue
                 
@@ -165,12 +175,10 @@ def plot_ca_distribution(operator_data, link_direction='UL'):
             legend_handles = [handles[i] for i, _ in enumerate(legend_labels)]
             clean_legend_labels = [cc_label_map.get(label, label) for label in legend_labels]
             
-            if operator == 'ATT':
-                filtered_legend_data = [(handle, label) for handle, label in zip(legend_handles, clean_legend_labels) 
-                                      if label in ['1CC', '2CC', '3CC', '4CC']]
-            elif operator == 'Verizon':
+            legend_ccs = operator_index.legend_ccs(operator)
+            if legend_ccs is not None:
                 filtered_legend_data = [(handle, label) for handle, label in zip(legend_handles, clean_legend_labels) 
-                                      if label in ['5CC', '6CC', '7CC', '8CC']]
+                                      if label in legend_ccs]
             else:
                 filtered_legend_data = list(zip(legend_handles, clean_legend_labels))
             
@@ -184,9 +192,13 @@ def plot_ca_distribution(operator_data, link_direction='UL'):
                     ncol=legend_ncol,
                     borderaxespad=0.2,
                 )
-            plt.tight_layout()
+            tight_layout()
             
-            plt.savefig(os.path.join(plots_dir, f'bar_ca_type_distribution_{operator}_{link_direction.lower()}.pdf'), bbox_inches='tight', dpi=300)
+            save_path = os.path.join(plots_dir, f'bar_ca_type_distribution_{operator}_{link_direction.lower()}.pdf')
+            save_figure(save_path, bbox_inches='tight', dpi=300)
+            if stats_format:
+                band_counts = {band: band_data[band] for band in sorted_bands}
+                write_summary(count_rows(band_counts, 'band', 'ca_type', operator=operator), save_path, stats_format)
             logger.info(f"Saved plot: bar_ca_type_distribution_{operator}_{link_direction.lower()}.pdf")
             plt.close()
             
@@ -194,20 +206,30 @@ def plot_ca_distribution(operator_data, link_direction='UL'):
         logger.error(f"Error during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'bar_ca_type_distribution_{link_direction.lower()}', e)
 
-def main():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+def main(stats_format=None):
+    stats_format = stats_format or default_stats_format()
+    pkl_dir = pkl_root()
     
+    cube_filename = cube_path(pkl_dir)
     pkl_filename = os.path.join(pkl_dir, 'bar_ca_type_distribution_ul.pkl')
-    if not os.path.exists(pkl_filename):
-        logger.warning(f"Pickle file not found: {pkl_filename}")
-        return
-        
-    with open(pkl_filename, 'rb') as f:
-        ul_operator_data = pickle.load(f)
+    if cube_filename:
+        # Slice the CA x MIMO count cube (PAM_USE_CUBE=1)
+        ul_operator_data = ca_type_distribution(load_cube(cube_filename), 'UL')
+    elif os.path.exists(pkl_filename):
+        try:
+            ul_operator_data = load_counts(pkl_filename)
+        except SchemaError as e:
+            record_input_failure(pkl_filename, e)
+            ul_operator_data = None
+    else:
+        missing_input(pkl_filename)
+        ul_operator_data = None
         
-    plot_ca_distribution(ul_operator_data, link_direction='UL')
+    if ul_operator_data is not None:
+        plot_ca_distribution(ul_operator_data, link_direction='UL', stats_format=stats_format)
+    log_report()
 
 if __name__ == "__main__":
     main()
@@ -3,9 +3,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import logging
-import pickle
 import matplotlib
 
+from common.data import direction_pickles, load_bands
+from common.ecdf import clear_ecdf_cache, get_ecdf
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.presence import build_presence_index
+from common.report import log_report, record_failure, record_input_failure, record_skipped
+from common.schema import SchemaError
+from common.summary import default_stats_format, ecdf_summary, write_summary
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -23,40 +32,34 @@ try:
 except Exception as e:
     logger.warning(f"Could not load matplotlibrc: {e}")
 
-def plot_cdf_bandwidth_ratio(all_operator_ratio_stats, link_direction='DL', band_type='mmWave', integrity_suffix=""):
+def plot_cdf_bandwidth_ratio(all_operator_ratio_stats, link_direction='DL', band_type='mmWave', integrity_suffix="", presence=None, stats_format=None):
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        plots_dir = os.path.join(current_dir, '..', 'plots')
+        plots_dir = plots_root()
         os.makedirs(plots_dir, exist_ok=True)
         
-        if band_type == 'mmWave': target_operators = ['ATT', 'Verizon']
-        else: target_operators = ['ATT', 'TMobile', 'Verizon']
+        target_operators = load_operator_index().operators(band_type)
+        if presence is None:
+            presence = build_presence_index({band_type: all_operator_ratio_stats}, has_modes=False)
         
         for operator in target_operators:
+            filename = f'cdf_bandwidth_ratio_{band_type}_{operator}_{link_direction.lower()}'
+            
+            # Only create a figure when the operator has samples
+            if presence.count(band_type, operator) == 0:
+                record_skipped(f'{filename}{integrity_suffix}', "no bandwidth ratio samples")
+                continue
+            
             fig, ax = plt.subplots(figsize=(8, 7))
             color = 'black'
-            valid_data = False
-            
-            ca_data = all_operator_ratio_stats.get(operator, {})
             
-            if not ca_data or 'All' not in ca_data or len(ca_data['All']) == 0:
-                plt.close()
-                continue
+            ca_data = all_operator_ratio_stats[operator]
             
-            ratio_values = ca_data['All']
-            sorted_values = np.sort(ratio_values)
-            n = len(sorted_values)
-            y = np.arange(1, n + 1) / n
+            ecdf = get_ecdf(('cdf_bandwidth_ratio', link_direction, band_type, operator, None), ca_data['All'])
+            sorted_values, y = ecdf.x, ecdf.y
             
             display_name = 'Total BW / PCell BW'
             ax.plot(sorted_values, y, label=f'{display_name}', color=color, linewidth=6, alpha=0.8)
             
-            valid_data = True
-            
-            if not valid_data:
-                plt.close()
-                continue
-            
             ax.set_xlabel('Bandwidth Ratio')
             ax.set_ylabel('CDF')
             ax.grid(True, alpha=0.3)
@@ -69,8 +72,10 @@ def plot_cdf_bandwidth_ratio(all_operator_ratio_stats, link_direction='DL', band
             elif band_type == 'mmWave': ax.set_xlim(0, 8.3)
             else: ax.set_xlim(left=0)
             
-            filename = f'cdf_bandwidth_ratio_{band_type}_{operator}_{link_direction.lower()}'
-            plt.savefig(os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf'), dpi=300, bbox_inches='tight')
+            save_path = os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf')
+            save_figure(save_path, dpi=300, bbox_inches='tight')
+            if stats_format:
+                write_summary([ecdf_summary(ecdf, band=band_type, operator=operator)], save_path, stats_format)
             plt.close()
             logger.info(f"Saved plot: {filename}{integrity_suffix}.pdf")
             
@@ -78,33 +83,31 @@ def plot_cdf_bandwidth_ratio(all_operator_ratio_stats, link_direction='DL', band
         logger.error(f"An error occurred during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'cdf_bandwidth_ratio_{band_type}_{link_direction.lower()}', e)
 
-def main():
-    integrity_suffix = "_with_integrity"
+def main(stats_format=None):
+    stats_format = stats_format or default_stats_format()
+    integrity_suffix = figure_suffix()
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+    pkl_dir = pkl_root()
     
-    pkl_filename = os.path.join(pkl_dir, 'cdf_bandwidth_ratio_dl.pkl')
-    if not os.path.exists(pkl_filename):
-        logger.warning(f"Pickle file not found: {pkl_filename}")
-        return
-        
-    with open(pkl_filename, 'rb') as f:
-        pkl_data = pickle.load(f)
+    for link_direction, pkl_filename in direction_pickles(pkl_dir, 'cdf_bandwidth_ratio'):
+        try:
+            # One band in memory at a time (with partitioned pickles); the
+            # presence index only ever covers the band being drawn
+            pkl_data = load_bands(pkl_filename)
         
-    all_operator_ratio_stats_low = pkl_data['Low']
-    all_operator_ratio_stats_mid = pkl_data['Mid']
-    all_operator_ratio_stats_mmwave = pkl_data['mmWave']
-    
-    if all_operator_ratio_stats_low:
-        plot_cdf_bandwidth_ratio(all_operator_ratio_stats_low, 'DL', 'Low', integrity_suffix)
-    if all_operator_ratio_stats_mid:
-        plot_cdf_bandwidth_ratio(all_operator_ratio_stats_mid, 'DL', 'Mid', integrity_suffix)
-    if all_operator_ratio_stats_mmwave:
-        plot_cdf_bandwidth_ratio(all_operator_ratio_stats_mmwave, 'DL', 'mmWave', integrity_suffix)
+            for band_type in pkl_data:
+                if pkl_data[band_type]:
+                    presence = build_presence_index({band_type: pkl_data[band_type]}, has_modes=False)
+                    plot_cdf_bandwidth_ratio(pkl_data[band_type], link_direction, band_type, integrity_suffix, presence=presence, stats_format=stats_format)
+                pkl_data.release(band_type)
+                clear_ecdf_cache('cdf_bandwidth_ratio', link_direction, band_type)
+        except SchemaError as e:
+            record_input_failure(pkl_filename, e)
 
     logger.info("Plotting completed.")
+    log_report()
 
 if __name__ == "__main__":
     main()
@@ -3,10 +3,19 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import logging
-import pickle
 import matplotlib
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 
+from common.data import direction_pickles, load_bands
+from common.ecdf import clear_ecdf_cache, get_ecdf
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.presence import build_presence_index
+from common.report import log_report, record_failure, record_input_failure, record_skipped
+from common.schema import SchemaError
+from common.summary import default_stats_format, ecdf_summary, write_summary
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -24,16 +33,23 @@ try:
 except Exception as e:
     logger.warning(f"Could not load matplotlibrc: {e}")
 
-def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWave', tput_modes=['Tput_0'], integrity_suffix="", enable_inset=False, inset_xmin=0, inset_xmax=None):
+def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWave', tput_modes=['Tput_0'], integrity_suffix="", enable_inset=False, inset_xmin=0, inset_xmax=None, presence=None, stats_format=None):
     try:
-        if band_type == 'mmWave': target_operators = ['ATT', 'Verizon']
-        elif band_type in ('Low', 'Mid'): target_operators = ['ATT', 'TMobile', 'Verizon']
-        else: target_operators = ['ATT', 'TMobile', 'Verizon']
+        target_operators = load_operator_index().operators(band_type)
+        if presence is None:
+            presence = build_presence_index({band_type: all_operator_tput_stats})
         
         for operator in target_operators:
-            filtered_tput_modes = tput_modes
+            filename = f'cdf_tput_{band_type}_{operator}_{link_direction.lower()}'
+            
+            # Only create a figure when at least one mode has samples
+            filtered_tput_modes = presence.modes_with_data(band_type, operator, tput_modes)
+            if not filtered_tput_modes:
+                record_skipped(f'{filename}{integrity_suffix}', f"no samples for {', '.join(tput_modes)}")
+                continue
             
             fig, ax = plt.subplots(figsize=(8, 7))
+            summary_rows = []
             
             color_map = {
                 'Tput_0': 'red',
@@ -49,15 +65,10 @@ def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWav
             
             for tput_mode in filtered_tput_modes:
                 operator_tput_stats = all_operator_tput_stats.get(tput_mode, {})
-                ca_data = operator_tput_stats.get(operator, {})
-                
-                if not ca_data or 'All' not in ca_data or len(ca_data['All']) == 0:
-                    continue
+                ca_data = operator_tput_stats[operator]
                 
-                tput_values = ca_data['All']
-                sorted_values = np.sort(tput_values)
-                n = len(sorted_values)
-                y = np.arange(1, n + 1) / n
+                ecdf = get_ecdf(('cdf_tput', link_direction, band_type, operator, tput_mode), ca_data['All'])
+                sorted_values, y = ecdf.x, ecdf.y
                 
                 mode_display_names = {
                     'Tput_0': r'T$_{BASE}$',
@@ -73,13 +84,11 @@ def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWav
                 line, = ax.plot(sorted_values, y, label=f'{display_name}', color=color, linewidth=6, alpha=0.8)
                 
                 valid_modes.append(tput_mode)
+                if stats_format:
+                    summary_rows.append(ecdf_summary(ecdf, band=band_type, operator=operator, mode=tput_mode))
                 mode_to_curve[tput_mode] = (sorted_values, y, color)
                 mode_to_handle[tput_mode] = line
             
-            if not valid_modes:
-                plt.close()
-                continue
-            
             ax.set_xlabel(f'Throughput (Mbps)')
             ax.set_ylabel('CDF')
             ax.grid(True, alpha=0.3)
@@ -113,12 +122,13 @@ def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWav
                 axins.grid(True, alpha=0.3)
                 axins.tick_params(labelsize=8)
             
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            plots_dir = os.path.join(current_dir, '..', 'plots')
+            plots_dir = plots_root()
             os.makedirs(plots_dir, exist_ok=True)
             
-            filename = f'cdf_tput_{band_type}_{operator}_{link_direction.lower()}'
-            plt.savefig(os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf'), dpi=300, bbox_inches='tight')
+            save_path = os.path.join(plots_dir, f'{filename}{integrity_suffix}.pdf')
+            save_figure(save_path, dpi=300, bbox_inches='tight')
+            if stats_format:
+                write_summary(summary_rows, save_path, stats_format)
             plt.close(fig)
             logger.info(f"Saved plot: {filename}{integrity_suffix}.pdf")
         
@@ -126,34 +136,32 @@ def plot_cdf_tput(all_operator_tput_stats, link_direction='DL', band_type='mmWav
         logger.error(f"An error occurred during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'cdf_tput_{band_type}_{link_direction.lower()}', e)
 
-def main():
-    integrity_suffix = "_with_integrity"
+def main(stats_format=None):
+    stats_format = stats_format or default_stats_format()
+    integrity_suffix = figure_suffix()
     modes_to_process = ['Tput_0', 'Tput_1', 'Tput_2', 'Tput_3']
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+    pkl_dir = pkl_root()
     
-    pkl_filename = os.path.join(pkl_dir, 'cdf_tput_dl.pkl')
-    if not os.path.exists(pkl_filename):
-        logger.warning(f"Pickle file not found: {pkl_filename}")
-        return
+    for link_direction, pkl_filename in direction_pickles(pkl_dir, 'cdf_tput'):
+        try:
+            # One band in memory at a time (with partitioned pickles); the
+            # presence index only ever covers the band being drawn
+            pkl_data = load_bands(pkl_filename)
         
-    with open(pkl_filename, 'rb') as f:
-        pkl_data = pickle.load(f)
-        
-    all_operator_tput_stats_low = pkl_data['Low']
-    all_operator_tput_stats_mid = pkl_data['Mid']
-    all_operator_tput_stats_mmwave = pkl_data['mmWave']
-    
-    if all_operator_tput_stats_low:
-        plot_cdf_tput(all_operator_tput_stats_low, 'DL', 'Low', modes_to_process, integrity_suffix)
-    if all_operator_tput_stats_mid:
-        plot_cdf_tput(all_operator_tput_stats_mid, 'DL', 'Mid', modes_to_process, integrity_suffix)
-    if all_operator_tput_stats_mmwave:
-        plot_cdf_tput(all_operator_tput_stats_mmwave, 'DL', 'mmWave', modes_to_process, integrity_suffix)
+            for band_type in pkl_data:
+                if pkl_data[band_type]:
+                    presence = build_presence_index({band_type: pkl_data[band_type]})
+                    plot_cdf_tput(pkl_data[band_type], link_direction, band_type, modes_to_process, integrity_suffix, presence=presence, stats_format=stats_format)
+                pkl_data.release(band_type)
+                clear_ecdf_cache('cdf_tput', link_direction, band_type)
+        except SchemaError as e:
+            record_input_failure(pkl_filename, e)
 
     logger.info("Plotting completed.")
+    log_report()
 
 if __name__ == "__main__":
     main()
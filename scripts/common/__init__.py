@@ -0,0 +1,3 @@
+"""
+Shared helpers for the plotting scripts (data loading, figure output).
+"""
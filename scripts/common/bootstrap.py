@@ -0,0 +1,96 @@
+import os
+import atexit
+import logging
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the size of one resampling index matrix (resamples x samples);
+# larger jobs are processed in chunks of resamples
+MAX_INDEX_ELEMENTS = 20_000_000
+
+STATISTICS = {
+    'median': lambda samples: np.median(samples, axis=1),
+    'mean': lambda samples: np.mean(samples, axis=1),
+}
+
+def bootstrap_ci(values, statistic='median', n_resamples=10000, confidence=0.95, seed=None):
+    """
+    Percentile bootstrap confidence interval of a statistic for one group.
+    Returns (estimate, ci_low, ci_high).
+    """
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unsupported statistic: {statistic}")
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan, np.nan
+
+    stat_fn = STATISTICS[statistic]
+    rng = np.random.default_rng(seed)
+    estimates = np.empty(n_resamples)
+    chunk = max(1, min(n_resamples, MAX_INDEX_ELEMENTS // n))
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        # One row of sample indices per resample
+        idx = rng.integers(0, n, size=(size, n))
+        estimates[start:start + size] = stat_fn(values[idx])
+
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.quantile(estimates, [alpha, 1 - alpha])
+    return float(stat_fn(values[np.newaxis, :])[0]), float(ci_low), float(ci_high)
+
+def _bootstrap_task(args):
+    values, statistic, n_resamples, confidence, seed = args
+    return bootstrap_ci(values, statistic, n_resamples, confidence, seed)
+
+_pool = None
+
+def get_pool(workers=None):
+    """
+    Process pool shared by the statistics helpers, created on first use
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    return _pool
+
+def shutdown_pool():
+    """
+    Stop the shared pool. atexit does not run in pool workers, so jobs run on
+    a pool of their own (common/jobs.py) call this when they finish.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+atexit.register(shutdown_pool)
+
+def bootstrap_groups(groups, statistic='median', n_resamples=10000, confidence=0.95, seed=0, workers=None):
+    """
+    Bootstrap CIs for several groups at once, one process-pool task per group.
+    groups maps a key to its samples; returns {key: (estimate, ci_low, ci_high)}.
+    Every group gets its own seed derived from seed, so results do not depend
+    on scheduling.
+    """
+    keys = list(groups)
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    tasks = [(np.asarray(groups[key], dtype=float), statistic, n_resamples, confidence, group_seed)
+             for key, group_seed in zip(keys, seeds)]
+    if len(tasks) <= 1 or workers == 1:
+        results = [_bootstrap_task(task) for task in tasks]
+    else:
+        results = list(get_pool(workers).map(_bootstrap_task, tasks))
+    return dict(zip(keys, results))
+
+def draw_ci(ax, positions, cis, width=0.5):
+    """
+    Overlay bootstrap CIs as error bars centred on each box
+    """
+    estimates = np.array([ci[0] for ci in cis])
+    lower = estimates - np.array([ci[1] for ci in cis])
+    upper = np.array([ci[2] for ci in cis]) - estimates
+    ax.errorbar(positions, estimates, yerr=[lower, upper], fmt='none',
+                ecolor='black', elinewidth=4, capsize=width * 20, capthick=4, zorder=5)
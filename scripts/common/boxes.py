@@ -0,0 +1,64 @@
+import numpy as np
+import matplotlib as mpl
+from matplotlib import cbook
+
+# Look of every box figure: translucent boxes with thick outlines, whiskers
+# and caps, thick orange medians
+BOX_STYLE = {
+    'boxprops': {'alpha': 0.7, 'linewidth': 4},
+    'medianprops': {'color': 'orange', 'linewidth': 5},
+    'whiskerprops': {'linewidth': 4},
+    'capprops': {'linewidth': 4},
+    'flierprops': {'markeredgewidth': 3},
+}
+
+def side_by_side(n_groups, n_series, spacing, gap=0.6, start=1):
+    """
+    Grouped layout with the n_series boxes of each group side by side,
+    spacing apart, and gap between groups. Returns the box positions of every
+    group (positions[group][series]) and the group centres for the x ticks.
+    """
+    positions = []
+    centres = []
+    position = start
+    for _ in range(n_groups):
+        positions.append([position + series * spacing for series in range(n_series)])
+        centres.append(position + (n_series - 1) * spacing / 2)
+        position += (n_series - 1) * spacing + gap
+    return positions, centres
+
+def box_stats(data, labels=None):
+    """
+    cbook.boxplot_stats() of every box with the whiskers of rcParams (as
+    Axes.boxplot() computes them), plus the sample count of each box. The
+    samples are taken as float64, so means of float32 leaves keep their
+    precision in the summary tables.
+    """
+    data = [np.asarray(values, dtype=float) for values in data]
+    stats = cbook.boxplot_stats(data, whis=mpl.rcParams['boxplot.whiskers'],
+                                bootstrap=mpl.rcParams['boxplot.bootstrap'], labels=labels)
+    for box, values in zip(stats, data):
+        box['count'] = len(values)
+    return stats
+
+def draw_boxes(ax, data, positions, labels=None, widths=0.5, colors='lightblue', notch_cis=None):
+    """
+    Draw all boxes of a figure with a single bxp() call, styled by BOX_STYLE
+    when the artists are created. colors is one face colour for every box or
+    one per box; notch_cis, (estimate, ci_low, ci_high) per box, draws the
+    median CIs as notches. Returns the artists of bxp() and the statistics
+    drawn (see box_stats), one per box.
+    """
+    stats = box_stats(data, labels)
+    for box, ci in zip(stats, notch_cis or []):
+        box['cilo'], box['cihi'] = ci[1], ci[2]
+
+    style = dict(BOX_STYLE)
+    if isinstance(colors, str):
+        style['boxprops'] = {**style['boxprops'], 'facecolor': colors}
+    artists = ax.bxp(stats, positions=positions, widths=widths, patch_artist=True, showfliers=True,
+                     shownotches=notch_cis is not None, **style)
+    if not isinstance(colors, str):
+        for patch, color in zip(artists['boxes'], colors):
+            patch.set_facecolor(color)
+    return artists, stats
@@ -0,0 +1,35 @@
+# Column names of the per-sample drive logs the pickles were built from
+TIME_COL = 'TIME_STAMP'
+TPUT_COL = 'Layer2 MAC DL Throughput [Mbps]'
+MCS_COL = 'Layer1 DL MCS (Avg)'
+RSRP_COL = 'RF Serving SS-RSRP [dBm]'
+CQI_COL = 'RF CQI'
+BANDWIDTH_COL = 'RF BandWidth'
+LAYERS_COL = 'Layer1 DL Layer Num (Mode)'
+# Number of active component carriers (PCell + SCells) of a sample
+NUM_CC_COL = 'Num CCs'
+LAT_COL = 'Lat'
+LON_COL = 'Lon'
+# Per-sample T_CA/T_BASE throughput ratio (the T_ca_T_base CDF mode)
+TCA_TBASE_COL = 'T_ca_T_base'
+# Per-cell records (one row per serving cell of a sample) used by the count cube
+CELL_COL = 'Cell'
+BAND_COL = 'Band'
+MIMO_MODE_COL = 'MIMO Mode'
+UL_LAYERS_COL = 'Layer1 UL Layer Num (Mode)'
+UL_TPUT_COL = 'Layer2 MAC UL Throughput [Mbps]'
+UL_MCS_COL = 'Layer1 UL MCS (Avg)'
+# Categorical tags of a sample used to cut campaign subsets (see common/store.py)
+CITY_COL = 'City'
+DEVICE_COL = 'Device'
+
+# Storage dtype of per-sample values of each metric: small integer metrics
+# fit in int8, continuous ones keep float32 precision
+METRIC_DTYPES = {
+    TPUT_COL: 'float32',
+    MCS_COL: 'int8',
+    RSRP_COL: 'float32',
+    CQI_COL: 'int8',
+    BANDWIDTH_COL: 'float32',
+    LAYERS_COL: 'int8',
+}
@@ -0,0 +1,218 @@
+import os
+import pickle
+import logging
+import numpy as np
+import pandas as pd
+
+from common.data import load_pickle
+
+logger = logging.getLogger(__name__)
+
+CUBE_VERSION = 1
+
+# File name of the cube under pkl/
+CUBE_FILENAME = 'ca_mimo_cube.pkl'
+
+# Axes of the CA x MIMO count cube, one count per serving-cell record
+CUBE_AXES = ('operator', 'band', 'cell', 'ca_type', 'layer', 'mimo_mode', 'direction')
+
+# Label of records without a value on that axis; kept in the cube so every
+# marginal still counts all records, and dropped by the views below
+MISSING = 'n/a'
+
+class CountCube:
+    """
+    Dense count array with named, labelled axes.
+
+    sel() slices by label, sum() and marginal() aggregate axes away, and
+    to_nested() turns the result into the {label: {label: count}} dicts the
+    plotting functions take.
+    """
+    def __init__(self, counts, labels):
+        self.counts = np.asarray(counts)
+        self.axes = tuple(labels)
+        self.labels = {axis: tuple(axis_labels) for axis, axis_labels in labels.items()}
+        if self.counts.shape != tuple(len(self.labels[axis]) for axis in self.axes):
+            raise ValueError(f"Count array shape {self.counts.shape} does not match the axis labels")
+        self._positions = {axis: {label: i for i, label in enumerate(axis_labels)}
+                           for axis, axis_labels in self.labels.items()}
+
+    def _axis_num(self, axis):
+        if axis not in self.labels:
+            raise KeyError(f"Unknown cube axis: {axis}")
+        return self.axes.index(axis)
+
+    def sel(self, **selection):
+        """
+        Slice by label. A single label drops the axis (all zeros if the label
+        is not in the cube); a list of labels keeps the axis with only those
+        labels, skipping any the cube does not have.
+        """
+        counts = self.counts
+        labels = {}
+        axis_num = 0
+        for axis in self.axes:
+            positions = self._positions[axis]
+            wanted = selection.get(axis)
+            if axis not in selection:
+                labels[axis] = self.labels[axis]
+                axis_num += 1
+            elif isinstance(wanted, (list, tuple, set, frozenset)):
+                kept = [label for label in wanted if label in positions]
+                counts = np.take(counts, [positions[label] for label in kept], axis=axis_num)
+                labels[axis] = kept
+                axis_num += 1
+            elif wanted in positions:
+                counts = np.take(counts, positions[wanted], axis=axis_num)
+            else:
+                counts = np.zeros(counts.shape[:axis_num] + counts.shape[axis_num + 1:], dtype=counts.dtype)
+        return CountCube(counts, labels)
+
+    def sum(self, *axes):
+        """
+        Sum the given axes away
+        """
+        axis_nums = tuple(self._axis_num(axis) for axis in axes)
+        return CountCube(self.counts.sum(axis=axis_nums),
+                         {axis: self.labels[axis] for axis in self.axes if axis not in axes})
+
+    def marginal(self, *keep):
+        """
+        Counts over the kept axes only, in the given order
+        """
+        summed = self.sum(*[axis for axis in self.axes if axis not in keep])
+        order = [summed.axes.index(axis) for axis in keep]
+        return CountCube(np.transpose(summed.counts, order), {axis: summed.labels[axis] for axis in keep})
+
+    def group(self, axis, mapping):
+        """
+        Merge the labels of one axis through mapping (label -> group); labels
+        mapped to None are dropped
+        """
+        axis_num = self._axis_num(axis)
+        groups = []
+        for label in self.labels[axis]:
+            group = mapping(label)
+            if group is not None and group not in groups:
+                groups.append(group)
+        shape = list(self.counts.shape)
+        shape[axis_num] = len(groups)
+        counts = np.zeros(shape, dtype=self.counts.dtype)
+        for position, label in enumerate(self.labels[axis]):
+            group = mapping(label)
+            if group is None:
+                continue
+            target = [slice(None)] * len(shape)
+            source = [slice(None)] * len(shape)
+            target[axis_num] = groups.index(group)
+            source[axis_num] = position
+            counts[tuple(target)] += self.counts[tuple(source)]
+        labels = dict(self.labels)
+        labels[axis] = groups
+        return CountCube(counts, labels)
+
+    def to_nested(self):
+        """
+        Nested dicts keyed by label along the axes, leaving out zero counts
+        and empty branches
+        """
+        def nest(counts, depth):
+            if depth == len(self.axes):
+                return int(counts)
+            result = {}
+            for label, sub_counts in zip(self.labels[self.axes[depth]], counts):
+                if not np.any(sub_counts):
+                    continue
+                result[label] = nest(sub_counts, depth + 1)
+            return result
+        return nest(self.counts, 0)
+
+def build_cube(record_chunks, count_dtype=np.uint32):
+    """
+    Count cube from an iterable of record DataFrames with one column per axis
+    in CUBE_AXES. Each chunk is reduced with one groupby, so only the distinct
+    axis combinations are kept in memory.
+    """
+    parts = [chunk.groupby(list(CUBE_AXES), dropna=True, sort=False).size()
+             for chunk in record_chunks if not chunk.empty]
+    if not parts:
+        return None
+    totals = pd.concat(parts).groupby(level=list(range(len(CUBE_AXES)))).sum()
+
+    labels = {}
+    codes = []
+    for level, axis in enumerate(CUBE_AXES):
+        values = totals.index.get_level_values(level)
+        # Numeric labels (layers) sort numerically, MISSING and other strings after them
+        axis_labels = sorted(values.unique(), key=lambda label: (isinstance(label, str), label))
+        labels[axis] = axis_labels
+        codes.append(pd.Index(axis_labels, dtype=object).get_indexer(values.astype(object)))
+    counts = np.zeros([len(labels[axis]) for axis in CUBE_AXES], dtype=count_dtype)
+    np.add.at(counts, tuple(codes), totals.to_numpy().astype(count_dtype))
+    return CountCube(counts, labels)
+
+def save_cube(cube, pkl_filename):
+    with open(pkl_filename, 'wb') as f:
+        pickle.dump({'version': CUBE_VERSION, 'axes': list(cube.axes),
+                     'labels': {axis: list(cube.labels[axis]) for axis in cube.axes},
+                     'counts': cube.counts}, f)
+
+def use_cube():
+    return os.environ.get('PAM_USE_CUBE') == '1'
+
+def cube_path(pkl_dir):
+    """
+    Path of the cube under pkl_dir if PAM_USE_CUBE=1 and it has been built,
+    else None. The cube counts every record of the drive logs rather than the
+    filtered records of the per-family pickles, so the figures only switch to
+    it on request.
+    """
+    if not use_cube():
+        return None
+    cube_filename = os.path.join(pkl_dir, CUBE_FILENAME)
+    if not os.path.exists(cube_filename):
+        logger.warning(f"PAM_USE_CUBE=1 but {cube_filename} does not exist; using the per-family pickles")
+        return None
+    return cube_filename
+
+def load_cube(pkl_filename):
+    data = load_pickle(pkl_filename)
+    if data.get('version') != CUBE_VERSION:
+        raise ValueError(f"{pkl_filename}: unsupported cube version {data.get('version')}")
+    return CountCube(data['counts'], {axis: data['labels'][axis] for axis in data['axes']})
+
+# Views in the shape of the per-family pickles
+
+def drop_missing(cube, *axes):
+    return cube.sel(**{axis: [label for label in cube.labels[axis] if label != MISSING] for axis in axes})
+
+def ca_type_distribution(cube, direction='DL'):
+    """
+    {operator: {PCell band: {'<DIR> <CA type>': count}}}, as in
+    bar_ca_type_distribution_*.pkl
+    """
+    counts = drop_missing(cube.sel(direction=direction, cell='PCell'), 'band', 'ca_type').marginal('operator', 'band', 'ca_type')
+    labels = dict(counts.labels)
+    labels['ca_type'] = [f'{direction} {ca_type}' for ca_type in counts.labels['ca_type']]
+    return CountCube(counts.counts, labels).to_nested()
+
+def mimo_cell_distribution(cube, category='layer', direction='DL'):
+    """
+    {operator: {cell: {band: {layer or MIMO mode: count}}}}, as in
+    bar_mimo_layer_all_cells_*.pkl / bar_mimo_mode_all_cells_*.pkl
+    """
+    return drop_missing(cube.sel(direction=direction), 'band', category).marginal('operator', 'cell', 'band', category).to_nested()
+
+def ca_layer_counts(cube, band_class, direction='DL'):
+    """
+    {band class: {operator: {CA type: {'counts': {layer: count}}}}} over PCell
+    records, the counted form of bar_ca_layer_*.pkl
+    """
+    counts = (drop_missing(cube.sel(direction=direction, cell='PCell'), 'ca_type', 'layer')
+              .group('band', band_class)
+              .marginal('band', 'operator', 'ca_type', 'layer')
+              .to_nested())
+    return {band: {operator: {ca_type: {'counts': layer_counts}
+                              for ca_type, layer_counts in ca_data.items()}
+                   for operator, ca_data in band_data.items()}
+            for band, band_data in counts.items()}
@@ -0,0 +1,351 @@
+import os
+import json
+import pickle
+import logging
+import numpy as np
+from collections.abc import Mapping
+
+from common.columns import BANDWIDTH_COL, CQI_COL, LAYERS_COL, MCS_COL, METRIC_DTYPES, RSRP_COL, TPUT_COL
+from common.operators import load_operator_index
+from common.report import missing_input
+from common.schema import check_header, validate
+
+logger = logging.getLogger(__name__)
+
+# Optional in-memory cache of unpickled inputs, keyed by resolved path (so a
+# pickle symlinked into several dataset variants is loaded once), holding
+# (file signature, data, whether the leaves are typed arrays).
+# Disabled for one-shot script runs; the render server turns it on so that
+# repeated renders do not pay the unpickling cost again.
+_pickle_cache = None
+
+def enable_pickle_cache():
+    """
+    Keep loaded pickles in memory and reuse them until the file changes on disk
+    """
+    global _pickle_cache
+    if _pickle_cache is None:
+        _pickle_cache = {}
+
+def clear_pickle_cache():
+    if _pickle_cache is not None:
+        _pickle_cache.clear()
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_pickle(pkl_filename):
+    """
+    Load a pickle file, going through the in-memory cache when it is enabled
+    """
+    if _pickle_cache is None:
+        with open(pkl_filename, 'rb') as f:
+            return pickle.load(f)
+    
+    key = os.path.realpath(pkl_filename)
+    signature = _signature(key)
+    
+    cached = _pickle_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    
+    with open(key, 'rb') as f:
+        data = pickle.load(f)
+    _pickle_cache[key] = (signature, data, False)
+    logger.info(f"Cached pickle: {os.path.basename(key)}")
+    return data
+
+# Metric stored in the sample leaves of each pickle family (see pickle_family)
+FAMILY_METRICS = {
+    'bar_ca_layer': LAYERS_COL,
+    'box_ca_tput': TPUT_COL,
+    'box_ca_mcs': MCS_COL,
+    'box_ca_rsrp': RSRP_COL,
+    'box_ca_cqi': CQI_COL,
+    'box_ca_bandwidth': BANDWIDTH_COL,
+    'box_ca_layers': LAYERS_COL,
+    'box_mimo_tput': TPUT_COL,
+    'box_mimo_mcs': MCS_COL,
+    'box_mimo_rsrp': RSRP_COL,
+    'box_mimo_cqi': CQI_COL,
+    'box_mimo_bandwidth': BANDWIDTH_COL,
+    'cdf_tput': TPUT_COL,
+}
+
+# Sample pickle families holding unitless ratios (float32)
+RATIO_FAMILIES = ('cdf_bandwidth_ratio', 'cdf_tput_ratio')
+
+# Link directions of the per-sample families, in rendering order; their
+# pickles are <family>_dl.pkl and <family>_ul.pkl
+LINK_DIRECTIONS = ('DL', 'UL')
+
+def direction_pickles(pkl_dir, family):
+    """
+    (link direction, path) of the family's pickles in pkl_dir. The UL pickle
+    is optional; a missing DL pickle is reported through missing_input().
+    """
+    found = []
+    for link_direction in LINK_DIRECTIONS:
+        pkl_filename = os.path.join(pkl_dir, f'{family}_{link_direction.lower()}.pkl')
+        if input_exists(pkl_filename):
+            found.append((link_direction, pkl_filename))
+        elif link_direction == 'DL':
+            missing_input(pkl_filename)
+    return found
+
+def pickle_family(pkl_filename):
+    """
+    Family name of a pickle: its file name without the _dl/_ul.pkl suffix
+    """
+    family = os.path.basename(pkl_filename).rsplit('.', 1)[0]
+    for suffix in ('_dl', '_ul'):
+        if family.endswith(suffix):
+            return family[:-len(suffix)]
+    return family
+
+def is_sample_pickle(pkl_filename):
+    family = pickle_family(pkl_filename)
+    return family in FAMILY_METRICS or family in RATIO_FAMILIES
+
+def sample_dtype(pkl_filename):
+    """
+    Storage dtype of the sample leaves of a pickle, from its family name
+    """
+    return np.dtype(METRIC_DTYPES.get(FAMILY_METRICS.get(pickle_family(pkl_filename)), 'float32'))
+
+def to_typed_array(values, dtype):
+    """
+    One sample leaf as a typed array. Integer dtypes are only used when the
+    conversion is lossless (finite, integral, in range); otherwise float32.
+    """
+    array = np.asarray(values)
+    if array.dtype == dtype:
+        return array
+    if np.issubdtype(dtype, np.integer):
+        as_float = array.astype(float)
+        info = np.iinfo(dtype)
+        if (np.all(np.isfinite(as_float)) and np.all(as_float == np.round(as_float))
+                and (as_float.size == 0 or (as_float.min() >= info.min and as_float.max() <= info.max))):
+            return as_float.astype(dtype)
+        dtype = np.dtype(np.float32)
+    return array.astype(dtype)
+
+def to_typed(data, dtype):
+    """
+    Copy of a nested pickle with every list of numbers turned into a typed array
+    """
+    if isinstance(data, dict):
+        return {key: to_typed(value, dtype) for key, value in data.items()}
+    if isinstance(data, (list, tuple, np.ndarray)):
+        return to_typed_array(data, dtype)
+    return data
+
+def _checked_typed(raw, family, dtype, source, prefix=()):
+    try:
+        data = to_typed(raw, dtype)
+    except (ValueError, TypeError):
+        # Locate the offending leaf in the raw data for the error message
+        validate(raw, family, source, prefix)
+        raise
+    # Leaves are typed arrays now, so only keys and dtypes are left to check
+    validate(data, family, source, prefix)
+    return data
+
+def _load_typed(pkl_filename, family, dtype):
+    check_header(pkl_filename, family)
+    return _checked_typed(load_pickle(pkl_filename), family, dtype, pkl_filename)
+
+def _cached_typed(pkl_filename, load):
+    """
+    load(path) of a pickle with typed leaves, going through the in-memory
+    cache when it is enabled. Only the typed copy is kept.
+    """
+    if _pickle_cache is None:
+        return load(pkl_filename)
+
+    key = os.path.realpath(pkl_filename)
+    cached = _pickle_cache.get(key)
+    if cached is not None and cached[0] == _signature(key) and cached[2]:
+        return cached[1]
+    data = load(key)
+    _pickle_cache[key] = (_signature(key), data, True)
+    return data
+
+def load_samples(pkl_filename):
+    """
+    Load a pickle of per-sample values with every leaf as a typed NumPy array
+    (see METRIC_DTYPES), checked against the schema of its family. Pickles
+    written by tools/convert_pickles.py already hold typed arrays and load
+    as-is. With the cache enabled only the typed copy is kept.
+    """
+    family = pickle_family(pkl_filename)
+    dtype = sample_dtype(pkl_filename)
+    return _cached_typed(pkl_filename, lambda path: _load_typed(path, family, dtype))
+
+# Per-band partitions of a sample pickle: <family>_<dl|ul>/<band>.pkl next to
+# <family>_<dl|ul>.pkl, each holding the branch of one band with typed leaves
+# (written by tools/partition_pickles.py). load_bands() reads them one band at
+# a time, so a script holds the band it is drawing rather than the whole file.
+# index.json in the partition directory lists the bands written and the
+# (mtime, size) signature of the pickle they were split from.
+PARTITION_INDEX_FILENAME = 'index.json'
+
+def partition_dir(pkl_filename):
+    return os.path.splitext(pkl_filename)[0]
+
+def partition_path(pkl_filename, band_type):
+    return os.path.join(partition_dir(pkl_filename), f'{band_type}.pkl')
+
+def has_partitions(pkl_filename):
+    return os.path.exists(os.path.join(partition_dir(pkl_filename), PARTITION_INDEX_FILENAME))
+
+def input_exists(pkl_filename):
+    """
+    Whether a pickle can be read: the file itself or, once only its band
+    partitions are kept, their index
+    """
+    return os.path.exists(pkl_filename) or (is_sample_pickle(pkl_filename) and has_partitions(pkl_filename))
+
+def input_signature(pkl_filename):
+    """
+    (resolved path, mtime, size) of what an input is read from: the pickle,
+    or the index of its band partitions (rewritten whenever they are), or
+    None if neither exists
+    """
+    if not os.path.exists(pkl_filename):
+        if not input_exists(pkl_filename):
+            return None
+        pkl_filename = os.path.join(partition_dir(pkl_filename), PARTITION_INDEX_FILENAME)
+    return (os.path.realpath(pkl_filename), *_signature(pkl_filename))
+
+def band_partitions(pkl_filename):
+    """
+    {band: partition path} of a sample pickle in band order, or None if it is
+    not partitioned, a listed band is missing or the pickle was rewritten
+    after its partitions were written
+    """
+    directory = partition_dir(pkl_filename)
+    index_path = os.path.join(directory, PARTITION_INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        if os.path.isdir(directory):
+            logger.warning(f"{os.path.basename(directory)}/ has no {PARTITION_INDEX_FILENAME}, loading the whole pickle "
+                           f"(re-run tools/partition_pickles.py)")
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    paths = {band_type: partition_path(pkl_filename, band_type) for band_type in index['bands']}
+    missing = [band_type for band_type, path in paths.items() if not os.path.exists(path)]
+    if missing:
+        logger.warning(f"{os.path.basename(directory)}/ has no {missing[0]} partition, loading the whole pickle")
+        return None
+    if os.path.exists(pkl_filename) and list(_signature(pkl_filename)) != index['source']:
+        logger.warning(f"{os.path.basename(pkl_filename)} changed after {os.path.basename(directory)}/ was written, "
+                       f"loading the whole pickle (re-run tools/partition_pickles.py)")
+        return None
+    return paths
+
+def write_band_partitions(pkl_filename, output=None):
+    """
+    Write the band partitions of a sample pickle and their index (to the
+    partitions of output when given); returns {band: bytes written}. Bands
+    without data (e.g. no UL mmWave) get no partition.
+    """
+    output = output or pkl_filename
+    data = load_samples(pkl_filename)
+    directory = partition_dir(output)
+    os.makedirs(directory, exist_ok=True)
+    band_order = load_operator_index().band_types
+    sizes = {}
+    for band_type in sorted((band_type for band_type in data if data[band_type]), key=band_order.index):
+        path = partition_path(output, band_type)
+        with open(f'{path}.tmp', 'wb') as f:
+            pickle.dump(data[band_type], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+        sizes[band_type] = os.path.getsize(path)
+
+    # Written last: partitions without an index are not used
+    index_path = os.path.join(directory, PARTITION_INDEX_FILENAME)
+    with open(f'{index_path}.tmp', 'w') as f:
+        json.dump({'bands': list(sizes), 'source': list(_signature(pkl_filename))}, f, indent=2)
+        f.write('\n')
+    os.replace(f'{index_path}.tmp', index_path)
+    return sizes
+
+def _load_partition(path, family, dtype, band_type, source):
+    with open(path, 'rb') as f:
+        raw = pickle.load(f)
+    return _checked_typed(raw, family, dtype, source, (band_type,))
+
+class LazyBands(Mapping):
+    """
+    {band: branch} view of a sample pickle that loads a band on first access
+    and holds it until release(band). Backed by the band partitions when the
+    pickle has them (see band_partitions); otherwise the whole pickle is
+    loaded on first access, as load_samples() does, and release() is a no-op.
+    """
+    def __init__(self, pkl_filename):
+        self.pkl_filename = pkl_filename
+        self.family = pickle_family(pkl_filename)
+        self.dtype = sample_dtype(pkl_filename)
+        self.partitions = band_partitions(pkl_filename)
+        self._whole = None
+        self._loaded = {}
+
+    def _load_whole(self):
+        if self._whole is None:
+            self._whole = load_samples(self.pkl_filename)
+        return self._whole
+
+    def __iter__(self):
+        if self.partitions is None:
+            return iter(self._load_whole())
+        return iter(self.partitions)
+
+    def __len__(self):
+        if self.partitions is None:
+            return len(self._load_whole())
+        return len(self.partitions)
+
+    def __contains__(self, band_type):
+        if self.partitions is None:
+            return band_type in self._load_whole()
+        return band_type in self.partitions
+
+    def __getitem__(self, band_type):
+        if self.partitions is None:
+            return self._load_whole()[band_type]
+        if band_type not in self._loaded:
+            path = self.partitions[band_type]
+            self._loaded[band_type] = _cached_typed(path, lambda path: _load_partition(
+                path, self.family, self.dtype, band_type, partition_dir(self.pkl_filename)))
+            logger.debug(f"Loaded the {band_type} partition of {os.path.basename(self.pkl_filename)}")
+        return self._loaded[band_type]
+
+    def release(self, band_type):
+        """
+        Drop a loaded band once its figures are done, including its entry
+        in the pickle cache; it is read again if accessed later
+        """
+        self._loaded.pop(band_type, None)
+        if _pickle_cache is not None and self.partitions is not None and band_type in self.partitions:
+            _pickle_cache.pop(os.path.realpath(self.partitions[band_type]), None)
+
+def load_bands(pkl_filename):
+    """
+    Lazy {band: branch} mapping of a pickle of per-sample values (see
+    LazyBands): with partitioned storage only the bands that are accessed
+    and not yet released are in memory
+    """
+    return LazyBands(pkl_filename)
+
+def load_counts(pkl_filename):
+    """
+    Load a pickle of counts (CA type, MIMO layer/mode distributions), checked
+    against the schema of its family
+    """
+    family = pickle_family(pkl_filename)
+    check_header(pkl_filename, family)
+    data = load_pickle(pkl_filename)
+    validate(data, family, pkl_filename)
+    return data
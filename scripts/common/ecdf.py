@@ -0,0 +1,79 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ECDF:
+    """
+    Empirical CDF of a sample, sorted once.
+
+    NaN and +/-inf values (e.g. ratios against a zero T_BASE) are dropped and
+    counted in n_dropped. Optional weights give a weighted ECDF. cdf() and
+    quantile() use binary search, so each lookup is O(log n).
+    """
+    def __init__(self, values, weights=None):
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        self.n_dropped = int(values.size - np.count_nonzero(finite))
+        if self.n_dropped:
+            values = values[finite]
+
+        if weights is None:
+            self.x = np.sort(values)
+            n = len(self.x)
+            self.y = np.arange(1, n + 1) / n
+        else:
+            weights = np.asarray(weights, dtype=float)
+            if self.n_dropped:
+                weights = weights[finite]
+            order = np.argsort(values, kind='stable')
+            self.x = values[order]
+            cumulative = np.cumsum(weights[order])
+            self.y = cumulative / cumulative[-1] if len(cumulative) else cumulative
+
+    def __len__(self):
+        return len(self.x)
+
+    def cdf(self, points):
+        """
+        Fraction of the sample (by weight) <= each point
+        """
+        idx = np.searchsorted(self.x, points, side='right')
+        return np.where(idx > 0, self.y[np.maximum(idx - 1, 0)], 0.0)
+
+    def quantile(self, q):
+        """
+        Smallest sample value whose CDF reaches q (inverse of cdf)
+        """
+        if len(self.x) == 0:
+            return np.full(np.shape(q), np.nan)
+        idx = np.searchsorted(self.y, q, side='left')
+        return self.x[np.minimum(idx, len(self.x) - 1)]
+
+# Sorted ECDFs keyed by (figure family, link direction, band, operator, mode).
+# The source sample is kept with the entry so a reloaded pickle is never
+# served a stale curve; the entries of a band are dropped with
+# clear_ecdf_cache(family, link_direction, band) once its figures are done,
+# so they do not keep a released band (see LazyBands) in memory.
+_ecdf_cache = {}
+
+def get_ecdf(key, values, weights=None):
+    """
+    Return the cached ECDF for key, building it on first use
+    """
+    cached = _ecdf_cache.get(key)
+    if cached is not None and cached[0] is values and cached[1] is weights:
+        return cached[2]
+
+    ecdf = ECDF(values, weights)
+    if ecdf.n_dropped:
+        logger.warning(f"{key}: dropped {ecdf.n_dropped} non-finite value(s)")
+    _ecdf_cache[key] = (values, weights, ecdf)
+    return ecdf
+
+def clear_ecdf_cache(*prefix):
+    """
+    Drop the cached ECDFs whose key starts with prefix (all of them by default)
+    """
+    for key in [key for key in _ecdf_cache if key[:len(prefix)] == prefix]:
+        del _ecdf_cache[key]
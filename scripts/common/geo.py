@@ -0,0 +1,158 @@
+import os
+import pickle
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+from common.columns import LAT_COL, LON_COL, TCA_TBASE_COL, NUM_CC_COL, LAYERS_COL
+from common.timeseries import LAYER_VALUES, DEFAULT_CHUNKSIZE, iter_log_chunks
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size in degrees (about 110 m of latitude)
+DEFAULT_CELL_DEG = 0.001
+
+def grid_cells(lat, lon, cell_deg=DEFAULT_CELL_DEG):
+    """
+    (row, col) indices of the fixed global grid cell of every sample.
+    The grid is anchored at (0, 0), so cells are stable across drives and runs.
+    """
+    return (np.floor(np.asarray(lat, dtype=float) / cell_deg).astype(np.int64),
+            np.floor(np.asarray(lon, dtype=float) / cell_deg).astype(np.int64))
+
+class GridAggregator:
+    """
+    Collects gridded samples of one operator chunk by chunk.
+
+    Only the cell index and the three binned values are kept per sample
+    (compact dtypes), since per-cell medians need every sample of a cell.
+    """
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._parts = []
+
+    def add(self, chunk):
+        lat = pd.to_numeric(chunk[LAT_COL], errors='coerce').to_numpy(float)
+        lon = pd.to_numeric(chunk[LON_COL], errors='coerce').to_numpy(float)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        if not valid.any():
+            return
+        rows, cols = grid_cells(lat[valid], lon[valid], self.cell_deg)
+        self._parts.append((
+            rows.astype(np.int32), cols.astype(np.int32),
+            pd.to_numeric(chunk[TCA_TBASE_COL], errors='coerce').to_numpy(np.float32)[valid],
+            pd.to_numeric(chunk[NUM_CC_COL], errors='coerce').to_numpy(np.float32)[valid],
+            pd.to_numeric(chunk[LAYERS_COL], errors='coerce').to_numpy(np.float32)[valid],
+        ))
+
+    def statistics(self):
+        """
+        Per-cell statistics: sample count, median T_CA/T_BASE, mean number of
+        CCs and the most frequent MIMO layer count. Returns a DataFrame with one
+        row per occupied cell (cell centres in lat/lon), or None if empty.
+        """
+        if not self._parts:
+            return None
+        rows, cols, ratio, num_cc, layers = (np.concatenate(arrays) for arrays in zip(*self._parts))
+
+        # Dense ids over the occupied cells only
+        cell_keys = (rows.astype(np.int64) << 32) | (cols.astype(np.int64) & 0xFFFFFFFF)
+        unique_keys, cell_id = np.unique(cell_keys, return_inverse=True)
+        n_cells = len(unique_keys)
+
+        stats = {
+            'row': (unique_keys >> 32).astype(np.int64),
+            'col': (unique_keys & 0xFFFFFFFF).astype(np.int32).astype(np.int64),
+            'count': np.bincount(cell_id, minlength=n_cells),
+        }
+        stats['lat'] = (stats['row'] + 0.5) * self.cell_deg
+        stats['lon'] = (stats['col'] + 0.5) * self.cell_deg
+
+        # Median T_CA/T_BASE: sort by (cell, value) once, then pick the middle
+        # element(s) of every cell's run
+        finite = np.isfinite(ratio)
+        ratio_cells, ratio_values = cell_id[finite], ratio[finite].astype(float)
+        order = np.lexsort((ratio_values, ratio_cells))
+        ratio_cells, ratio_values = ratio_cells[order], ratio_values[order]
+        counts = np.bincount(ratio_cells, minlength=n_cells)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        median = np.full(n_cells, np.nan)
+        has_ratio = counts > 0
+        lo = starts[has_ratio] + (counts[has_ratio] - 1) // 2
+        hi = starts[has_ratio] + counts[has_ratio] // 2
+        median[has_ratio] = (ratio_values[lo] + ratio_values[hi]) / 2
+        stats['tca_tbase_median'] = median
+
+        # Mean number of CCs
+        finite = np.isfinite(num_cc)
+        cc_counts = np.bincount(cell_id[finite], minlength=n_cells)
+        cc_sums = np.bincount(cell_id[finite], weights=num_cc[finite], minlength=n_cells)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats['num_cc_mean'] = np.where(cc_counts > 0, cc_sums / cc_counts, np.nan)
+
+        # Layer mode from per-(cell, layer) counts
+        layer_counts = np.stack([np.bincount(cell_id[layers == layer], minlength=n_cells)
+                                 for layer in LAYER_VALUES], axis=1)
+        mode = np.array(LAYER_VALUES, dtype=float)[np.argmax(layer_counts, axis=1)]
+        stats['layer_mode'] = np.where(layer_counts.sum(axis=1) > 0, mode, np.nan)
+
+        return pd.DataFrame(stats)
+
+def _grid_cache_key(log_paths, cell_deg):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(cell_deg).encode())
+    for path in sorted(log_paths):
+        stat = os.stat(path)
+        h.update(f'{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return h.hexdigest()
+
+def build_grid(log_paths, cell_deg=DEFAULT_CELL_DEG, cache_dir=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Grid statistics over all given drive logs of one operator. With cache_dir
+    the result is pickled there and reused until a log or cell_deg changes.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f'grid_{_grid_cache_key(log_paths, cell_deg)}.pkl')
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+
+    aggregator = GridAggregator(cell_deg)
+    for log_path in log_paths:
+        for chunk in iter_log_chunks(log_path, [LAT_COL, LON_COL, TCA_TBASE_COL, NUM_CC_COL, LAYERS_COL],
+                                     chunksize, parse_time=False):
+            aggregator.add(chunk)
+    grid = aggregator.statistics()
+
+    if cache_path and grid is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write then rename, so concurrent runs sharing the cache never read a partial file
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(grid, f)
+        os.replace(tmp_path, cache_path)
+    return grid
+
+def grid_to_cells(grid, value_col, cell_deg=DEFAULT_CELL_DEG):
+    """
+    Corners of the occupied cells with a value of one statistic, as an
+    (n, 4, 2) array of (lon, lat) vertices, and their values. Only occupied
+    cells are drawn, so drives far apart (e.g. in two cities) cost nothing
+    for the empty area between them.
+    """
+    grid = grid[grid[value_col].notna()]
+    lon0 = grid['col'].to_numpy() * cell_deg
+    lat0 = grid['row'].to_numpy() * cell_deg
+    lon1, lat1 = lon0 + cell_deg, lat0 + cell_deg
+    vertices = np.stack([np.column_stack(corner) for corner in
+                         ((lon0, lat0), (lon1, lat0), (lon1, lat1), (lon0, lat1))], axis=1)
+    return vertices, grid[value_col].to_numpy(float)
+
+def grid_extent(grid, cell_deg=DEFAULT_CELL_DEG):
+    """
+    (lon_min, lon_max, lat_min, lat_max) in degrees of the occupied cells
+    """
+    return (grid['col'].min() * cell_deg, (grid['col'].max() + 1) * cell_deg,
+            grid['row'].min() * cell_deg, (grid['row'].max() + 1) * cell_deg)
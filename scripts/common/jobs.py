@@ -0,0 +1,138 @@
+import os
+import time
+import importlib
+import logging
+import traceback
+import contextlib
+from collections import namedtuple
+
+from common.bootstrap import shutdown_pool
+from common.output import record_outputs
+from common.report import failed_figures, reset_report, set_strict, skipped_figures
+from common.variants import use_variant
+
+logger = logging.getLogger(__name__)
+
+# One renderable unit: a script's main() called with kwargs, the pkl inputs it
+# reads and the figure name prefixes it writes.
+FigureJob = namedtuple('FigureJob', ['name', 'script', 'inputs', 'outputs', 'kwargs'])
+
+BOX_DATA_TYPES = ['TPUT', 'MCS', 'RSRP', 'CQI', 'BANDWIDTH']
+
+def _build_jobs():
+    jobs = [
+        FigureJob('bar_ca_layer', 'bar_ca_layer', ('bar_ca_layer_dl.pkl', 'bar_ca_layer_ul.pkl', 'ca_mimo_cube.pkl'), ('bar_ca_layers_',), {}),
+        FigureJob('ca_percentage_dl', 'ca_percentage_dl', ('bar_ca_type_distribution_dl.pkl', 'ca_mimo_cube.pkl'), ('bar_ca_type_distribution_',), {}),
+        FigureJob('ca_percentage_ul', 'ca_percentage_ul', ('bar_ca_type_distribution_ul.pkl', 'ca_mimo_cube.pkl'), ('bar_ca_type_distribution_',), {}),
+        FigureJob('cdf_bandwidth_ratio', 'cdf_bandwidth_ratio', ('cdf_bandwidth_ratio_dl.pkl', 'cdf_bandwidth_ratio_ul.pkl'), ('cdf_bandwidth_ratio_',), {}),
+        FigureJob('cdf_tput', 'cdf_tput', ('cdf_tput_dl.pkl', 'cdf_tput_ul.pkl'), ('cdf_tput_',), {}),
+        FigureJob('cdf_tput_ratio', 'cdf_tput_ratio', ('cdf_tput_ratio_dl.pkl', 'cdf_tput_ratio_ul.pkl'), ('cdf_tput_ratio_',), {}),
+        FigureJob('mimo_layer_dl', 'mimo_layer_dl', ('bar_mimo_layer_all_cells_dl.pkl', 'ca_mimo_cube.pkl'), ('bar_mimo_layer_all_cells_',), {}),
+        FigureJob('mimo_layer_ul', 'mimo_layer_ul', ('bar_mimo_layer_all_cells_ul.pkl', 'ca_mimo_cube.pkl'), ('bar_mimo_layer_all_cells_',), {}),
+        FigureJob('mimo_mode_dl', 'mimo_mode_dl', ('bar_mimo_mode_all_cells_dl.pkl', 'ca_mimo_cube.pkl'), ('bar_mimo_mode_all_cells_',), {}),
+        FigureJob('mimo_mode_ul', 'mimo_mode_ul', ('bar_mimo_mode_all_cells_ul.pkl', 'ca_mimo_cube.pkl'), ('bar_mimo_mode_all_cells_',), {}),
+        FigureJob('stats_ca_tput', 'stats_ca_tput', ('box_ca_tput_dl.pkl', 'box_ca_tput_ul.pkl'), ('stats_ca_tput_',), {}),
+        # Reads per-sample drive logs under logs/dl/ rather than a pickle
+        FigureJob('timeseries_tput', 'timeseries_tput', (), ('timeseries_',), {}),
+        FigureJob('geo_heatmap', 'geo_heatmap', (), ('geo_',), {}),
+    ]
+    # The box scripts render one figure family per data type, so split them
+    # per type to re-render only what a changed pickle feeds
+    for data_type in BOX_DATA_TYPES:
+        jobs.append(FigureJob(
+            f'box_ca_tput:{data_type}', 'box_ca_tput',
+            (f'box_ca_{data_type.lower()}_dl.pkl', f'box_ca_{data_type.lower()}_ul.pkl'),
+            (f'box_ca_{data_type.lower()}_',),
+            {'data_types': [data_type]}
+        ))
+        jobs.append(FigureJob(
+            f'box_mimo_tput:{data_type}', 'box_mimo_tput',
+            (f'box_mimo_{data_type.lower()}_dl.pkl', f'box_mimo_{data_type.lower()}_ul.pkl'),
+            (f'box_mimo_{data_type.lower()}_',),
+            {'data_types': [data_type]}
+        ))
+    return jobs
+
+FIGURE_JOBS = _build_jobs()
+
+def jobs_for_input(pkl_name):
+    return [job for job in FIGURE_JOBS if pkl_name in job.inputs]
+
+def jobs_for_logs():
+    # The jobs without pkl inputs read the drive logs
+    return [job for job in FIGURE_JOBS if not job.inputs]
+
+def jobs_for_script(script):
+    return [job for job in FIGURE_JOBS if job.script == script]
+
+class JobFailed(Exception):
+    """
+    A job raised; carries the error, its traceback and the job's log records
+    back from a pool worker
+    """
+    def __init__(self, job, error, trace, log):
+        super().__init__(job, error, trace, log)
+        self.job = job
+        self.error = error
+        self.trace = trace
+        self.log = log
+
+    def __str__(self):
+        return f"{self.job}: {self.error}"
+
+class JobLogHandler(logging.Handler):
+    """
+    Collect the log records of one job in memory as dicts
+    """
+    def __init__(self, level=logging.INFO):
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        # fontTools logs every font subsetting step at INFO while PDFs are saved
+        if record.name.startswith('fontTools') and record.levelno < logging.WARNING:
+            return
+        self.records.append({
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        })
+
+def run_job(job, strict=False, variant=None):
+    """
+    Import the job's script and run its main() with the job kwargs, for the
+    given dataset variant (common.variants) or the one the environment selects.
+    Returns the figures it wrote, skipped and failed, and the job's log
+    records. In strict mode the first failure is raised as JobFailed instead
+    (see common.report).
+    """
+    set_strict(strict)
+    handler = JobLogHandler()
+    root = logging.getLogger()
+    previous_level = root.level
+    root.addHandler(handler)
+    root.setLevel(min(previous_level, logging.INFO))
+    logging.captureWarnings(True)
+    try:
+        module = importlib.import_module(job.script)
+        logger.info(f"Running job {job.name}" + (f" ({variant.name})" if variant else ""))
+        reset_report()
+        start = time.perf_counter()
+        with use_variant(variant) if variant else contextlib.nullcontext(), record_outputs() as outputs:
+            module.main(**job.kwargs)
+    except Exception as e:
+        raise JobFailed(job.name, f'{type(e).__name__}: {e}', traceback.format_exc(), handler.records) from None
+    finally:
+        shutdown_pool()
+        logging.captureWarnings(False)
+        root.removeHandler(handler)
+        root.setLevel(previous_level)
+    return {
+        'job': job.name,
+        'elapsed_s': round(time.perf_counter() - start, 3),
+        'outputs': [os.path.basename(path) for path in outputs],
+        'skipped': [{'figure': figure, 'reason': reason} for figure, reason in skipped_figures()],
+        'failed': [{'figure': figure, 'error': f'{type(error).__name__}: {error}'} for figure, error in failed_figures()],
+        'log': handler.records,
+    }
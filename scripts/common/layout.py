@@ -0,0 +1,319 @@
+import os
+import logging
+from functools import lru_cache
+from contextlib import contextmanager
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
+from matplotlib.backend_bases import FigureCanvasBase
+from matplotlib.figure import Figure
+from matplotlib.legend import Legend
+from matplotlib.transforms import Bbox
+
+logger = logging.getLogger(__name__)
+
+# Layout mode of the figures, from PAM_LAYOUT:
+# - 'tight' (default): every figure runs tight_layout() (or figure.autolayout)
+#   and savefig(bbox_inches='tight'), i.e. two or three layout passes.
+# - 'fixed': the subplot margins and the tight bounding box are computed once
+#   per layout signature (figure size, axes positions and the extents of
+#   everything the layout measures; see signature()) and reused by every
+#   later figure with the same signature, which then saves in a single draw.
+#   The first figure of each signature goes through the 'tight' path, so the
+#   output is unchanged.
+LAYOUT_MODES = ('tight', 'fixed')
+
+# Subplot parameters by (how the layout ran, pre-layout signature)
+_layouts = {}
+# Tight bounding boxes (before padding) by (format, dpi, post-layout signature)
+_bboxes = {}
+
+_SUBPLOT_PARAMS = ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+
+# Private attributes signature() and _output_renderer() read, by the object
+# that holds them
+_PRIVATE_ATTRIBUTES = {
+    'legend': ('_loc', '_bbox_to_anchor', '_legend_box', '_fontsize'),
+    'axes': ('_left_title', '_right_title'),
+    'canvas': ('_is_saving', '_device_pixel_ratio'),
+}
+
+# Set once measuring a figure failed: later figures take the 'tight' path
+_unsupported = False
+
+def layout_mode():
+    mode = os.environ.get('PAM_LAYOUT') or 'tight'
+    if mode not in LAYOUT_MODES:
+        raise ValueError(f"Unsupported layout mode: {mode} (expected one of {', '.join(LAYOUT_MODES)})")
+    return mode
+
+@lru_cache(maxsize=None)
+def _internals():
+    """
+    The matplotlib internals the 'fixed' mode measures and saves with, or
+    None if this matplotlib version lacks them. They are only imported in
+    that mode, so the default 'tight' path uses public APIs alone.
+    """
+    try:
+        from matplotlib.backend_bases import _get_renderer
+        from matplotlib.cbook import _setattr_cm
+        from matplotlib.layout_engine import TightLayoutEngine
+    except ImportError:
+        TightLayoutEngine = None
+    supported = TightLayoutEngine is not None and (hasattr(FigureCanvasBase, '_switch_canvas_and_return_print_method')
+                                                   and hasattr(Figure, '_get_renderer'))
+    if supported:
+        # Instance attributes, so look for them on a throwaway figure
+        fig = Figure()
+        ax = fig.add_subplot()
+        holders = {'legend': Legend(ax, [], []), 'axes': ax, 'canvas': fig.canvas}
+        supported = all(hasattr(holders[holder], name)
+                        for holder, names in _PRIVATE_ATTRIBUTES.items() for name in names)
+    if not supported:
+        logger.warning(f"matplotlib {mpl.__version__} lacks the internals of the fixed layout mode, "
+                       f"using tight layouts")
+        return None
+    return _get_renderer, _setattr_cm, TightLayoutEngine
+
+def _fixed_layout():
+    """
+    Whether the 'fixed' mode is selected and this matplotlib supports it;
+    otherwise figures take the 'tight' path
+    """
+    return layout_mode() == 'fixed' and not _unsupported and _internals() is not None
+
+def _give_up(error):
+    """
+    Switch this process to the 'tight' path after measuring a figure failed
+    """
+    global _unsupported
+    if not _unsupported:
+        logger.warning(f"Cannot measure figure layouts with matplotlib {mpl.__version__} "
+                       f"({type(error).__name__}: {error}), using tight layouts")
+    _unsupported = True
+
+def clear_layout_cache():
+    _layouts.clear()
+    _bboxes.clear()
+
+def _bounds(bbox):
+    return tuple(bbox.bounds) if bbox is not None else None
+
+def _placed_inside(legend, axes_box, renderer):
+    """
+    Whether a loc='best' legend anchored to its axes fits inside them: every
+    place 'best' chooses from is then inside the axes box, so the legend is
+    known not to widen the layout without the costly search for its place
+    """
+    if legend._loc != 0 or legend._bbox_to_anchor is not None:
+        return False
+    size = legend._legend_box.get_bbox(renderer)
+    pad = 2 * legend.borderaxespad * renderer.points_to_pixels(legend._fontsize)
+    return size.width + pad <= axes_box.width and size.height + pad <= axes_box.height
+
+def _axes_key(ax, renderer):
+    """
+    The parts Axes.get_tightbbox() unites, by their extents: the axes box,
+    its axes (tick labels, offset text and label), titles and the artists
+    that are not clipped to the axes
+    """
+    key = [ax.get_visible(), ax.axison, tuple(ax.get_position(original=True).bounds),
+           tuple(ax.get_position().bounds), ax.get_aspect(), ax.get_box_aspect()]
+    if ax.get_aspect() != 'auto' or ax.get_box_aspect() is not None:
+        # apply_aspect() fits the axes box to the data limits
+        key.extend((ax.get_xlim(), ax.get_ylim(), ax.get_adjustable(), ax.get_anchor()))
+    locator = ax.get_axes_locator()
+    if locator is not None:
+        key.append(_bounds(locator(ax, renderer)))
+    subplotspec = ax.get_subplotspec()
+    if subplotspec is not None:
+        gridspec = subplotspec.get_gridspec()
+        key.append((subplotspec.get_geometry(), tuple(gridspec.get_width_ratios() or ()),
+                    tuple(gridspec.get_height_ratios() or ())))
+    for title in (ax.title, ax._left_title, ax._right_title):
+        if title.get_visible():
+            key.append(_bounds(title.get_window_extent(renderer)))
+    # Only the union of the axes and the other artists with the axes box
+    # counts, so that tick labels and data inside the axes leave the key
+    # alone. Axes.get_tightbbox() and Figure.get_tightbbox() drop empty
+    # boxes slightly differently.
+    axes_box = ax.get_window_extent(renderer)
+    in_axes, in_figure = [axes_box], [axes_box]
+    for axis in (ax.xaxis, ax.yaxis):
+        if ax.axison and axis.get_visible():
+            bbox = axis.get_tightbbox(renderer, for_layout_only=True)
+            if bbox is not None:
+                in_axes.append(bbox)
+                in_figure.append(bbox)
+    for artist in ax.get_default_bbox_extra_artists():
+        if isinstance(artist, Legend) and _placed_inside(artist, axes_box, renderer):
+            continue
+        bbox = artist.get_tightbbox(renderer)
+        if bbox is None or not (np.isfinite(bbox.width) and np.isfinite(bbox.height)):
+            continue
+        if bbox.width > 0 and bbox.height > 0:
+            in_axes.append(bbox)
+        if bbox.width != 0 or bbox.height != 0:
+            in_figure.append(bbox)
+    key.extend((_bounds(Bbox.union(in_axes)), _bounds(Bbox.union(in_figure))))
+    return tuple(key)
+
+def signature(fig, renderer):
+    """
+    Hashable description of everything the subplot margins and the tight
+    bounding box of a figure depend on, with the renderer that lays it out:
+    figure size and subplot parameters, the grid position of every axes and
+    the extents of its tick labels, titles, legends and other artists that
+    are not clipped to it. Two figures with different data but the same
+    extents lay out alike.
+    """
+    key = [tuple(fig.get_size_inches()), fig.dpi,
+           tuple(getattr(fig.subplotpars, name) for name in _SUBPLOT_PARAMS)]
+    key.extend(_axes_key(ax, renderer) for ax in fig.axes)
+    for artist in fig.get_children():
+        if isinstance(artist, Axes) or artist is fig.patch or not (artist.get_visible() and artist.get_in_layout()):
+            continue
+        key.append(_bounds(artist.get_tightbbox(renderer)))
+    return tuple(key)
+
+@contextmanager
+def _output_renderer(fig, output_format, dpi):
+    """
+    The renderer savefig() lays the figure out with for output_format, with
+    the figure dpi set as while saving (vector formats draw at 72 dpi)
+    """
+    if dpi is None:
+        dpi = mpl.rcParams['savefig.dpi']
+    if dpi == 'figure':
+        dpi = getattr(fig, '_original_dpi', fig.dpi)
+    _get_renderer, _setattr_cm, _ = _internals()
+    with fig.canvas._switch_canvas_and_return_print_method(output_format) as print_method, \
+            _setattr_cm(fig, dpi=dpi), \
+            _setattr_cm(fig.canvas, _device_pixel_ratio=1), \
+            _setattr_cm(fig.canvas, _is_saving=True):
+        yield _get_renderer(fig, print_method)
+
+def _output_signature(fig, output_format, dpi):
+    with _output_renderer(fig, output_format, dpi) as renderer:
+        return signature(fig, renderer)
+
+def _subplot_params(fig):
+    return {name: getattr(fig.subplotpars, name) for name in _SUBPLOT_PARAMS}
+
+def _apply(fig, params):
+    fig.subplots_adjust(**params)
+    # As after Figure.tight_layout(): the margins are set, no engine left to run
+    fig.set_layout_engine('none')
+
+def tight_layout(fig=None):
+    """
+    plt.tight_layout() for the current (or given) figure; in the 'fixed'
+    layout mode the margins are reused from an earlier figure with the same
+    signature
+    """
+    fig = fig or plt.gcf()
+    if not _fixed_layout():
+        fig.tight_layout()
+        return
+    try:
+        # The renderer Figure.tight_layout() measures with
+        key = ('tight_layout', signature(fig, fig._get_renderer()))
+    except Exception as e:
+        _give_up(e)
+        fig.tight_layout()
+        return
+    if key in _layouts:
+        _apply(fig, _layouts[key])
+        return
+    fig.tight_layout()
+    _layouts[key] = _subplot_params(fig)
+
+def _save_laid_out(fig, save_path, bbox, savefig_kwargs):
+    """
+    Save a figure whose margins and bounding box are known, with no layout
+    pass before the draw
+    """
+    if bbox is not None:
+        pad = savefig_kwargs.get('pad_inches')
+        if pad in (None, 'layout'):
+            pad = mpl.rcParams['savefig.pad_inches']
+        savefig_kwargs = {**savefig_kwargs, 'bbox_inches': bbox.padded(pad)}
+    engine = fig.get_layout_engine()
+    with mpl.rc_context({'figure.autolayout': False, 'figure.constrained_layout.use': False}):
+        fig.set_layout_engine(None)
+    try:
+        fig.savefig(save_path, **savefig_kwargs)
+    finally:
+        fig.set_layout_engine(engine)
+
+def savefig(fig, save_path, **savefig_kwargs):
+    """
+    fig.savefig(save_path, **savefig_kwargs); in the 'fixed' layout mode the
+    margins figure.autolayout sets while saving and the tight bounding box
+    are reused from an earlier figure with the same signature
+    """
+    if not _fixed_layout() or savefig_kwargs.get('bbox_extra_artists'):
+        fig.savefig(save_path, **savefig_kwargs)
+        return
+
+    output_format = (savefig_kwargs.get('format') or os.path.splitext(save_path)[1][1:]
+                     or mpl.rcParams['savefig.format']).lower()
+    dpi = savefig_kwargs.get('dpi')
+    bbox_inches = savefig_kwargs.get('bbox_inches') or mpl.rcParams['savefig.bbox']
+    tight = isinstance(bbox_inches, str) and bbox_inches == 'tight'
+
+    TightLayoutEngine = _internals()[2]
+    laid_out = not isinstance(fig.get_layout_engine(), TightLayoutEngine)
+    if laid_out and not tight:
+        _save_laid_out(fig, save_path, None, savefig_kwargs)
+        return
+
+    try:
+        key = _output_signature(fig, output_format, dpi)
+        if not laid_out:
+            # figure.autolayout lays the figure out while saving
+            layout_key = ('autolayout', output_format, dpi, key)
+            if layout_key in _layouts:
+                _apply(fig, _layouts[layout_key])
+                laid_out = True
+                if tight:
+                    key = _output_signature(fig, output_format, dpi)
+    except Exception as e:
+        # Nothing was saved yet; the usual layout passes give the same figure
+        _give_up(e)
+        fig.savefig(save_path, **savefig_kwargs)
+        return
+    if laid_out and not tight:
+        _save_laid_out(fig, save_path, None, savefig_kwargs)
+        return
+    if laid_out:
+        bbox_key = (output_format, dpi, key)
+        if bbox_key in _bboxes:
+            _save_laid_out(fig, save_path, _bboxes[bbox_key], savefig_kwargs)
+            return
+
+    # First figure of its signature: the usual layout passes, remembering their
+    # results. Should savefig() stop calling Figure.get_tightbbox(), nothing is
+    # captured and the bounding box is simply not reused.
+    captured = []
+    get_tightbbox = fig.get_tightbbox
+    def recording_get_tightbbox(*args, **kwargs):
+        bbox = get_tightbbox(*args, **kwargs)
+        captured.append(bbox)
+        return bbox
+    fig.get_tightbbox = recording_get_tightbbox
+    try:
+        fig.savefig(save_path, **savefig_kwargs)
+    finally:
+        del fig.get_tightbbox
+    if not laid_out:
+        _layouts[layout_key] = _subplot_params(fig)
+        if tight:
+            try:
+                bbox_key = (output_format, dpi, _output_signature(fig, output_format, dpi))
+            except Exception as e:
+                _give_up(e)
+                return
+    if tight and captured:
+        _bboxes[bbox_key] = captured[-1]
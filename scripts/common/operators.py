@@ -0,0 +1,108 @@
+import os
+import logging
+
+from common.report import record_skipped
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'operators.toml')
+
+class OperatorIndex:
+    """
+    Lookup index compiled from operators.toml: which operators are plotted per
+    band, which CA types are kept per (band, operator) and which PCell bands are
+    dropped per operator
+    """
+    def __init__(self, config):
+        self.all_operators = tuple(config['operators'])
+        self.ca_types = tuple(config['ca_types'])
+        self.ca_to_num = {ca_type: str(i + 1) for i, ca_type in enumerate(self.ca_types)}
+
+        self._band_operators = {band: tuple(ops) for band, ops in config.get('bands', {}).items()}
+        self.band_types = tuple(self._band_operators)
+        self._ca_filters = {
+            (band, operator): frozenset(ca_types)
+            for band, operator_filters in config.get('ca_filters', {}).items()
+            for operator, ca_types in operator_filters.items()
+        }
+        self._excluded_bands = {op: frozenset(bands) for op, bands in config.get('excluded_bands', {}).items()}
+        self._legend_ccs = {op: frozenset(f'{n}CC' for n in ccs) for op, ccs in config.get('legend_ccs', {}).items()}
+        self._band_class = {band: band_class for band_class, bands in config.get('band_classes', {}).items() for band in bands}
+
+    def operators(self, band_type):
+        return self._band_operators.get(band_type, self.all_operators)
+
+    def allowed_ca_types(self, band_type, operator):
+        """
+        Allowed CA types for a band/operator in plotting order
+        """
+        allowed = self._ca_filters.get((band_type, operator))
+        if allowed is None:
+            return self.ca_types
+        return tuple(ca_type for ca_type in self.ca_types if ca_type in allowed)
+
+    def excluded_bands(self, operator):
+        return self._excluded_bands.get(operator, frozenset())
+
+    def filter_bands(self, operator, band_data):
+        """
+        Drop the operator's excluded PCell bands from a {band: ...} mapping
+        """
+        excluded = self.excluded_bands(operator)
+        if not excluded:
+            return band_data
+        return {band: value for band, value in band_data.items() if band not in excluded}
+
+    def legend_ccs(self, operator):
+        return self._legend_ccs.get(operator)
+
+    def band_class(self, band):
+        """
+        Frequency band class (Low/Mid/mmWave) of an NR band, or None if unknown
+        """
+        return self._band_class.get(band)
+
+    def plan_ca_groups(self, all_ca_stats, band_type, has_data):
+        """
+        Resolve the (operator, CA types) groups to plot for one band before any
+        figure is created. has_data(ca_data, ca_type) decides whether a CA type
+        has samples; operators left without any CA type are skipped.
+        """
+        groups = []
+        for operator in self.operators(band_type):
+            ca_data = all_ca_stats.get(operator, {})
+            if not ca_data:
+                logger.warning(f"{operator} has no {band_type} data, skipping")
+                record_skipped(f'{band_type} {operator}', f"no {band_type} data")
+                continue
+
+            ca_types = [ca_type for ca_type in self.allowed_ca_types(band_type, operator)
+                        if ca_type in ca_data and has_data(ca_data, ca_type)]
+            if not ca_types:
+                logger.warning(f"{operator} has no valid {band_type} data, skipping")
+                record_skipped(f'{band_type} {operator}', "no samples in the allowed CA types")
+                continue
+            groups.append((operator, ca_types))
+        return groups
+
+_index_cache = {}
+
+def load_operator_index(config_path=DEFAULT_CONFIG_PATH):
+    """
+    Load and compile operators.toml, again only when the file changes
+    """
+    config_path = os.path.abspath(config_path)
+    mtime = os.stat(config_path).st_mtime_ns
+    cached = _index_cache.get(config_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    with open(config_path, 'rb') as f:
+        index = OperatorIndex(tomllib.load(f))
+    _index_cache[config_path] = (mtime, index)
+    return index
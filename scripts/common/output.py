@@ -0,0 +1,110 @@
+import os
+import filecmp
+import logging
+import contextlib
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+
+from common.layout import savefig
+
+logger = logging.getLogger(__name__)
+
+# Active output recorders (see record_outputs) and an optional format override
+# that replaces the file extension of every saved figure, e.g. 'png'.
+_recorders = []
+_format_override = None
+
+# Preview renders: with PAM_PREVIEW_DPI set, every figure is saved as a PNG
+# at that resolution in a preview/ directory next to it, without the tight
+# bounding box pass, and no PDF is written.
+PREVIEW_DIRNAME = 'preview'
+DEFAULT_PREVIEW_DPI = 40
+
+# Reproducible output: with PAM_REPRODUCIBLE=1 a figure file carries no
+# creation date (or the one SOURCE_DATE_EPOCH pins, which matplotlib honours
+# in every format; PS/EPS always need it), SVG ids are salted with a fixed
+# string, and a figure whose bytes did not change leaves the existing file
+# untouched, so an unchanged figure keeps both its hash and its mtime.
+REPRODUCIBLE_SVG_SALT = 'pam'
+# savefig() metadata key of the creation date, by format
+_DATE_KEYS = {'pdf': 'CreationDate', 'svg': 'Date'}
+
+def reproducible_output():
+    return os.environ.get('PAM_REPRODUCIBLE') == '1'
+
+def preview_dpi():
+    value = os.environ.get('PAM_PREVIEW_DPI')
+    return int(value) if value else None
+
+def figure_dir(plots_dir):
+    """
+    Directory the figures of plots_dir are saved to: plots_dir itself, or its
+    preview/ directory in preview renders
+    """
+    return os.path.join(plots_dir, PREVIEW_DIRNAME) if preview_dpi() else plots_dir
+
+def _save_reproducible(fig, save_path, savefig_kwargs):
+    output_format = (savefig_kwargs.get('format') or os.path.splitext(save_path)[1][1:]
+                     or mpl.rcParams['savefig.format']).lower()
+    date_key = _DATE_KEYS.get(output_format)
+    if date_key and not os.environ.get('SOURCE_DATE_EPOCH'):
+        metadata = {**(savefig_kwargs.get('metadata') or {}), date_key: None}
+        savefig_kwargs = {**savefig_kwargs, 'metadata': metadata}
+    rc = {} if mpl.rcParams['svg.hashsalt'] else {'svg.hashsalt': REPRODUCIBLE_SVG_SALT}
+
+    tmp_path = f'{save_path}.tmp'
+    with mpl.rc_context(rc):
+        savefig(fig, tmp_path, **{**savefig_kwargs, 'format': output_format})
+    if os.path.exists(save_path) and filecmp.cmp(tmp_path, save_path, shallow=False):
+        os.remove(tmp_path)
+        logger.debug(f"{save_path} unchanged")
+    else:
+        os.replace(tmp_path, save_path)
+
+def _save(fig, save_path, savefig_kwargs):
+    if reproducible_output():
+        _save_reproducible(fig, save_path, savefig_kwargs)
+    else:
+        savefig(fig, save_path, **savefig_kwargs)
+
+def save_figure(save_path, fig=None, **savefig_kwargs):
+    """
+    Save a figure (the current one by default) and report the written path
+    """
+    if fig is None:
+        fig = plt.gcf()
+    
+    dpi = preview_dpi()
+    if dpi:
+        stem = os.path.splitext(os.path.basename(save_path))[0]
+        save_path = os.path.join(figure_dir(os.path.dirname(save_path)), f'{stem}.png')
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        savefig_kwargs = {**savefig_kwargs, 'dpi': dpi, 'bbox_inches': None}
+        # matplotlibrc asks for tight bounding boxes; 'standard' keeps the figure size
+        with mpl.rc_context({'savefig.bbox': 'standard'}):
+            _save(fig, save_path, savefig_kwargs)
+    else:
+        if _format_override:
+            save_path = f'{os.path.splitext(save_path)[0]}.{_format_override}'
+        _save(fig, save_path, savefig_kwargs)
+    
+    for recorder in _recorders:
+        recorder.append(save_path)
+    return save_path
+
+@contextlib.contextmanager
+def record_outputs(output_format=None):
+    """
+    Collect the paths of all figures saved inside the block
+    """
+    global _format_override
+    saved = []
+    previous_format = _format_override
+    _recorders.append(saved)
+    if output_format:
+        _format_override = output_format
+    try:
+        yield saved
+    finally:
+        _recorders.remove(saved)
+        _format_override = previous_format
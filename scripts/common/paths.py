@@ -0,0 +1,28 @@
+import os
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Input and output roots. The defaults are the directories of this checkout;
+# PAM_PKL_DIR, PAM_PLOTS_DIR and PAM_LOGS_DIR point a run at other ones, so
+# several datasets can be rendered side by side without sharing any files.
+# PAM_FIGURE_SUFFIX replaces the suffix of the figure names (see
+# common/variants.py for named sets of these settings).
+
+DEFAULT_FIGURE_SUFFIX = '_with_integrity'
+
+def pkl_root():
+    return os.environ.get('PAM_PKL_DIR') or os.path.join(REPO_DIR, 'pkl')
+
+def plots_root():
+    return os.environ.get('PAM_PLOTS_DIR') or os.path.join(REPO_DIR, 'plots')
+
+def logs_root():
+    return os.environ.get('PAM_LOGS_DIR') or os.path.join(REPO_DIR, 'logs')
+
+def figure_suffix():
+    """
+    Suffix of the figure names: "_with_integrity" (the paper figures, drawn
+    from the samples that passed the integrity checks) unless
+    PAM_FIGURE_SUFFIX selects another dataset variant's suffix
+    """
+    return os.environ.get('PAM_FIGURE_SUFFIX', DEFAULT_FIGURE_SUFFIX)
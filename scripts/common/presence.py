@@ -0,0 +1,48 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PresenceIndex:
+    """
+    Sparse (band, operator, mode) -> sample count index built in one pass over
+    a pickle, so renderers can tell which figures have data before creating them.
+    Pickles without a mode level use mode=None.
+    """
+    def __init__(self, counts):
+        self.counts = counts
+
+    def count(self, band_type, operator, mode=None):
+        return self.counts.get((band_type, operator, mode), 0)
+
+    def modes_with_data(self, band_type, operator, modes):
+        """
+        The given modes that have samples, in the given order
+        """
+        return [mode for mode in modes if self.count(band_type, operator, mode) > 0]
+
+def _leaf_count(leaf, leaf_key):
+    if not leaf or leaf_key not in leaf:
+        return 0
+    return len(leaf[leaf_key])
+
+def build_presence_index(pkl_data, has_modes=True, leaf_key='All'):
+    """
+    Index the sample counts of a {band: {mode: {operator: {leaf_key: samples}}}}
+    pickle ({band: {operator: {leaf_key: samples}}} when has_modes is False)
+    """
+    counts = {}
+    for band_type, band_stats in pkl_data.items():
+        if not band_stats:
+            continue
+        if has_modes:
+            for mode, operator_stats in band_stats.items():
+                for operator, leaf in operator_stats.items():
+                    n = _leaf_count(leaf, leaf_key)
+                    if n > 0:
+                        counts[(band_type, operator, mode)] = n
+        else:
+            for operator, leaf in band_stats.items():
+                n = _leaf_count(leaf, leaf_key)
+                if n > 0:
+                    counts[(band_type, operator, None)] = n
+    return PresenceIndex(counts)
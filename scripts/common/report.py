@@ -0,0 +1,75 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Figures that were not rendered during this run, as (figure, reason) pairs
+_skipped = []
+
+# Figures whose plot function raised, as (figure, exception) pairs
+_failed = []
+
+# Strict mode: plot errors and missing inputs propagate instead of being
+# logged. None follows PAM_STRICT=1; set_strict() overrides it.
+_strict = None
+
+def set_strict(enabled):
+    global _strict
+    _strict = enabled
+
+def strict_mode():
+    if _strict is not None:
+        return _strict
+    return os.environ.get('PAM_STRICT') == '1'
+
+def record_skipped(figure, reason):
+    _skipped.append((figure, reason))
+
+def skipped_figures():
+    return list(_skipped)
+
+def record_failure(figure, error):
+    """
+    Record a figure whose plot function raised; in strict mode the error is
+    re-raised so the run stops
+    """
+    _failed.append((figure, error))
+    if strict_mode():
+        raise error
+
+def record_input_failure(pkl_filename, error):
+    """
+    Record an input pickle that failed its schema check like a failed figure
+    (re-raised in strict mode), so a script can go on with its other inputs
+    """
+    logger.error(str(error))
+    record_failure(os.path.basename(pkl_filename), error)
+
+def failed_figures():
+    return list(_failed)
+
+def missing_input(path):
+    """
+    Report a missing input file: skipped normally, FileNotFoundError in strict mode
+    """
+    logger.warning(f"Pickle file not found: {path}")
+    if strict_mode():
+        raise FileNotFoundError(f"Input not found: {path}")
+    record_skipped(os.path.basename(path), "input not found")
+
+def reset_report():
+    _skipped.clear()
+    _failed.clear()
+
+def log_report():
+    """
+    Log the figures skipped or failed during this run and why
+    """
+    if _skipped:
+        logger.info(f"Skipped {len(_skipped)} figure(s):")
+        for figure, reason in _skipped:
+            logger.info(f"  {figure}: {reason}")
+    if _failed:
+        logger.error(f"Failed {len(_failed)} figure(s):")
+        for figure, error in _failed:
+            logger.error(f"  {figure}: {type(error).__name__}: {error}")
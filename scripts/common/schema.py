@@ -0,0 +1,220 @@
+import os
+import json
+import logging
+import numbers
+import numpy as np
+from collections import namedtuple
+
+from common.operators import load_operator_index
+
+logger = logging.getLogger(__name__)
+
+# Manifest next to the pickles: {file name: {'family', 'schema_version', 'size', 'keys'}}.
+# It is read before a pickle is unpickled, so a wrong version or a missing
+# top-level key fails without loading the file.
+MANIFEST_FILENAME = 'manifest.json'
+
+class SchemaError(ValueError):
+    """
+    A pickle does not have the nesting or leaf types of its family
+    """
+
+# One nesting level of a pickle. allowed: tuple of key names, a vocabulary of
+# operators.toml ('band_types', 'all_operators', 'ca_types'), 'numeric' for
+# number keys (MIMO layers) or None for any string key. required: keys that
+# must be present.
+Level = namedtuple('Level', ['name', 'allowed', 'required'], defaults=[None, ()])
+
+# leaf: 'samples' (1-D numeric arrays) or 'count' (non-negative integers).
+# fields: keys of the dict holding the sample arrays, or () if the level
+# values are the arrays themselves.
+FamilySchema = namedtuple('FamilySchema', ['version', 'levels', 'leaf', 'fields'])
+
+TPUT_MODES = ('Tput_0', 'Tput_1', 'Tput_2', 'Tput_3')
+RATIO_MODES = ('T_ca_T_base', 'T_mimo_T_base', 'T_total_T_base')
+
+_BAND = Level('band', 'band_types', 'band_types')
+_OPERATOR = Level('operator', 'all_operators')
+_CA_TYPE = Level('ca_type', 'ca_types')
+_LAYER = Level('layer', 'numeric')
+
+def _box_ca(fields):
+    return FamilySchema(1, (_BAND, _OPERATOR, _CA_TYPE), 'samples', fields)
+
+def _bar_cells(category):
+    return FamilySchema(1, (_OPERATOR, Level('cell'), Level('band'), category), 'count', ())
+
+SCHEMAS = {
+    'bar_ca_layer': _box_ca(('values',)),
+    'box_ca_tput': _box_ca(('Tca', 'Tt')),
+    **{f'box_ca_{metric}': _box_ca(('values',)) for metric in ('mcs', 'rsrp', 'cqi', 'bandwidth', 'layers')},
+    **{f'box_mimo_{metric}': FamilySchema(1, (_BAND, _OPERATOR, _LAYER), 'samples', ())
+       for metric in ('tput', 'mcs', 'rsrp', 'cqi', 'bandwidth')},
+    'cdf_tput': FamilySchema(1, (_BAND, Level('tput_mode', None, TPUT_MODES), _OPERATOR), 'samples', ('All',)),
+    'cdf_tput_ratio': FamilySchema(1, (_BAND, Level('ratio_mode', None, RATIO_MODES), _OPERATOR), 'samples', ('All',)),
+    'cdf_bandwidth_ratio': FamilySchema(1, (_BAND, _OPERATOR), 'samples', ('All',)),
+    'bar_ca_type_distribution': FamilySchema(1, (_OPERATOR, Level('band'), Level('ca_label')), 'count', ()),
+    'bar_mimo_layer_all_cells': _bar_cells(_LAYER),
+    'bar_mimo_mode_all_cells': _bar_cells(Level('mimo_mode')),
+}
+
+def _vocabulary(spec, index):
+    if isinstance(spec, str):
+        return getattr(index, spec)
+    return spec
+
+def _format_path(path):
+    return ''.join(f'[{key!r}]' for key in path)
+
+def _fail(source, path, message):
+    location = f' at {_format_path(path)}' if path else ''
+    raise SchemaError(f"{os.path.basename(source)}{location}: {message}")
+
+def _check_keys(node, path, level, index, source):
+    if not isinstance(node, dict):
+        _fail(source, path, f"expected a dict of {level.name} keys, found {type(node).__name__}")
+    allowed = level.allowed
+    if allowed == 'numeric':
+        bad = [key for key in node if not isinstance(key, numbers.Real) or isinstance(key, bool)]
+        if bad:
+            _fail(source, path, f"{level.name} keys must be numbers, found {bad[0]!r}")
+    elif allowed is not None:
+        allowed = _vocabulary(allowed, index)
+        bad = [key for key in node if key not in allowed]
+        if bad:
+            _fail(source, path, f"unknown {level.name} {bad[0]!r} (expected one of {', '.join(map(str, allowed))})")
+    missing = [key for key in _vocabulary(level.required, index) if key not in node]
+    if missing:
+        _fail(source, path, f"missing {level.name} {missing[0]!r} (found {', '.join(map(repr, node)) or 'no keys'})")
+
+def _collect_leaves(data, family, schema, index, source, prefix=()):
+    """
+    Check the keys of every nesting level and return the (path, leaf) pairs.
+    prefix: path of data inside the whole pickle when it is one branch of it
+    """
+    nodes = [(tuple(prefix), data)]
+    for level in schema.levels[len(prefix):]:
+        children = []
+        for path, node in nodes:
+            _check_keys(node, path, level, index, source)
+            children.extend((path + (key,), child) for key, child in node.items())
+        nodes = children
+
+    if not schema.fields:
+        return nodes
+    leaves = []
+    for path, node in nodes:
+        if not isinstance(node, dict):
+            _fail(source, path, f"expected a dict with {', '.join(map(repr, schema.fields))}, found {type(node).__name__}")
+        # An empty branch (no samples for that operator/CA type) is allowed
+        if not node:
+            continue
+        for field in schema.fields:
+            if field not in node:
+                found = ', '.join(map(repr, node))
+                _fail(source, path, f"missing {field!r} (found {found}; {family} leaves hold "
+                                    f"{', '.join(map(repr, schema.fields))})")
+            leaves.append((path + (field,), node[field]))
+    return leaves
+
+def _check_sample_leaves(leaves, source):
+    # Typed leaves are checked from their dtype alone; only plain lists are scanned
+    kinds = np.array([leaf.dtype.kind if isinstance(leaf, np.ndarray) else 'L' for _, leaf in leaves])
+    ndims = np.array([leaf.ndim if isinstance(leaf, np.ndarray) else 1 for _, leaf in leaves])
+    bad = ~np.isin(kinds, list('iufL')) | (ndims != 1)
+    for position in np.flatnonzero(kinds == 'L'):
+        path, leaf = leaves[position]
+        if not isinstance(leaf, (list, tuple)):
+            bad[position] = True
+        elif leaf and np.asarray(leaf).dtype.kind not in 'iuf':
+            bad[position] = True
+    if bad.any():
+        path, leaf = leaves[np.flatnonzero(bad)[0]]
+        _fail(source, path, f"expected a 1-D sequence of numbers, found {_describe(leaf)}")
+
+def _check_count_leaves(leaves, source):
+    if not leaves:
+        return
+    is_int = np.array([isinstance(leaf, numbers.Integral) and not isinstance(leaf, bool) for _, leaf in leaves])
+    values = np.array([leaf if ok else -1 for ok, (_, leaf) in zip(is_int, leaves)], dtype=np.int64)
+    bad = ~is_int | (values < 0)
+    if bad.any():
+        path, leaf = leaves[np.flatnonzero(bad)[0]]
+        _fail(source, path, f"expected a non-negative integer count, found {_describe(leaf)}")
+
+def _describe(leaf):
+    if isinstance(leaf, np.ndarray):
+        return f"{leaf.ndim}-D {leaf.dtype} array"
+    if isinstance(leaf, (list, tuple)) and leaf:
+        return f"{type(leaf).__name__} of {type(leaf[0]).__name__}"
+    return repr(leaf) if isinstance(leaf, (str, numbers.Number)) else type(leaf).__name__
+
+def validate(data, family, source='', prefix=()):
+    """
+    Check a loaded pickle against the schema of its family (key names and
+    types at every level, leaf types); raises SchemaError naming the first
+    offending path. Families without a schema are not checked. With a
+    prefix, data is the branch of a pickle at that path (e.g. ('Mid',) for
+    one band partition, see common.data.load_bands) and only the levels
+    below it are checked.
+    """
+    schema = SCHEMAS.get(family)
+    if schema is None:
+        return
+    leaves = _collect_leaves(data, family, schema, load_operator_index(), source, prefix)
+    if schema.leaf == 'count':
+        _check_count_leaves(leaves, source)
+    else:
+        _check_sample_leaves(leaves, source)
+
+def load_manifest(pkl_dir):
+    path = os.path.join(pkl_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def manifest_entry(data, family, pkl_filename):
+    schema = SCHEMAS[family]
+    return {
+        'family': family,
+        'schema_version': schema.version,
+        'size': os.path.getsize(pkl_filename),
+        'keys': [str(key) for key in data],
+    }
+
+def write_manifest(pkl_dir, entries):
+    """
+    Merge {file name: entry} into the manifest of pkl_dir
+    """
+    manifest = load_manifest(pkl_dir)
+    manifest.update(entries)
+    path = os.path.join(pkl_dir, MANIFEST_FILENAME)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=2)
+        f.write('\n')
+    os.replace(f'{path}.tmp', path)
+
+def check_header(pkl_filename, family):
+    """
+    Check a pickle's manifest entry before it is loaded: schema version and
+    top-level keys. Pickles without an entry, or whose size no longer matches
+    it, are only checked by validate() after loading.
+    """
+    schema = SCHEMAS.get(family)
+    if schema is None:
+        return
+    entry = load_manifest(os.path.dirname(os.path.abspath(pkl_filename))).get(os.path.basename(pkl_filename))
+    if entry is None:
+        return
+    if entry.get('size') != os.path.getsize(pkl_filename):
+        logger.warning(f"{os.path.basename(pkl_filename)} changed since its manifest entry was written, "
+                       f"checking the loaded data only")
+        return
+    if entry.get('family') != family or entry.get('schema_version') != schema.version:
+        _fail(pkl_filename, (), f"manifest lists {entry.get('family')} schema v{entry.get('schema_version')}, "
+                                f"this code reads {family} schema v{schema.version}")
+    level = schema.levels[0]
+    missing = [key for key in _vocabulary(level.required, load_operator_index()) if key not in entry.get('keys', [])]
+    if missing:
+        _fail(pkl_filename, (), f"missing {level.name} {missing[0]!r} (manifest lists {', '.join(entry.get('keys', []))})")
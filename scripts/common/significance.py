@@ -0,0 +1,159 @@
+import math
+import hashlib
+import logging
+import numpy as np
+
+from common.bootstrap import MAX_INDEX_ELEMENTS, get_pool
+
+logger = logging.getLogger(__name__)
+
+def sample_digest(x, y):
+    """
+    Content hash of a pair of samples, used to reuse results of unchanged groups
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for values in (x, y):
+        values = np.ascontiguousarray(values, dtype=float)
+        h.update(len(values).to_bytes(8, 'little'))
+        h.update(values.tobytes())
+    return h.hexdigest()
+
+def mann_whitney(x, y):
+    """
+    Two-sided Mann-Whitney U test (normal approximation with tie and
+    continuity correction). Returns (U of x, p-value, rank-biserial correlation).
+    """
+    n1, n2 = len(x), len(y)
+    pooled = np.concatenate([x, y])
+    _, inverse, counts = np.unique(pooled, return_inverse=True, return_counts=True)
+    # Average rank of every distinct value
+    ranks = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+    u1 = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    tie_term = np.sum(counts.astype(float) ** 3 - counts)
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        p_value = 1.0
+    else:
+        z = (abs(u1 - n1 * n2 / 2) - 0.5) / sigma
+        p_value = min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+    rank_biserial = 2 * u1 / (n1 * n2) - 1
+    return float(u1), p_value, float(rank_biserial)
+
+def ks_2samp(x, y):
+    """
+    Two-sided two-sample Kolmogorov-Smirnov test (asymptotic distribution).
+    Returns (D, p-value).
+    """
+    n1, n2 = len(x), len(y)
+    x, y = np.sort(x), np.sort(y)
+    points = np.concatenate([x, y])
+    cdf_x = np.searchsorted(x, points, side='right') / n1
+    cdf_y = np.searchsorted(y, points, side='right') / n2
+    d = float(np.max(np.abs(cdf_x - cdf_y)))
+
+    en = math.sqrt(n1 * n2 / (n1 + n2))
+    lam = (en + 0.12 + 0.11 / en) * d
+    if lam < 1e-3:
+        return d, 1.0
+    k = np.arange(1, 101)
+    p_value = 2 * np.sum((-1.0) ** (k - 1) * np.exp(-2 * k ** 2 * lam ** 2))
+    return d, float(min(max(p_value, 0.0), 1.0))
+
+def permutation_test(x, y, n_permutations=2000, seed=None):
+    """
+    Two-sided permutation test on the difference of means.
+    Each chunk of permutations shuffles a matrix of group labels in one call
+    and sums the x group with a single matrix product.
+    Returns (mean difference, p-value).
+    """
+    n1, n2 = len(x), len(y)
+    pooled = np.concatenate([x, y])
+    total = pooled.sum()
+    observed = x.mean() - y.mean()
+
+    rng = np.random.default_rng(seed)
+    labels = np.zeros(n1 + n2)
+    labels[:n1] = 1.0
+    chunk = max(1, min(n_permutations, MAX_INDEX_ELEMENTS // len(pooled)))
+    # Compare with a small tolerance so ties with the observed value count
+    threshold = abs(observed) * (1 - 1e-12)
+    extreme = 0
+    for start in range(0, n_permutations, chunk):
+        size = min(chunk, n_permutations - start)
+        masks = rng.permuted(np.broadcast_to(labels, (size, len(labels))), axis=1)
+        sums = masks @ pooled
+        diffs = sums / n1 - (total - sums) / n2
+        extreme += int(np.count_nonzero(np.abs(diffs) >= threshold))
+    return float(observed), (extreme + 1) / (n_permutations + 1)
+
+def compare_samples(x, y, n_permutations=2000, seed=None):
+    """
+    Mann-Whitney, KS and permutation tests plus effect sizes for one pair
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x, y = x[np.isfinite(x)], y[np.isfinite(y)]
+    row = {
+        'n_x': len(x),
+        'n_y': len(y),
+        'median_x': float(np.median(x)) if len(x) else np.nan,
+        'median_y': float(np.median(y)) if len(y) else np.nan,
+    }
+    if len(x) == 0 or len(y) == 0:
+        return row
+
+    u, mw_p, rank_biserial = mann_whitney(x, y)
+    d, ks_p = ks_2samp(x, y)
+    mean_diff, perm_p = permutation_test(x, y, n_permutations, seed)
+    pooled_sd = math.sqrt(((len(x) - 1) * x.var(ddof=1 if len(x) > 1 else 0)
+                           + (len(y) - 1) * y.var(ddof=1 if len(y) > 1 else 0))
+                          / max(len(x) + len(y) - 2, 1))
+    row.update({
+        'median_diff': row['median_x'] - row['median_y'],
+        'mean_diff': mean_diff,
+        'mw_u': u,
+        'mw_p': mw_p,
+        'rank_biserial': rank_biserial,
+        'ks_d': d,
+        'ks_p': ks_p,
+        'perm_p': perm_p,
+        'cohens_d': mean_diff / pooled_sd if pooled_sd > 0 else np.nan,
+    })
+    return row
+
+def _compare_task(args):
+    x, y, n_permutations, seed = args
+    return compare_samples(x, y, n_permutations, seed)
+
+def compare_groups(pairs, n_permutations=2000, seed=0, workers=None):
+    """
+    Run compare_samples() for every (x, y) pair of pairs ({key: (x, y)}),
+    one process-pool task per pair. Returns {key: result row}.
+    """
+    keys = list(pairs)
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    tasks = [(np.asarray(pairs[key][0], dtype=float), np.asarray(pairs[key][1], dtype=float),
+              n_permutations, group_seed)
+             for key, group_seed in zip(keys, seeds)]
+    if len(tasks) <= 1 or workers == 1:
+        results = [_compare_task(task) for task in tasks]
+    else:
+        results = list(get_pool(workers).map(_compare_task, tasks))
+    return dict(zip(keys, results))
+
+def adjust_pvalues(p_values):
+    """
+    Benjamini-Hochberg adjusted p-values (NaN entries are left as NaN)
+    """
+    p = np.asarray(p_values, dtype=float)
+    adjusted = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(np.isfinite(p))
+    if len(valid) == 0:
+        return adjusted
+    order = valid[np.argsort(p[valid])]
+    m = len(order)
+    scaled = p[order] * m / np.arange(1, m + 1)
+    adjusted[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return adjusted
@@ -0,0 +1,247 @@
+import os
+import pickle
+import logging
+import numpy as np
+import pandas as pd
+
+from common.columns import BANDWIDTH_COL, CQI_COL, LAYERS_COL, MCS_COL, METRIC_DTYPES, RSRP_COL, TPUT_COL
+from common.data import FAMILY_METRICS, load_pickle, to_typed_array
+from common.operators import load_operator_index
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+
+# File name of the store under pkl/
+STORE_FILENAME = 'sample_store.pkl'
+
+# Categorical tags of every sample. city, date, device and route slice the
+# campaign; direction selects the _dl or _ul pickles; band (class), operator,
+# ca_type and layer are the splits of the per-family pickles.
+STORE_TAGS = ('city', 'date', 'device', 'route', 'direction', 'operator', 'band', 'ca_type', 'layer')
+
+# Per-sample metric columns, kept as float32 with NaN for missing values. UL
+# samples store their UL throughput, MCS and layers under the same (DL)
+# column names, so both directions share the family metrics.
+STORE_METRICS = (TPUT_COL, MCS_COL, RSRP_COL, CQI_COL, BANDWIDTH_COL, LAYERS_COL)
+
+# Tags a family's samples are grouped by, outermost first
+_CA_SPLIT = ('band', 'operator', 'ca_type')
+_MIMO_SPLIT = ('band', 'operator', 'layer')
+
+# Families the store can rebuild: {family: tags the samples are grouped by}.
+# The metric is the family's (common.data.FAMILY_METRICS). box_ca_tput,
+# cdf_tput and the ratio families need per-CC throughputs the drive logs do
+# not carry.
+STORE_FAMILIES = {
+    'bar_ca_layer': _CA_SPLIT,
+    **{f'box_ca_{metric}': _CA_SPLIT for metric in ('mcs', 'rsrp', 'cqi', 'bandwidth', 'layers')},
+    **{f'box_mimo_{metric}': _MIMO_SPLIT for metric in ('tput', 'mcs', 'rsrp', 'cqi', 'bandwidth')},
+}
+
+def _code_dtype(n_labels):
+    return np.int16 if n_labels <= np.iinfo(np.int16).max else np.int32
+
+def _label_order(label):
+    # Numeric labels (layers) sort numerically, MISSING and other strings after them
+    return (isinstance(label, str), label)
+
+class TagIndex:
+    """
+    Inverted index of one categorical tag: the label code of every sample and,
+    per label, the positions of its samples in ascending order (the samples of
+    label i are order[offsets[i]:offsets[i + 1]]).
+    """
+    def __init__(self, labels, codes, order=None, offsets=None):
+        self.labels = tuple(labels)
+        self.codes = np.asarray(codes)
+        if order is None:
+            order = np.argsort(self.codes, kind='stable').astype(np.int32 if len(self.codes) <= np.iinfo(np.int32).max else np.int64)
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(self.codes, minlength=len(self.labels)))])
+        self.order = order
+        self.offsets = offsets
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+
+    def count(self, code):
+        return int(self.offsets[code + 1] - self.offsets[code])
+
+    def rows(self, codes):
+        """
+        Ascending positions of the samples with any of the given label codes
+        """
+        parts = [self.order[self.offsets[code]:self.offsets[code + 1]] for code in codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+class SampleStore:
+    """
+    Column store of per-sample metrics with categorical tags.
+
+    select() cuts the positions of the samples matching a set of tag filters
+    through the tag indexes, and family_data() regroups any selection into
+    the nested dicts of a per-family pickle, so a subset of the campaign
+    renders with the unchanged plotting scripts.
+    """
+    def __init__(self, columns, tags):
+        self.columns = columns
+        self.tags = tags
+        self.size = len(next(iter(columns.values()))) if columns else 0
+
+    def codes_of(self, tag, labels):
+        """
+        Codes of the given labels of a tag; labels the store does not have are skipped
+        """
+        if tag not in self.tags:
+            raise KeyError(f"Unknown tag: {tag} (expected one of {', '.join(self.tags)})")
+        index = self.tags[tag]
+        return np.array([index.positions[label] for label in labels if label in index.positions], dtype=np.int64)
+
+    def select(self, **filters):
+        """
+        Ascending positions of the samples matching every filter, given as
+        tag=label or tag=[labels]. The candidates are the samples of the most
+        selective filter, read from its index; the other filters are checked
+        on those samples only, so the cost follows the size of the subset and
+        not of the campaign.
+        """
+        if not filters:
+            return np.arange(self.size)
+        wanted = {}
+        for tag, labels in filters.items():
+            if isinstance(labels, (str, int, float)):
+                labels = [labels]
+            wanted[tag] = self.codes_of(tag, labels)
+
+        sizes = {tag: sum(self.tags[tag].count(code) for code in codes) for tag, codes in wanted.items()}
+        first = min(sizes, key=sizes.get)
+        rows = self.tags[first].rows(wanted[first])
+        for tag, codes in wanted.items():
+            if tag != first and len(rows):
+                rows = rows[np.isin(self.tags[tag].codes[rows], codes)]
+        return rows
+
+    def family_data(self, family, rows=None):
+        """
+        Samples of the selected rows in the nesting of the family's pickle
+        ({band: {operator: {CA type: {'values': samples}}}} or {band:
+        {operator: {layer: samples}}}), with typed leaves, or {} if no sample
+        is left. Samples without a value or outside the band / operator / CA
+        type vocabularies of operators.toml are left out.
+        """
+        split = STORE_FAMILIES[family]
+        metric = FAMILY_METRICS[family]
+        dtype = np.dtype(METRIC_DTYPES[metric])
+        rows = np.arange(self.size) if rows is None else rows
+        values = self.columns[metric][rows]
+        keep = np.isfinite(values)
+        for tag in split:
+            keep &= np.isin(self.tags[tag].codes[rows], self.codes_of(tag, self._vocabulary(tag)))
+        rows, values = rows[keep], values[keep]
+        if not len(rows):
+            return {}
+        # Every band class is a key of the pickles; bands outside the subset stay empty
+        data = {band: {} for band in self._vocabulary('band')}
+
+        codes = np.stack([self.tags[tag].codes[rows] for tag in split])
+        order = np.lexsort(codes[::-1])
+        codes, values = codes[:, order], values[order]
+        # Group boundaries: wherever any split code changes
+        changes = np.flatnonzero(np.any(codes[:, 1:] != codes[:, :-1], axis=0)) + 1
+        bounds = np.concatenate([[0], changes, [len(values)]])
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            labels = [self.tags[tag].labels[codes[level, start]] for level, tag in enumerate(split)]
+            node = data
+            for label in labels[:-1]:
+                node = node.setdefault(label, {})
+            leaf = to_typed_array(values[start:end], dtype)
+            node[labels[-1]] = {'values': leaf} if split[-1] == 'ca_type' else leaf
+        return data
+
+    def _vocabulary(self, tag):
+        """
+        Labels of a split tag that go into a pickle: the bands, operators and
+        CA types of operators.toml, and every numeric layer
+        """
+        if tag == 'layer':
+            return [label for label in self.tags[tag].labels if not isinstance(label, str)]
+        index = load_operator_index()
+        return {'band': index.band_types, 'operator': index.all_operators, 'ca_type': index.ca_types}[tag]
+
+def build_store(record_chunks):
+    """
+    Sample store from an iterable of DataFrames with one column per tag in
+    STORE_TAGS and per metric in STORE_METRICS. Tags are coded per chunk, so
+    only the codes and the float32 metrics of the campaign are kept in memory.
+    """
+    labels = {tag: {} for tag in STORE_TAGS}
+    codes = {tag: [] for tag in STORE_TAGS}
+    metrics = {metric: [] for metric in STORE_METRICS}
+    for chunk in record_chunks:
+        if chunk.empty:
+            continue
+        for tag in STORE_TAGS:
+            chunk_codes, uniques = pd.factorize(chunk[tag].astype(object), use_na_sentinel=False)
+            mapping = np.array([labels[tag].setdefault(label, len(labels[tag])) for label in uniques], dtype=np.int64)
+            codes[tag].append(mapping[chunk_codes])
+        for metric in STORE_METRICS:
+            metrics[metric].append(pd.to_numeric(chunk[metric], errors='coerce').to_numpy(np.float32))
+    if not metrics[STORE_METRICS[0]]:
+        return None
+
+    tags = {}
+    for tag in STORE_TAGS:
+        # Recode so that label codes follow the sorted labels
+        seen = list(labels[tag])
+        sorted_labels = sorted(seen, key=_label_order)
+        recode = np.empty(len(seen), dtype=np.int64)
+        recode[[labels[tag][label] for label in sorted_labels]] = np.arange(len(seen))
+        tag_codes = recode[np.concatenate(codes[tag])].astype(_code_dtype(len(seen)))
+        tags[tag] = TagIndex(sorted_labels, tag_codes)
+    return SampleStore({metric: np.concatenate(parts) for metric, parts in metrics.items()}, tags)
+
+def save_store(store, pkl_filename):
+    with open(f'{pkl_filename}.tmp', 'wb') as f:
+        pickle.dump({
+            'version': STORE_VERSION,
+            'columns': store.columns,
+            'tags': {tag: {'labels': list(index.labels), 'codes': index.codes,
+                           'order': index.order, 'offsets': index.offsets}
+                     for tag, index in store.tags.items()},
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{pkl_filename}.tmp', pkl_filename)
+
+def load_store(pkl_filename):
+    data = load_pickle(pkl_filename)
+    if data.get('version') != STORE_VERSION:
+        raise ValueError(f"{pkl_filename}: unsupported store version {data.get('version')}")
+    tags = {tag: TagIndex(index['labels'], index['codes'], index['order'], index['offsets'])
+            for tag, index in data['tags'].items()}
+    return SampleStore(data['columns'], tags)
+
+def parse_filters(store, expressions):
+    """
+    {tag: [labels]} from 'tag=label', 'tag=a,b,c' or 'tag=first..last'
+    (an inclusive range over the sorted labels, e.g. ISO dates)
+    """
+    filters = {}
+    for expression in expressions:
+        tag, sep, value = expression.partition('=')
+        tag = tag.strip()
+        if not sep or not value:
+            raise ValueError(f"Filter must look like tag=value: {expression!r}")
+        if tag not in store.tags:
+            raise ValueError(f"Unknown tag {tag!r} (expected one of {', '.join(store.tags)})")
+        labels = store.tags[tag].labels
+        if '..' in value:
+            first, last = (part.strip() for part in value.split('..', 1))
+            selected = [label for label in labels
+                        if (not first or str(label) >= first) and (not last or str(label) <= last)]
+        else:
+            parts = [part.strip() for part in value.split(',')]
+            selected = [label for label in labels if str(label) in parts]
+        filters.setdefault(tag, []).extend(selected)
+    return filters
@@ -0,0 +1,84 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Quantiles reported for CDF figures
+ECDF_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def default_stats_format():
+    """
+    Stats format requested for a whole rebuild via PAM_STATS_FORMAT ('csv' or 'parquet')
+    """
+    return os.environ.get('PAM_STATS_FORMAT') or None
+
+def box_summary(stats, ci=None, **labels):
+    """
+    Row of the statistics of one drawn box (see box_stats in common/boxes.py),
+    plus the bootstrap CI (estimate, low, high) when one was computed
+    """
+    row = dict(labels)
+    row.update({
+        'count': stats['count'],
+        'mean': stats['mean'],
+        'whislo': stats['whislo'],
+        'q1': stats['q1'],
+        'median': stats['med'],
+        'q3': stats['q3'],
+        'whishi': stats['whishi'],
+        'n_fliers': len(stats['fliers']),
+    })
+    if ci is not None:
+        row['ci_low'], row['ci_high'] = ci[1], ci[2]
+    return row
+
+def ecdf_summary(ecdf, **labels):
+    """
+    Sample count and quantiles of one plotted ECDF curve
+    """
+    row = dict(labels)
+    row['count'] = len(ecdf)
+    row['n_dropped'] = ecdf.n_dropped
+    row['mean'] = float(np.mean(ecdf.x)) if len(ecdf) else np.nan
+    for q, value in zip(ECDF_QUANTILES, ecdf.quantile(np.array(ECDF_QUANTILES))):
+        row[f'p{int(q * 100)}'] = value
+    return row
+
+def count_rows(counts, group_col, category_col, **labels):
+    """
+    Count and percentage rows for a {group: {category: count}} mapping
+    """
+    rows = []
+    for group, category_counts in counts.items():
+        total = sum(category_counts.values())
+        for category, count in category_counts.items():
+            row = dict(labels)
+            row.update({
+                group_col: group,
+                category_col: category,
+                'count': count,
+                'percentage': (count/total)*100 if total else 0.0,
+            })
+            rows.append(row)
+    return rows
+
+def write_summary(rows, save_path, stats_format='csv'):
+    """
+    Write summary rows next to a figure: save_path with its extension
+    replaced by .csv or .parquet
+    """
+    if not rows:
+        return None
+    if stats_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported stats format: {stats_format}")
+
+    df = pd.DataFrame(rows)
+    stats_path = f'{os.path.splitext(save_path)[0]}.{stats_format}'
+    if stats_format == 'parquet':
+        df.to_parquet(stats_path, index=False)
+    else:
+        df.to_csv(stats_path, index=False)
+    logger.info(f"Saved stats: {os.path.basename(stats_path)}")
+    return stats_path
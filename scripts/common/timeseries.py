@@ -0,0 +1,129 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from common.columns import TIME_COL, TPUT_COL, LAYERS_COL, NUM_CC_COL
+
+logger = logging.getLogger(__name__)
+
+# MIMO layer counts tracked for layer occupancy
+LAYER_VALUES = (1, 2, 3, 4)
+
+# Rows read per chunk from a drive log
+DEFAULT_CHUNKSIZE = 200_000
+
+def iter_log_chunks(log_path, columns, chunksize=DEFAULT_CHUNKSIZE, parse_time=True):
+    """
+    Read a per-sample drive log (CSV, optionally compressed) chunk by chunk,
+    keeping only the given columns (missing ones are filled with NaN).
+    With parse_time, TIME_COL is parsed and rows without a timestamp dropped.
+    """
+    wanted = {TIME_COL, *columns} if parse_time else set(columns)
+    for chunk in pd.read_csv(log_path, usecols=lambda col: col in wanted, chunksize=chunksize):
+        missing = [col for col in columns if col not in chunk]
+        for col in missing:
+            chunk[col] = np.nan
+        if parse_time:
+            chunk[TIME_COL] = pd.to_datetime(chunk[TIME_COL], errors='coerce')
+            chunk = chunk.dropna(subset=[TIME_COL])
+        yield chunk
+
+class DriveAggregator:
+    """
+    Streaming per-bucket totals of one drive.
+
+    Samples are assigned to fixed-width time buckets (bucket_s seconds) and only
+    additive per-bucket totals are kept: throughput sum and count, CA count sum
+    and count, and per-layer sample counts. Chunks can therefore be added in any
+    split, and memory grows with the number of buckets with samples instead of
+    the number of samples.
+    """
+    def __init__(self, bucket_s=1.0):
+        self.bucket_ns = int(bucket_s * 1e9)
+        self._parts = []
+
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        buckets = chunk[TIME_COL].to_numpy('datetime64[ns]').astype(np.int64) // self.bucket_ns
+        tput = pd.to_numeric(chunk[TPUT_COL], errors='coerce').to_numpy(float)
+        num_cc = pd.to_numeric(chunk[NUM_CC_COL], errors='coerce').to_numpy(float)
+        layers = pd.to_numeric(chunk[LAYERS_COL], errors='coerce').to_numpy(float)
+
+        totals = {
+            'tput_sum': np.nan_to_num(tput),
+            'tput_count': np.isfinite(tput).astype(np.int64),
+            'cc_sum': np.nan_to_num(num_cc),
+            'cc_count': np.isfinite(num_cc).astype(np.int64),
+        }
+        for layer in LAYER_VALUES:
+            totals[f'layer_{layer}'] = (layers == layer).astype(np.int64)
+        part = pd.DataFrame(totals, index=pd.Index(buckets, name='bucket'))
+        self._parts.append(part.groupby(level=0).sum())
+        # Merge partial results now and then so the list stays short
+        if len(self._parts) >= 32:
+            self._parts = [self._merged()]
+
+    def _merged(self):
+        return pd.concat(self._parts).groupby(level=0).sum()
+
+    def totals(self):
+        """
+        Per-bucket totals of the buckets with samples, in time order
+        """
+        if not self._parts:
+            return None
+        return self._merged().sort_index()
+
+def rolling_window(totals, window_s, bucket_s=1.0):
+    """
+    Rolling-window means over per-bucket totals: throughput, CA count and the
+    share of samples per MIMO layer count. Windows without samples are NaN.
+    Returns a DataFrame indexed by seconds since the start of the drive.
+
+    The means are evaluated on every bucket whose trailing window can hold
+    samples and on the first empty window after each longer gap, which breaks
+    the plotted line there; the rest of a gap is not materialized, so a stray
+    timestamp far from the drive costs one row rather than the whole span.
+    """
+    window = max(1, int(round(window_s / bucket_s)))
+    buckets = totals.index.to_numpy()
+
+    # Up to window + 1 buckets from each bucket with samples, stopping at the next one
+    lengths = np.minimum(np.diff(buckets, append=buckets[-1] + 1), window + 1)
+    group_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    points = np.repeat(buckets, lengths) + (np.arange(lengths.sum()) - group_starts)
+    upper = np.searchsorted(buckets, points, side='right')
+    lower = np.searchsorted(buckets, points - window, side='right')
+
+    def rolling_sum(values):
+        # Trailing window sums (points - window, points] from one cumulative sum
+        csum = np.concatenate([[0], np.cumsum(values, dtype=float)])
+        return csum[upper] - csum[lower]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tput_count = rolling_sum(totals['tput_count'].to_numpy())
+        cc_count = rolling_sum(totals['cc_count'].to_numpy())
+        result = {
+            'tput': rolling_sum(totals['tput_sum'].to_numpy()) / np.where(tput_count > 0, tput_count, np.nan),
+            'num_cc': rolling_sum(totals['cc_sum'].to_numpy()) / np.where(cc_count > 0, cc_count, np.nan),
+        }
+        layer_sums = {layer: rolling_sum(totals[f'layer_{layer}'].to_numpy()) for layer in LAYER_VALUES}
+        layer_total = np.sum(list(layer_sums.values()), axis=0)
+        for layer, layer_sum in layer_sums.items():
+            result[f'layer_{layer}'] = layer_sum / np.where(layer_total > 0, layer_total, np.nan)
+
+    elapsed_s = (points - buckets[0]) * bucket_s
+    return pd.DataFrame(result, index=pd.Index(elapsed_s, name='elapsed_s'))
+
+def aggregate_drive(log_path, window_s=10.0, bucket_s=1.0, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream one drive log and return its rolling-window series (or None if empty)
+    """
+    aggregator = DriveAggregator(bucket_s)
+    for chunk in iter_log_chunks(log_path, [TPUT_COL, NUM_CC_COL, LAYERS_COL], chunksize):
+        aggregator.add(chunk)
+    totals = aggregator.totals()
+    if totals is None:
+        return None
+    return rolling_window(totals, window_s, bucket_s)
@@ -0,0 +1,74 @@
+import os
+import contextlib
+from collections import namedtuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+from common.paths import REPO_DIR, figure_suffix, logs_root, pkl_root, plots_root
+
+DEFAULT_CONFIG_PATH = os.path.join(REPO_DIR, 'scripts', 'variants.toml')
+
+# One rendering of the figures: where its pickles and drive logs are read
+# from, where its figures go and the suffix of the figure names
+Variant = namedtuple('Variant', ['name', 'pkl_dir', 'plots_dir', 'logs_dir', 'suffix'])
+
+# Variant field -> environment variable read by common/paths.py
+_ENVIRONMENT = (
+    ('pkl_dir', 'PAM_PKL_DIR'),
+    ('plots_dir', 'PAM_PLOTS_DIR'),
+    ('logs_dir', 'PAM_LOGS_DIR'),
+    ('suffix', 'PAM_FIGURE_SUFFIX'),
+)
+
+# variants.toml key -> Variant field
+_KEYS = {'pkl': 'pkl_dir', 'plots': 'plots_dir', 'logs': 'logs_dir', 'suffix': 'suffix'}
+
+def current_variant(name='default'):
+    """
+    The variant the environment selects (see common/paths.py)
+    """
+    return Variant(name, pkl_root(), plots_root(), logs_root(), figure_suffix())
+
+def load_variants(config_path=DEFAULT_CONFIG_PATH):
+    """
+    Variants of variants.toml in file order, as {name: Variant}
+    """
+    with open(config_path, 'rb') as f:
+        config = tomllib.load(f)
+
+    variants = {}
+    for name, settings in config.items():
+        unknown = [key for key in settings if key not in _KEYS]
+        if unknown:
+            raise ValueError(f"{os.path.basename(config_path)}: unknown setting {unknown[0]!r} of variant {name!r} "
+                             f"(expected {', '.join(_KEYS)})")
+        if 'pkl' not in settings or 'plots' not in settings:
+            raise ValueError(f"{os.path.basename(config_path)}: variant {name!r} needs both pkl and plots")
+        variants[name] = Variant(
+            name,
+            os.path.join(REPO_DIR, settings['pkl']),
+            os.path.join(REPO_DIR, settings['plots']),
+            os.path.join(REPO_DIR, settings.get('logs', 'logs')),
+            settings.get('suffix', ''),
+        )
+    return variants
+
+@contextlib.contextmanager
+def use_variant(variant):
+    """
+    Point pkl_root(), plots_root(), logs_root() and figure_suffix() at the
+    variant inside the block
+    """
+    previous = {variable: os.environ.get(variable) for _, variable in _ENVIRONMENT}
+    os.environ.update({variable: getattr(variant, field) for field, variable in _ENVIRONMENT})
+    try:
+        yield variant
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
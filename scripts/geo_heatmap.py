@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import os
+import glob
+import logging
+import matplotlib
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import BoundaryNorm, ListedColormap
+from matplotlib.ticker import MaxNLocator
+
+from common.geo import DEFAULT_CELL_DEG, build_grid, grid_extent, grid_to_cells
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import logs_root, plots_root
+from common.report import log_report, record_failure, record_skipped
+from common.summary import default_stats_format, write_summary
+from common.timeseries import LAYER_VALUES
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Set Matplotlib style using relative path
+try:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    style_path = os.path.join(current_dir, 'matplotlibrc')
+    if os.path.exists(style_path):
+        matplotlib.rc_file(style_path)
+    else:
+        # Fallback default style
+        plt.style.use('default')
+        logger.warning(f"matplotlibrc not found at {style_path}, using default style")
+except Exception as e:
+    logger.warning(f"Could not load matplotlibrc: {e}")
+
+# Heatmap configurations per gridded statistic
+GRID_METRIC_CONFIGS = {
+    'tca_tbase_median': {
+        'label': r'Median T$_{CA}$/T$_{BASE}$',
+        'cmap': 'viridis',
+        'filename_prefix': 'geo_tca_tbase'
+    },
+    'num_cc_mean': {
+        'label': 'Mean Number of CCs',
+        'cmap': 'plasma',
+        'filename_prefix': 'geo_num_cc'
+    },
+    'layer_mode': {
+        'label': 'MIMO Layers (Mode)',
+        'cmap': ListedColormap(['#d9d9d9', 'lightblue', 'lightcoral', '#2ca02c']),
+        'filename_prefix': 'geo_layers'
+    }
+}
+
+def plot_geo_heatmap(grid, operator, metric, link_direction='DL', cell_deg=DEFAULT_CELL_DEG, min_samples=10, stats_format=None):
+    """
+    Plot one gridded statistic of an operator as a lat/lon heatmap (no map
+    tiles). Cells with fewer than min_samples samples stay blank.
+    """
+    try:
+        config = GRID_METRIC_CONFIGS[metric]
+        grid = grid[grid['count'] >= min_samples]
+        if grid.empty:
+            logger.warning(f"{operator} has no cells with {min_samples}+ samples, skipping")
+            return
+        if grid[metric].isna().all():
+            logger.warning(f"{operator} has no {metric} samples, skipping")
+            return
+
+        vertices, values = grid_to_cells(grid, metric, cell_deg)
+        fig, ax = plt.subplots(figsize=(8, 7))
+
+        norm = None
+        if metric == 'layer_mode':
+            bounds = np.arange(len(LAYER_VALUES) + 1) + 0.5
+            norm = BoundaryNorm(bounds, config['cmap'].N)
+        # One square per occupied cell rather than an image over the whole bounding box
+        mesh = PolyCollection(vertices, array=values, cmap=config['cmap'], norm=norm,
+                              edgecolors='none', antialiaseds=False)
+        ax.add_collection(mesh)
+        lon_min, lon_max, lat_min, lat_max = grid_extent(grid, cell_deg)
+        ax.set_xlim(lon_min, lon_max)
+        ax.set_ylim(lat_min, lat_max)
+        cbar = fig.colorbar(mesh, ax=ax)
+        if metric == 'layer_mode':
+            cbar.set_ticks(list(LAYER_VALUES))
+        cbar.set_label(config['label'])
+
+        # Degrees of longitude shrink with latitude; keep cells square on the ground
+        mean_lat = np.deg2rad(grid['lat'].mean())
+        ax.set_aspect(1 / max(np.cos(mean_lat), 1e-6))
+        ax.set_xlabel('Longitude')
+        ax.set_ylabel('Latitude')
+        ax.ticklabel_format(useOffset=False)
+        ax.xaxis.set_major_locator(MaxNLocator(3))
+        ax.yaxis.set_major_locator(MaxNLocator(4))
+        plt.setp(ax.get_xticklabels(), rotation=30, ha='right')
+
+        # Adjust layout to prevent label cutoff
+        tight_layout()
+
+        # Create save directory (plots/ unless PAM_PLOTS_DIR is set)
+        plots_dir = plots_root()
+        os.makedirs(plots_dir, exist_ok=True)
+
+        save_path = os.path.join(plots_dir, f'{config["filename_prefix"]}_{operator}_{link_direction.lower()}.pdf')
+        save_figure(save_path, dpi=300, bbox_inches='tight')
+        logger.info(f"Saved plot to {save_path}")
+        if stats_format:
+            rows = grid[['lat', 'lon', 'count', metric]].assign(operator=operator).to_dict('records')
+            write_summary(rows, save_path, stats_format)
+
+        plt.close()
+
+    except Exception as e:
+        logger.error(f"An error occurred during plotting: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        record_failure(f'geo_{metric}_{operator}_{link_direction.lower()}', e)
+
+def main(stats_format=None, cell_deg=DEFAULT_CELL_DEG, min_samples=10):
+    stats_format = stats_format or default_stats_format()
+    # Control variables for the gridded statistics
+    TCA_TBASE = 1
+    NUM_CC = 1
+    LAYERS = 1
+
+    metrics_to_plot = []
+    if TCA_TBASE == 1: metrics_to_plot.append('tca_tbase_median')
+    if NUM_CC == 1: metrics_to_plot.append('num_cc_mean')
+    if LAYERS == 1: metrics_to_plot.append('layer_mode')
+
+    # Per-sample drive logs: logs/dl/<operator>/<drive>.csv[.gz]
+    logs_dir = os.path.join(logs_root(), 'dl')
+    cache_dir = os.path.join(logs_root(), '.cache')
+    if not os.path.isdir(logs_dir):
+        logger.warning(f"Drive log directory not found: {logs_dir}")
+        # Drive logs are not shipped with the artifact, so this is not an error in strict mode
+        record_skipped('geo_*', "no drive logs under logs/dl")
+        log_report()
+        return
+
+    for operator in load_operator_index().all_operators:
+        log_paths = sorted(glob.glob(os.path.join(logs_dir, operator, '*.csv*')))
+        if not log_paths:
+            logger.warning(f"{operator} has no drive logs, skipping")
+            continue
+
+        logger.info(f"Gridding {len(log_paths)} {operator} drive log(s)...")
+        grid = build_grid(log_paths, cell_deg, cache_dir)
+        if grid is None:
+            logger.warning(f"{operator} has no located samples, skipping")
+            continue
+        for metric in metrics_to_plot:
+            plot_geo_heatmap(grid, operator, metric, 'DL', cell_deg, min_samples, stats_format)
+
+    logger.info("Plotting completed.")
+    log_report()
+
+if __name__ == "__main__":
+    main()
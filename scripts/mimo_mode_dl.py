@@ -4,9 +4,18 @@ import matplotlib.pyplot as plt
 import os
 import logging
 import re
-import pickle
 import matplotlib
 
+from common.cube import cube_path, load_cube, mimo_cell_distribution
+from common.data import load_counts
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import pkl_root, plots_root
+from common.report import log_report, missing_input, record_failure, record_input_failure
+from common.schema import SchemaError
+from common.summary import count_rows, default_stats_format, write_summary
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -56,12 +65,13 @@ def classify_5g_type(band, frequency):
         else: return '5G mmWave'
     return None
 
-def plot_mimo_distribution(operator_data, link_direction='DL'):
+def plot_mimo_distribution(operator_data, link_direction='DL', stats_format=None):
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        plots_dir = os.path.join(current_dir, '..', 'plots')
+        plots_dir = plots_root()
         os.makedirs(plots_dir, exist_ok=True)
         
+        operator_index = load_operator_index()
+        
         for operator, data in operator_data.items():
             cell_data = data
             combined_band_mimo_counts = {}
@@ -81,9 +91,8 @@ def plot_mimo_distribution(operator_data, link_direction='DL'):
                 logger.warning(f"{operator} no data, skipping")
                 continue
             
-            if operator == 'TMobile':
-                for banned_band in ('n66', 'n260'):
-                    combined_band_mimo_counts.pop(banned_band, None)
+            if operator_index.excluded_bands(operator):
+                combined_band_mimo_counts = operator_index.filter_bands(operator, combined_band_mimo_counts)
                 if not combined_band_mimo_counts:
                     continue
                 
@@ -147,12 +156,16 @@ def plot_mimo_distribution(operator_data, link_direction='DL'):
                 ncol=legend_ncol,
                 borderaxespad=0.2
             )
-            plt.tight_layout()
+            tight_layout()
             
             x_labels = [f"{band}" for band in sorted_bands]
             plt.xticks(x, x_labels)
             
-            plt.savefig(os.path.join(plots_dir, f'bar_mimo_mode_all_cells_{operator}_dl.pdf'), bbox_inches='tight', dpi=300)
+            save_path = os.path.join(plots_dir, f'bar_mimo_mode_all_cells_{operator}_dl.pdf')
+            save_figure(save_path, bbox_inches='tight', dpi=300)
+            if stats_format:
+                band_counts = {band: combined_band_mimo_counts[band] for band in sorted_bands}
+                write_summary(count_rows(band_counts, 'band', 'mode', operator=operator), save_path, stats_format)
             logger.info(f"Saved plot: bar_mimo_mode_all_cells_{operator}_dl.pdf")
             plt.close()
             
@@ -160,20 +173,30 @@ def plot_mimo_distribution(operator_data, link_direction='DL'):
         logger.error(f"Error during plotting: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        record_failure(f'bar_mimo_mode_all_cells_{link_direction.lower()}', e)
 
-def main():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    pkl_dir = os.path.join(current_dir, '..', 'pkl')
+def main(stats_format=None):
+    stats_format = stats_format or default_stats_format()
+    pkl_dir = pkl_root()
     
+    cube_filename = cube_path(pkl_dir)
     pkl_filename = os.path.join(pkl_dir, 'bar_mimo_mode_all_cells_dl.pkl')
-    if not os.path.exists(pkl_filename):
-        logger.warning(f"Pickle file not found: {pkl_filename}")
-        return
-        
-    with open(pkl_filename, 'rb') as f:
-        dl_operator_data = pickle.load(f)
+    if cube_filename:
+        # Slice the CA x MIMO count cube (PAM_USE_CUBE=1)
+        dl_operator_data = mimo_cell_distribution(load_cube(cube_filename), 'mimo_mode', 'DL')
+    elif os.path.exists(pkl_filename):
+        try:
+            dl_operator_data = load_counts(pkl_filename)
+        except SchemaError as e:
+            record_input_failure(pkl_filename, e)
+            dl_operator_data = None
+    else:
+        missing_input(pkl_filename)
+        dl_operator_data = None
         
-    plot_mimo_distribution(dl_operator_data, link_direction='DL')
+    if dl_operator_data is not None:
+        plot_mimo_distribution(dl_operator_data, link_direction='DL', stats_format=stats_format)
+    log_report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+import pandas as pd
+import os
+import logging
+
+from common.data import direction_pickles, load_bands
+from common.operators import load_operator_index
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.report import log_report, record_failure
+from common.significance import adjust_pvalues, compare_groups, sample_digest
+from common.summary import default_stats_format, write_summary
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def load_previous_results(stats_path, stats_format):
+    """
+    Rows of an earlier results table keyed by (band, operator, ca_type), or {}
+    """
+    if not os.path.exists(stats_path):
+        return {}
+    try:
+        if stats_format == 'parquet':
+            df = pd.read_parquet(stats_path)
+        else:
+            df = pd.read_csv(stats_path)
+    except Exception as e:
+        logger.warning(f"Could not read previous results {stats_path}: {e}")
+        return {}
+    return {(row['band'], row['operator'], row['ca_type']): row for row in df.to_dict('records')}
+
+def compare_tca_vs_tt(pkl_data, link_direction='DL', integrity_suffix="", stats_format='csv',
+                      n_permutations=2000, seed=0, workers=None):
+    """
+    Mann-Whitney, KS and permutation tests of Tca against Tt for every
+    (band, operator, CA type) shown in the Tca_vs_Tt box plots, with effect
+    sizes and Benjamini-Hochberg adjusted p-values, written as one table.
+    Groups whose samples are unchanged since the last table are not re-tested.
+    """
+    try:
+        operator_index = load_operator_index()
+
+        # Create save directory (plots/ unless PAM_PLOTS_DIR is set)
+        plots_dir = plots_root()
+        os.makedirs(plots_dir, exist_ok=True)
+        stats_path = os.path.join(plots_dir, f'stats_ca_tput_Tca_vs_Tt_{link_direction.lower()}{integrity_suffix}.{stats_format}')
+        previous = load_previous_results(stats_path, stats_format)
+
+        # Collect every Tca/Tt pair, reusing results of unchanged groups
+        rows = {}
+        pairs = {}
+        digests = {}
+        for band_type in operator_index.band_types:
+            all_ca_stats = pkl_data.get(band_type) or {}
+            for operator in operator_index.operators(band_type):
+                ca_data = all_ca_stats.get(operator) or {}
+                for ca_type in operator_index.allowed_ca_types(band_type, operator):
+                    if ca_type not in ca_data:
+                        continue
+                    tca_data = ca_data[ca_type]['Tca']
+                    tt_data = ca_data[ca_type]['Tt']
+                    if len(tca_data) == 0 or len(tt_data) == 0:
+                        continue
+
+                    key = (band_type, operator, ca_type)
+                    digest = digests[key] = sample_digest(tca_data, tt_data)
+                    old = previous.get(key)
+                    if old is not None and old.get('digest') == digest and old.get('n_permutations') == n_permutations:
+                        rows[key] = old
+                    else:
+                        rows[key] = None
+                        pairs[key] = (tca_data, tt_data)
+            # Only the samples of groups left to test stay in memory
+            pkl_data.release(band_type)
+
+        if not rows:
+            logger.warning("No Tca/Tt pairs to test")
+            return None
+
+        logger.info(f"Testing {len(pairs)} Tca/Tt group(s), reusing {len(rows) - len(pairs)}")
+        results = compare_groups(pairs, n_permutations, seed, workers)
+        for key, result in results.items():
+            row = {'band': key[0], 'operator': key[1], 'ca_type': key[2],
+                   'digest': digests[key], 'n_permutations': n_permutations}
+            row.update(result)
+            rows[key] = row
+
+        # Multiple-comparison correction across all groups of the table
+        table = pd.DataFrame(list(rows.values()))
+        for col in ['mw_p', 'ks_p', 'perm_p']:
+            if col in table:
+                table[f'{col}_adj'] = adjust_pvalues(table[col])
+
+        stats_path = write_summary(table.to_dict('records'), stats_path, stats_format)
+        logger.info(f"Saved test results to {stats_path}")
+        return stats_path
+
+    except Exception as e:
+        logger.error(f"An error occurred during testing: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        record_failure(f'stats_ca_tput_Tca_vs_Tt_{link_direction.lower()}', e)
+
+def main(stats_format=None, n_permutations=2000):
+    stats_format = stats_format or default_stats_format() or 'csv'
+
+    integrity_suffix = figure_suffix()
+
+    # Define directory for pkl files
+    pkl_dir = pkl_root()
+
+    for link_direction, pkl_filename in direction_pickles(pkl_dir, 'box_ca_tput'):
+        pkl_data = load_bands(pkl_filename)
+        compare_tca_vs_tt(pkl_data, link_direction, integrity_suffix, stats_format, n_permutations)
+
+    logger.info("Testing completed.")
+    log_report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import os
+import glob
+import logging
+import matplotlib
+
+from common.layout import tight_layout
+from common.operators import load_operator_index
+from common.output import save_figure
+from common.paths import logs_root, plots_root
+from common.report import log_report, record_failure, record_skipped
+from common.summary import default_stats_format, write_summary
+from common.timeseries import LAYER_VALUES, aggregate_drive
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Set Matplotlib style using relative path
+try:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    style_path = os.path.join(current_dir, 'matplotlibrc')
+    if os.path.exists(style_path):
+        matplotlib.rc_file(style_path)
+    else:
+        # Fallback default style
+        plt.style.use('default')
+        logger.warning(f"matplotlibrc not found at {style_path}, using default style")
+except Exception as e:
+    logger.warning(f"Could not load matplotlibrc: {e}")
+
+LAYER_COLORS = ['#d9d9d9', 'lightblue', 'lightcoral', '#2ca02c']
+
+def plot_drive_timeseries(series, operator, drive, link_direction='DL', window_s=10.0, stats_format=None):
+    """
+    Plot rolling-window throughput, CA count and MIMO layer occupancy along one
+    drive, sharing the time axis. series is the output of aggregate_drive().
+    """
+    try:
+        elapsed_min = series.index.to_numpy() / 60
+
+        fig, (ax_tput, ax_cc, ax_layers) = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
+
+        # Rolling throughput
+        ax_tput.plot(elapsed_min, series['tput'], color='tab:blue', linewidth=2)
+        ax_tput.set_ylabel('Tput (Mbps)')
+        ax_tput.grid(True, alpha=0.3)
+
+        # Rolling mean number of CCs
+        ax_cc.plot(elapsed_min, series['num_cc'], color='tab:red', linewidth=2)
+        ax_cc.set_ylabel('CCs')
+        ax_cc.grid(True, alpha=0.3)
+
+        # Share of samples per MIMO layer count, stacked
+        layer_shares = [np.nan_to_num(series[f'layer_{layer}'].to_numpy()) * 100 for layer in LAYER_VALUES]
+        ax_layers.stackplot(elapsed_min, layer_shares, colors=LAYER_COLORS,
+                            labels=[str(layer) for layer in LAYER_VALUES], alpha=0.9)
+        ax_layers.set_ylim(0, 100)
+        ax_layers.set_ylabel('Layers (%)')
+        ax_layers.set_xlabel('Time (min)')
+        ax_layers.legend(loc='upper left', bbox_to_anchor=(1.01, 1), title='Layers')
+        ax_layers.grid(True, alpha=0.3)
+
+        # Adjust layout to prevent label cutoff
+        tight_layout()
+
+        # Create save directory (plots/ unless PAM_PLOTS_DIR is set)
+        plots_dir = plots_root()
+        os.makedirs(plots_dir, exist_ok=True)
+
+        window_label = f'{window_s:g}s'
+        save_path = os.path.join(plots_dir, f'timeseries_{operator}_{drive}_{window_label}_{link_direction.lower()}.pdf')
+        save_figure(save_path, dpi=300, bbox_inches='tight')
+        logger.info(f"Saved plot to {save_path}")
+        if stats_format:
+            rows = series.reset_index().assign(operator=operator, drive=drive, window_s=window_s).to_dict('records')
+            write_summary(rows, save_path, stats_format)
+
+        plt.close()
+
+    except Exception as e:
+        logger.error(f"An error occurred during plotting: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        record_failure(f'timeseries_{operator}_{drive}_{link_direction.lower()}', e)
+
+def main(stats_format=None, window_s=10.0):
+    stats_format = stats_format or default_stats_format()
+    # Aggregation bucket length (seconds)
+    BUCKET_S = 1.0
+
+    # Per-sample drive logs: logs/dl/<operator>/<drive>.csv[.gz]
+    logs_dir = os.path.join(logs_root(), 'dl')
+    if not os.path.isdir(logs_dir):
+        logger.warning(f"Drive log directory not found: {logs_dir}")
+        # Drive logs are not shipped with the artifact, so this is not an error in strict mode
+        record_skipped('timeseries_*', "no drive logs under logs/dl")
+        log_report()
+        return
+
+    for operator in load_operator_index().all_operators:
+        log_paths = sorted(glob.glob(os.path.join(logs_dir, operator, '*.csv*')))
+        if not log_paths:
+            logger.warning(f"{operator} has no drive logs, skipping")
+            continue
+
+        for log_path in log_paths:
+            drive = os.path.basename(log_path).split('.')[0]
+            logger.info(f"Aggregating {operator} drive {drive}...")
+            series = aggregate_drive(log_path, window_s, BUCKET_S)
+            if series is None:
+                logger.warning(f"{log_path} has no timestamped samples, skipping")
+                continue
+            plot_drive_timeseries(series, operator, drive, 'DL', window_s, stats_format)
+
+    logger.info("Plotting completed.")
+    log_report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import glob
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, TESTS_DIR)
+
+from common.data import is_sample_pickle, write_band_partitions
+from figure_fixtures import write_fixtures
+
+GOLDEN_DIR = os.path.join(TESTS_DIR, 'golden')
+# RMS difference (0-255 per channel) a figure may have from its golden image:
+# preview renders, and the publication renders of tests/golden/publication/
+DEFAULT_IMAGE_TOL = 3.0
+DEFAULT_PUBLICATION_TOL = 0.5
+
+def pytest_addoption(parser):
+    parser.addoption('--update-goldens', action='store_true',
+                     help='Write the rendered figures to tests/golden/ instead of comparing against them')
+    parser.addoption('--image-tol', type=float, default=DEFAULT_IMAGE_TOL,
+                     help=f'RMS tolerance of the golden preview comparison (default: {DEFAULT_IMAGE_TOL})')
+    parser.addoption('--publication-tol', type=float, default=DEFAULT_PUBLICATION_TOL,
+                     help=f'RMS tolerance of the golden publication comparison (default: {DEFAULT_PUBLICATION_TOL})')
+
+@pytest.fixture(scope='session')
+def fixture_dirs(tmp_path_factory):
+    """
+    (pkl_dir, logs_dir) with the fixture pickles and drive logs. Built once
+    per session, i.e. once per worker under pytest-xdist.
+    """
+    root = tmp_path_factory.mktemp('fixtures')
+    pkl_dir, logs_dir = str(root / 'pkl'), str(root / 'logs')
+    write_fixtures(pkl_dir, logs_dir)
+    return pkl_dir, logs_dir
+
+@pytest.fixture(scope='session')
+def partitioned_fixture_dirs(tmp_path_factory):
+    """
+    The same fixtures with every sample pickle replaced by its band
+    partitions (see load_bands in common/data.py)
+    """
+    root = tmp_path_factory.mktemp('partitioned')
+    pkl_dir, logs_dir = str(root / 'pkl'), str(root / 'logs')
+    write_fixtures(pkl_dir, logs_dir)
+    for path in glob.glob(os.path.join(pkl_dir, '*.pkl')):
+        if is_sample_pickle(path):
+            write_band_partitions(path)
+            os.remove(path)
+    return pkl_dir, logs_dir
+
+@pytest.fixture(autouse=True)
+def figure_style():
+    """
+    The scripts' matplotlibrc on top of matplotlib's defaults for every test,
+    whatever an earlier test or script import changed
+    """
+    with matplotlib.rc_context():
+        matplotlib.rcdefaults()
+        matplotlib.rc_file(os.path.join(SCRIPTS_DIR, 'matplotlibrc'))
+        yield
+        plt.close('all')
@@ -0,0 +1,139 @@
+"""
+Small seeded fixtures for the figure regression tests: one pickle per family
+and link direction in the schemas of scripts/common/schema.py (with its
+manifest) and a few drive logs in the layout logs/dl/<operator>/<drive>.csv.
+
+The values only need to exercise every code path of the figures; they are
+drawn from a fixed seed, so the rendered figures are the same on every run.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from common.columns import LAT_COL, LAYERS_COL, LON_COL, NUM_CC_COL, TCA_TBASE_COL, TIME_COL, TPUT_COL
+from common.data import LINK_DIRECTIONS
+from common.operators import load_operator_index
+from common.schema import RATIO_MODES, TPUT_MODES, manifest_entry, validate, write_manifest
+
+SEED = 1234
+# Samples per leaf of the sample families
+SAMPLES = 80
+
+# Value range (and whether the values are integers) of each box metric
+BOX_METRICS = {
+    'tput': (0, 900, False),
+    'mcs': (0, 27, True),
+    'rsrp': (-120, -60, False),
+    'cqi': (0, 15, True),
+    'bandwidth': (5, 100, False),
+}
+
+# NR bands, serving cells and MIMO modes of the count tables
+NR_BANDS = ('n5', 'n71', 'n2', 'n66', 'n77', 'n260')
+CELLS = ('PCell', 'SCell[1]', 'SCell[2]')
+MIMO_MODES = {'DL': ('2x2_MIMO', '4x4_MIMO'), 'UL': ('SISO', 'SMSL', 'SMDL')}
+LAYERS = {'DL': (1.0, 2.0, 3.0, 4.0), 'UL': (1.0, 2.0)}
+
+# Drive logs per operator and samples per drive
+DRIVES = 1
+DRIVE_SAMPLES = 600
+
+class FixtureWriter:
+    def __init__(self, pkl_dir, seed=SEED):
+        self.pkl_dir = pkl_dir
+        self.rng = np.random.default_rng(seed)
+        self.index = load_operator_index()
+        self.written = {}
+
+    def values(self, low, high, integer=False, n=SAMPLES):
+        if integer:
+            return self.rng.integers(low, high + 1, n).tolist()
+        return self.rng.uniform(low, high, n).tolist()
+
+    def per_band(self, leaf):
+        """
+        {band: {operator: leaf(band, operator)}} over the plotted operators of every band
+        """
+        return {band: {operator: leaf(band, operator) for operator in self.index.operators(band)}
+                for band in self.index.band_types}
+
+    def per_ca_type(self, band, operator, leaf):
+        return {ca_type: leaf() for ca_type in self.index.allowed_ca_types(band, operator)}
+
+    def dump(self, family, link_direction, data):
+        filename = f'{family}_{link_direction.lower()}.pkl'
+        path = os.path.join(self.pkl_dir, filename)
+        validate(data, family, path)
+        with open(path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.written[filename] = manifest_entry(data, family, path)
+
+    def write_samples(self, link_direction):
+        self.dump('box_ca_tput', link_direction, self.per_band(lambda band, operator: self.per_ca_type(
+            band, operator, lambda: {'Tca': self.values(0, 800), 'Tt': self.values(0, 1200)})))
+        for metric, (low, high, integer) in BOX_METRICS.items():
+            if metric != 'tput':
+                self.dump(f'box_ca_{metric}', link_direction, self.per_band(lambda band, operator: self.per_ca_type(
+                    band, operator, lambda: {'values': self.values(low, high, integer)})))
+            self.dump(f'box_mimo_{metric}', link_direction, self.per_band(
+                lambda band, operator: {layer: self.values(low, high, integer) for layer in (1, 2, 4)}))
+
+        self.dump('bar_ca_layer', link_direction, self.per_band(lambda band, operator: self.per_ca_type(
+            band, operator, lambda: {'values': self.values(1, 4, integer=True)})))
+        self.dump('cdf_tput', link_direction, {band: {mode: self.per_band(
+            lambda band, operator: {'All': self.values(0, 2000)})[band] for mode in TPUT_MODES}
+            for band in self.index.band_types})
+        self.dump('cdf_tput_ratio', link_direction, {band: {mode: self.per_band(
+            lambda band, operator: {'All': self.values(0.5, 12)})[band] for mode in RATIO_MODES}
+            for band in self.index.band_types})
+        self.dump('cdf_bandwidth_ratio', link_direction, self.per_band(
+            lambda band, operator: {'All': self.values(1, 8)}))
+
+    def counts(self, categories):
+        return {category: int(count) for category, count in zip(categories, self.rng.integers(1, 5000, len(categories)))}
+
+    def write_counts(self, link_direction):
+        operators = self.index.all_operators
+        ca_labels = [f'{link_direction} {ca_type}' for ca_type in self.index.ca_types[:4]]
+        self.dump('bar_ca_type_distribution', link_direction, {
+            operator: {band: self.counts(ca_labels) for band in NR_BANDS} for operator in operators})
+        self.dump('bar_mimo_layer_all_cells', link_direction, {
+            operator: {cell: {band: self.counts(LAYERS[link_direction]) for band in NR_BANDS} for cell in CELLS}
+            for operator in operators})
+        self.dump('bar_mimo_mode_all_cells', link_direction, {
+            operator: {cell: {band: self.counts(MIMO_MODES[link_direction]) for band in NR_BANDS} for cell in CELLS}
+            for operator in operators})
+
+    def write(self):
+        os.makedirs(self.pkl_dir, exist_ok=True)
+        for link_direction in LINK_DIRECTIONS:
+            self.write_samples(link_direction)
+            self.write_counts(link_direction)
+        write_manifest(self.pkl_dir, self.written)
+
+def write_drive_logs(logs_dir, seed=SEED):
+    """
+    DL drive logs with the columns read by timeseries_tput.py and geo_heatmap.py
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-03-01 12:00:00')
+    for operator in load_operator_index().all_operators:
+        operator_dir = os.path.join(logs_dir, 'dl', operator)
+        os.makedirs(operator_dir, exist_ok=True)
+        for drive in range(DRIVES):
+            seconds = np.sort(rng.uniform(0, 300, DRIVE_SAMPLES))
+            pd.DataFrame({
+                TIME_COL: (start + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                TPUT_COL: rng.uniform(0, 900, DRIVE_SAMPLES).round(2),
+                LAYERS_COL: rng.integers(1, 5, DRIVE_SAMPLES),
+                NUM_CC_COL: rng.integers(1, 5, DRIVE_SAMPLES),
+                TCA_TBASE_COL: rng.uniform(0.5, 4, DRIVE_SAMPLES).round(3),
+                LAT_COL: 41.85 + np.cumsum(rng.normal(0, 2e-4, DRIVE_SAMPLES)),
+                LON_COL: -87.65 + np.cumsum(rng.normal(0, 2e-4, DRIVE_SAMPLES)),
+            }).to_csv(os.path.join(operator_dir, f'drive{drive + 1}.csv'), index=False)
+
+def write_fixtures(pkl_dir, logs_dir, seed=SEED):
+    FixtureWriter(pkl_dir, seed).write()
+    write_drive_logs(logs_dir, seed)
@@ -0,0 +1,139 @@
+"""
+Figure regression tests: every job of common/jobs.py renders from the seeded
+fixtures (figure_fixtures.py) and each figure is compared against its golden
+PNG in tests/golden/<job>/. Those are previews; one job per kind of figure is
+also rendered the way the paper figures are (tight bounding box, savefig dpi,
+fixed layout, reproducible output) and compared against
+tests/golden/publication/<job>/ with a tighter tolerance, and its PDFs must be
+byte-identical between the tight and fixed layout modes, also when the fixed
+mode cannot measure the figures and falls back to tight layouts. Run with
+--update-goldens to re-render the golden images after an intended change.
+"""
+import os
+import shutil
+import hashlib
+
+import pytest
+from matplotlib.testing.compare import compare_images
+
+from common import layout
+from common.jobs import FIGURE_JOBS, run_job
+from common.output import DEFAULT_PREVIEW_DPI, figure_dir, record_outputs
+from common.variants import Variant
+from conftest import GOLDEN_DIR
+
+# Jobs that write statistics tables rather than figures
+TABLE_JOBS = ('stats_ca_tput',)
+JOBS = [job for job in FIGURE_JOBS if job.name not in TABLE_JOBS]
+# Jobs rendered a second time from band partitions alone (see load_bands in
+# common/data.py), one per way the scripts walk the bands
+PARTITIONED_JOBS = [job for job in JOBS if job.name in ('bar_ca_layer', 'box_ca_tput:TPUT', 'box_mimo_tput:TPUT', 'cdf_tput')]
+
+# Jobs also rendered on the publication path, one per kind of figure. The
+# golden publication images are kept for one operator's figures of the jobs
+# that do not share their drawing code with another job, which keeps them to
+# a few MB; the PDF identity test covers every figure of every job here.
+PUBLICATION_JOBS = [job for job in JOBS if job.name in (
+    'bar_ca_layer', 'box_ca_tput:TPUT', 'box_mimo_tput:TPUT', 'ca_percentage_dl', 'cdf_tput',
+    'cdf_tput_ratio', 'geo_heatmap', 'mimo_layer_dl', 'mimo_mode_ul', 'timeseries_tput')]
+GOLDEN_PUBLICATION_JOBS = [job for job in PUBLICATION_JOBS if job.name not in ('box_mimo_tput:TPUT', 'cdf_tput_ratio')]
+GOLDEN_PUBLICATION_OPERATOR = 'ATT'
+
+def golden_dir(job, kind=''):
+    return os.path.join(GOLDEN_DIR, kind, job.name.replace(':', '-'))
+
+def compare_with_goldens(job, rendered_dir, rendered, expected_dir, tol, request):
+    if request.config.getoption('--update-goldens'):
+        shutil.rmtree(expected_dir, ignore_errors=True)
+        os.makedirs(expected_dir)
+        for name in rendered:
+            shutil.copy(os.path.join(rendered_dir, name), expected_dir)
+        return
+
+    assert os.path.isdir(expected_dir), f"No golden images for {job.name}; run pytest with --update-goldens"
+    assert rendered == sorted(os.listdir(expected_dir))
+    mismatches = []
+    for name in rendered:
+        error = compare_images(os.path.join(expected_dir, name), os.path.join(rendered_dir, name), tol, in_decorator=True)
+        if error:
+            mismatches.append(f"{name}: RMS {error['rms']:.2f} (diff: {error['diff']})")
+    assert not mismatches, f"{len(mismatches)} figure(s) differ from the goldens:\n" + '\n'.join(mismatches)
+
+def render_and_compare(job, pkl_dir, logs_dir, plots_dir, monkeypatch, request):
+    # Preview PNGs: small, and compared pixel by pixel
+    monkeypatch.setenv('PAM_PREVIEW_DPI', str(DEFAULT_PREVIEW_DPI))
+    monkeypatch.delenv('PAM_LAYOUT', raising=False)
+    monkeypatch.delenv('PAM_REPRODUCIBLE', raising=False)
+    variant = Variant('fixtures', pkl_dir, plots_dir, logs_dir, '')
+
+    result = run_job(job, strict=True, variant=variant)
+    rendered_dir = figure_dir(variant.plots_dir)
+    rendered = sorted(result['outputs'])
+    assert rendered, f"{job.name} rendered no figures"
+
+    compare_with_goldens(job, rendered_dir, rendered, golden_dir(job), request.config.getoption('--image-tol'), request)
+
+@pytest.mark.parametrize('job', JOBS, ids=[job.name for job in JOBS])
+def test_figures_match_goldens(job, fixture_dirs, tmp_path, monkeypatch, request):
+    pkl_dir, logs_dir = fixture_dirs
+    render_and_compare(job, pkl_dir, logs_dir, str(tmp_path / 'plots'), monkeypatch, request)
+
+@pytest.mark.parametrize('job', PARTITIONED_JOBS, ids=[job.name for job in PARTITIONED_JOBS])
+def test_partitioned_figures_match_goldens(job, partitioned_fixture_dirs, tmp_path, monkeypatch, request):
+    if request.config.getoption('--update-goldens'):
+        pytest.skip("goldens are written from the whole pickles")
+    pkl_dir, logs_dir = partitioned_fixture_dirs
+    render_and_compare(job, pkl_dir, logs_dir, str(tmp_path / 'plots'), monkeypatch, request)
+
+def render_publication(job, fixture_dirs, plots_dir, monkeypatch, layout, output_format=None):
+    """
+    Render a job as the paper figures are (or as output_format, e.g. 'png');
+    returns the names of the files written
+    """
+    pkl_dir, logs_dir = fixture_dirs
+    monkeypatch.delenv('PAM_PREVIEW_DPI', raising=False)
+    monkeypatch.setenv('PAM_LAYOUT', layout)
+    monkeypatch.setenv('PAM_REPRODUCIBLE', '1')
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    variant = Variant('fixtures', pkl_dir, plots_dir, logs_dir, '')
+    with record_outputs(output_format):
+        result = run_job(job, strict=True, variant=variant)
+    assert result['outputs'], f"{job.name} rendered no figures"
+    return sorted(result['outputs'])
+
+@pytest.mark.parametrize('job', GOLDEN_PUBLICATION_JOBS, ids=[job.name for job in GOLDEN_PUBLICATION_JOBS])
+def test_publication_figures_match_goldens(job, fixture_dirs, tmp_path, monkeypatch, request):
+    plots_dir = str(tmp_path / 'plots')
+    rendered = [name for name in render_publication(job, fixture_dirs, plots_dir, monkeypatch, 'fixed', 'png')
+                if f'_{GOLDEN_PUBLICATION_OPERATOR}_' in name]
+    compare_with_goldens(job, plots_dir, rendered, golden_dir(job, 'publication'),
+                         request.config.getoption('--publication-tol'), request)
+
+def _digests(plots_dir, names):
+    digests = {}
+    for name in names:
+        with open(os.path.join(plots_dir, name), 'rb') as f:
+            digests[name] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+@pytest.mark.parametrize('job', PUBLICATION_JOBS, ids=[job.name for job in PUBLICATION_JOBS])
+def test_fixed_layout_pdfs_are_byte_identical(job, fixture_dirs, tmp_path, monkeypatch):
+    tight_dir, fixed_dir = str(tmp_path / 'tight'), str(tmp_path / 'fixed')
+    tight = render_publication(job, fixture_dirs, tight_dir, monkeypatch, 'tight')
+    fixed = render_publication(job, fixture_dirs, fixed_dir, monkeypatch, 'fixed')
+    assert all(name.endswith('.pdf') for name in fixed)
+    assert tight == fixed
+    assert _digests(tight_dir, tight) == _digests(fixed_dir, fixed)
+
+def test_fixed_layout_falls_back_to_tight(fixture_dirs, tmp_path, monkeypatch):
+    def unmeasurable(fig, renderer):
+        raise AttributeError("'Legend' object has no attribute '_loc'")
+    monkeypatch.setattr(layout, 'signature', unmeasurable)
+    monkeypatch.setattr(layout, '_unsupported', False)
+    job = next(job for job in PUBLICATION_JOBS if job.name == 'mimo_layer_dl')
+    tight_dir, fixed_dir = str(tmp_path / 'tight'), str(tmp_path / 'fixed')
+    tight = render_publication(job, fixture_dirs, tight_dir, monkeypatch, 'tight')
+    fixed = render_publication(job, fixture_dirs, fixed_dir, monkeypatch, 'fixed')
+    assert layout._unsupported
+    assert tight == fixed
+    assert _digests(tight_dir, tight) == _digests(fixed_dir, fixed)
@@ -0,0 +1,86 @@
+"""
+Band partitions of the sample pickles (load_bands in common/data.py): only
+the bands written are listed, stale partitions are not used, partitions alone
+are a present input, and a released band leaves nothing behind that keeps
+its samples alive.
+"""
+import gc
+import os
+import pickle
+import shutil
+import weakref
+
+import pytest
+
+from common import data
+from common.data import PARTITION_INDEX_FILENAME, input_exists, input_signature, load_bands, partition_dir, write_band_partitions
+from common.ecdf import clear_ecdf_cache, get_ecdf
+
+@pytest.fixture
+def cdf_pickle(fixture_dirs, tmp_path):
+    pkl_filename = str(tmp_path / 'cdf_tput_dl.pkl')
+    shutil.copy(os.path.join(fixture_dirs[0], 'cdf_tput_dl.pkl'), pkl_filename)
+    write_band_partitions(pkl_filename)
+    return pkl_filename
+
+@pytest.fixture
+def pickle_cache():
+    data.enable_pickle_cache()
+    yield
+    data._pickle_cache = None
+
+def test_partitions_hold_the_whole_pickle(cdf_pickle):
+    bands = load_bands(cdf_pickle)
+    assert bands.partitions is not None
+    whole = data.load_samples(cdf_pickle)
+    assert list(bands) == list(whole)
+    for band_type in whole:
+        branch = bands[band_type]
+        for mode, operators in whole[band_type].items():
+            for operator, leaf in operators.items():
+                assert (branch[mode][operator]['All'] == leaf['All']).all()
+        bands.release(band_type)
+
+def test_only_written_bands_are_listed(fixture_dirs, tmp_path):
+    with open(os.path.join(fixture_dirs[0], 'box_ca_tput_ul.pkl'), 'rb') as f:
+        whole = pickle.load(f)
+    # No UL mmWave samples at all
+    whole['mmWave'] = {}
+    pkl_filename = str(tmp_path / 'box_ca_tput_ul.pkl')
+    with open(pkl_filename, 'wb') as f:
+        pickle.dump(whole, f)
+    assert list(write_band_partitions(pkl_filename)) == ['Low', 'Mid']
+
+    bands = load_bands(pkl_filename)
+    assert bands.partitions is not None
+    assert list(bands) == ['Low', 'Mid']
+    assert 'mmWave' not in bands
+    assert bands.get('mmWave') is None
+
+def test_stale_partitions_are_not_used(cdf_pickle):
+    stat = os.stat(cdf_pickle)
+    os.utime(cdf_pickle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_bands(cdf_pickle).partitions is None
+
+def test_partitions_alone_are_an_input(cdf_pickle):
+    os.remove(cdf_pickle)
+    assert input_exists(cdf_pickle)
+    index_path = os.path.join(partition_dir(cdf_pickle), PARTITION_INDEX_FILENAME)
+    assert input_signature(cdf_pickle)[0] == os.path.realpath(index_path)
+    assert list(load_bands(cdf_pickle)) == ['Low', 'Mid', 'mmWave']
+
+    os.remove(index_path)
+    assert not input_exists(cdf_pickle)
+    assert input_signature(cdf_pickle) is None
+
+def test_released_band_is_collectable(cdf_pickle, pickle_cache):
+    bands = load_bands(cdf_pickle)
+    leaf = bands['Mid']['Tput_0']['ATT']['All']
+    get_ecdf(('cdf_tput', 'DL', 'Mid', 'ATT', 'Tput_0'), leaf)
+    released = weakref.ref(leaf)
+    del leaf
+
+    bands.release('Mid')
+    clear_ecdf_cache('cdf_tput', 'DL', 'Mid')
+    gc.collect()
+    assert released() is None
@@ -0,0 +1,82 @@
+"""
+Build the CA x MIMO count cube (pkl/ca_mimo_cube.pkl) from per-cell drive logs.
+
+Logs are read from logs/<dl|ul>/<operator>/*.csv[.gz], one row per serving
+cell of a sample, with the columns named in scripts/common/columns.py
+(Cell, Band, Num CCs, MIMO Mode and the DL or UL layer count). With
+PAM_USE_CUBE=1, the CA distribution, MIMO layer/mode and CA layer figures are
+drawn from it instead of their per-family pickles.
+"""
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.columns import BAND_COL, CELL_COL, LAYERS_COL, MIMO_MODE_COL, NUM_CC_COL, UL_LAYERS_COL
+from common.cube import CUBE_AXES, CUBE_FILENAME, MISSING, build_cube, save_cube
+from common.operators import load_operator_index
+from common.paths import logs_root, pkl_root
+from common.timeseries import DEFAULT_CHUNKSIZE, iter_log_chunks
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('build_cube')
+
+LAYER_COLS = {'DL': LAYERS_COL, 'UL': UL_LAYERS_COL}
+
+def cube_records(chunk, operator, direction):
+    """
+    One row per cell record with a column per cube axis
+    """
+    num_cc = pd.to_numeric(chunk[NUM_CC_COL], errors='coerce')
+    ca_type = np.where(num_cc == 1, 'NonCA', num_cc.map(lambda n: f'{int(n)}CA' if np.isfinite(n) else MISSING))
+    layers = pd.to_numeric(chunk[LAYER_COLS[direction]], errors='coerce')
+    records = pd.DataFrame({
+        'operator': operator,
+        'band': chunk[BAND_COL].fillna(MISSING).astype(str),
+        'cell': chunk[CELL_COL].fillna('PCell').astype(str),
+        'ca_type': ca_type,
+        'layer': layers.astype(object).where(layers.notna(), MISSING),
+        'mimo_mode': chunk[MIMO_MODE_COL].fillna(MISSING).astype(str),
+        'direction': direction,
+    })
+    return records[list(CUBE_AXES)]
+
+def iter_records(logs_root, operators, chunksize=DEFAULT_CHUNKSIZE):
+    for direction in ('DL', 'UL'):
+        columns = [CELL_COL, BAND_COL, NUM_CC_COL, LAYER_COLS[direction], MIMO_MODE_COL]
+        for operator in operators:
+            for log_path in sorted(glob.glob(os.path.join(logs_root, direction.lower(), operator, '*.csv*'))):
+                logger.info(f"Reading {os.path.relpath(log_path, logs_root)}")
+                for chunk in iter_log_chunks(log_path, columns, chunksize, parse_time=False):
+                    yield cube_records(chunk, operator, direction)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the CA x MIMO count cube from per-cell drive logs')
+    parser.add_argument('--logs', default=logs_root())
+    parser.add_argument('--output', default=os.path.join(pkl_root(), CUBE_FILENAME))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cube = build_cube(iter_records(args.logs, load_operator_index().all_operators))
+    if cube is None:
+        logger.error(f"No drive logs found under {args.logs}")
+        sys.exit(1)
+    save_cube(cube, args.output)
+    shape = ' x '.join(f'{axis}={len(cube.labels[axis])}' for axis in cube.axes)
+    logger.info(f"Saved {args.output} ({shape}, {int(cube.counts.sum())} records) "
+                f"in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
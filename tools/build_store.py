@@ -0,0 +1,107 @@
+"""
+Build the tagged sample store (pkl/sample_store.pkl) from per-sample drive logs.
+
+DL and UL logs are read in one pass from logs/<dl|ul>/<operator>/*.csv[.gz]
+with the columns named in scripts/common/columns.py (UL logs carry the UL
+throughput, MCS and layer columns). Every sample is tagged with its city and
+device (City / Device columns), date (from TIME_STAMP), route (the log file
+name), link direction, operator, band class (Band), CA type (Num CCs) and
+MIMO layers; per-cell logs contribute their PCell rows only. tools/subset.py
+cuts campaign subsets from the store.
+"""
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.columns import (BAND_COL, CELL_COL, CITY_COL, DEVICE_COL, LAYERS_COL, MCS_COL, NUM_CC_COL, TIME_COL,
+                            TPUT_COL, UL_LAYERS_COL, UL_MCS_COL, UL_TPUT_COL)
+from common.cube import MISSING
+from common.operators import load_operator_index
+from common.paths import logs_root, pkl_root
+from common.store import STORE_FILENAME, STORE_METRICS, STORE_TAGS, build_store, save_store
+from common.timeseries import DEFAULT_CHUNKSIZE, iter_log_chunks
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('build_store')
+
+# Log column holding each store metric, per link direction; metrics not
+# listed use the store column name
+METRIC_COLS = {
+    'DL': {},
+    'UL': {TPUT_COL: UL_TPUT_COL, MCS_COL: UL_MCS_COL, LAYERS_COL: UL_LAYERS_COL},
+}
+
+def route_name(log_path):
+    name = os.path.basename(log_path)
+    for extension in ('.gz', '.bz2', '.xz', '.zip', '.csv'):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    return name
+
+def store_records(chunk, direction, operator, route, band_class):
+    """
+    One row per sample with a column per store tag and metric
+    """
+    # Per-cell logs: the PCell row carries the sample
+    chunk = chunk[chunk[CELL_COL].fillna('PCell') == 'PCell']
+    columns = METRIC_COLS[direction]
+    num_cc = pd.to_numeric(chunk[NUM_CC_COL], errors='coerce')
+    ca_type = np.where(num_cc == 1, 'NonCA', num_cc.map(lambda n: f'{int(n)}CA' if np.isfinite(n) else MISSING))
+    layers = pd.to_numeric(chunk[columns.get(LAYERS_COL, LAYERS_COL)], errors='coerce')
+    records = pd.DataFrame({
+        'city': chunk[CITY_COL].fillna(MISSING).astype(str),
+        'date': chunk[TIME_COL].dt.strftime('%Y-%m-%d'),
+        'device': chunk[DEVICE_COL].fillna(MISSING).astype(str),
+        'route': route,
+        'direction': direction,
+        'operator': operator,
+        'band': chunk[BAND_COL].map(lambda band: band_class(band) or MISSING),
+        'ca_type': ca_type,
+        'layer': layers.map(lambda n: int(n) if np.isfinite(n) and n == int(n) else MISSING),
+    }, index=chunk.index)
+    for metric in STORE_METRICS:
+        records[metric] = chunk[columns.get(metric, metric)]
+    return records[list(STORE_TAGS) + list(STORE_METRICS)]
+
+def iter_records(logs_root, operators, chunksize=DEFAULT_CHUNKSIZE):
+    band_class = load_operator_index().band_class
+    for direction, metric_cols in METRIC_COLS.items():
+        columns = [CELL_COL, BAND_COL, NUM_CC_COL, CITY_COL, DEVICE_COL,
+                   *(metric_cols.get(metric, metric) for metric in STORE_METRICS)]
+        for operator in operators:
+            for log_path in sorted(glob.glob(os.path.join(logs_root, direction.lower(), operator, '*.csv*'))):
+                logger.info(f"Reading {os.path.relpath(log_path, logs_root)}")
+                route = route_name(log_path)
+                for chunk in iter_log_chunks(log_path, columns, chunksize):
+                    yield store_records(chunk, direction, operator, route, band_class)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the tagged sample store from per-sample DL and UL drive logs')
+    parser.add_argument('--logs', default=logs_root())
+    parser.add_argument('--output', default=os.path.join(pkl_root(), STORE_FILENAME))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = build_store(iter_records(args.logs, load_operator_index().all_operators))
+    if store is None:
+        logger.error(f"No drive logs found under {args.logs}")
+        sys.exit(1)
+    save_store(store, args.output)
+    tags = ', '.join(f'{tag}={len(index.labels)}' for tag, index in store.tags.items())
+    logger.info(f"Saved {args.output} ({store.size} samples; {tags}) in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Rewrite the per-sample pickles under pkl/ with typed NumPy leaves.
+
+Each file is validated against its schema first. Every list of samples becomes an int8 or float32 array (see METRIC_DTYPES in
+scripts/common/columns.py), which shrinks the files and lets the loaders skip
+the conversion. Count pickles are left alone. Converted files load the same
+way as the originals.
+"""
+import os
+import sys
+import glob
+import pickle
+import logging
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import is_sample_pickle, load_pickle, pickle_family, sample_dtype, to_typed
+from common.paths import pkl_root
+from common.schema import SCHEMAS, manifest_entry, validate, write_manifest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('convert_pickles')
+
+def convert_pickle(pkl_filename, output=None):
+    """
+    Write the typed copy of one sample pickle and refresh its manifest entry;
+    returns (bytes before, bytes after)
+    """
+    output = output or pkl_filename
+    family = pickle_family(pkl_filename)
+    before = os.path.getsize(pkl_filename)
+    raw = load_pickle(pkl_filename)
+    validate(raw, family, pkl_filename)
+    data = to_typed(raw, sample_dtype(pkl_filename))
+    tmp_path = f'{output}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, output)
+    if family in SCHEMAS:
+        write_manifest(os.path.dirname(os.path.abspath(output)), {os.path.basename(output): manifest_entry(data, family, output)})
+    return before, os.path.getsize(output)
+
+def main():
+    parser = argparse.ArgumentParser(description='Store the sample leaves of pkl/ pickles as typed arrays')
+    parser.add_argument('pickles', nargs='*',
+                        help='Pickles to convert (default: every sample pickle under pkl/)')
+    parser.add_argument('--output-dir', help='Write the converted pickles here instead of in place')
+    args = parser.parse_args()
+
+    pickles = args.pickles or sorted(glob.glob(os.path.join(pkl_root(), '*.pkl')))
+    pickles = [path for path in pickles if is_sample_pickle(path)]
+    if not pickles:
+        logger.warning("No sample pickles to convert")
+        return
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for path in pickles:
+        output = os.path.join(args.output_dir, os.path.basename(path)) if args.output_dir else path
+        before, after = convert_pickle(path, output)
+        logger.info(f"{os.path.basename(path)} ({sample_dtype(path)}): "
+                    f"{before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({before / max(after, 1):.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Export an offline HTML dashboard of the precomputed figure statistics.
+
+    python3 tools/export_dashboard.py
+    python3 tools/export_dashboard.py --pkl-dir pkl/raw --output plots/raw/dashboard.html
+
+One self-contained HTML file (no server, no external scripts) holds, for DL
+and UL:
+- the box statistics of every box of the box_ca_* and box_mimo_* figures,
+- the ECDFs of the cdf_* figures, downsampled to --ecdf-points quantiles,
+- the count tables of the CA type, MIMO layer/mode and CA layer figures
+  (from pkl/ca_mimo_cube.pkl when it has been built, as the figures do).
+Only summaries are embedded, never raw samples, so the file stays small. The
+page filters by figure family, link direction, band, operator and CC count
+in the browser.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.boxes import box_stats
+from common.cube import ca_layer_counts, ca_type_distribution, cube_path, load_cube, mimo_cell_distribution
+from common.data import LINK_DIRECTIONS, input_exists, load_bands, load_counts
+from common.ecdf import ECDF
+from common.operators import load_operator_index
+from common.paths import figure_suffix, pkl_root, plots_root
+from common.schema import SCHEMAS
+from common.summary import box_summary
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('export_dashboard')
+
+TEMPLATE_PATH = os.path.join(REPO_DIR, 'tools', 'dashboard.html')
+DATA_PLACEHOLDER = '__DASHBOARD_DATA__'
+
+BOX_FAMILIES = [family for family in SCHEMAS if family.startswith('box_')]
+ECDF_FAMILIES = ['cdf_tput', 'cdf_tput_ratio', 'cdf_bandwidth_ratio']
+COUNT_FAMILIES = ['bar_ca_type_distribution', 'bar_mimo_layer_all_cells', 'bar_mimo_mode_all_cells', 'bar_ca_layer']
+
+# Significant digits of the exported statistics
+DIGITS = 4
+
+def _number(value):
+    """
+    JSON-safe number rounded to DIGITS significant digits (None for NaN)
+    """
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return float(f'{value:.{DIGITS}g}')
+
+def leaves(data, depth, path=()):
+    """
+    (keys along the nesting, leaf) of every leaf depth levels down
+    """
+    if len(path) == depth:
+        yield path, data
+        return
+    for key, value in data.items():
+        yield from leaves(value, depth, path + (key,))
+
+class Table:
+    """
+    Rows collected as dicts and embedded column-wise ({'columns', 'rows'})
+    """
+    def __init__(self):
+        self.rows = []
+
+    def add(self, **row):
+        self.rows.append(row)
+
+    def to_json(self):
+        columns = list(dict.fromkeys(column for row in self.rows for column in row))
+        return {'columns': columns, 'rows': [[row.get(column) for column in columns] for row in self.rows]}
+
+class DashboardExport:
+    """
+    Summaries of the pickles of one pkl directory, normalised so that every
+    row carries family, direction, band (class), operator and, where the
+    figure splits by CA type, ccs (the number of CCs)
+    """
+    def __init__(self, pkl_dir, ecdf_points=100):
+        self.pkl_dir = pkl_dir
+        self.probabilities = np.linspace(0, 1, ecdf_points + 1)
+        self.index = load_operator_index()
+        self.boxes = Table()
+        self.ecdfs = []
+        self.counts = Table()
+        self.families = {}
+
+    def _path(self, family, link_direction):
+        path = os.path.join(self.pkl_dir, f'{family}_{link_direction.lower()}.pkl')
+        return path if input_exists(path) else None
+
+    def _by_band(self, path, add):
+        # One band in memory at a time (with partitioned pickles)
+        bands = load_bands(path)
+        for band_type in list(bands):
+            add({band_type: bands[band_type]})
+            bands.release(band_type)
+
+    def _ccs(self, ca_type):
+        # 'NonCA' / '2CA', or the 'DL 2CA' labels of the CA type distribution
+        ca_type = str(ca_type).split(' ')[-1]
+        return self.index.ca_to_num.get(ca_type)
+
+    def _labels(self, level_names, keys):
+        labels = dict(zip(level_names, keys))
+        if 'ca_type' in labels:
+            labels['ccs'] = self._ccs(labels['ca_type'])
+        if 'ca_label' in labels:
+            labels['ccs'] = self._ccs(labels['ca_label'])
+        return labels
+
+    def _seen(self, family, link_direction):
+        self.families.setdefault(family, [])
+        if link_direction not in self.families[family]:
+            self.families[family].append(link_direction)
+
+    def add_boxes(self, family, link_direction, data):
+        schema = SCHEMAS[family]
+        names = [level.name for level in schema.levels]
+        for keys, leaf in leaves(data, len(names)):
+            labels = self._labels(names, keys)
+            for series, values in (((field, leaf[field]) for field in schema.fields) if schema.fields else [('values', leaf)]):
+                if not len(values):
+                    continue
+                row = box_summary(box_stats([values])[0])
+                self.boxes.add(family=family, direction=link_direction, series=series, **labels,
+                               **{key: value if key in ('count', 'n_fliers') else _number(value) for key, value in row.items()})
+        self._seen(family, link_direction)
+
+    def add_ecdfs(self, family, link_direction, data):
+        names = [level.name for level in SCHEMAS[family].levels]
+        for keys, leaf in leaves(data, len(names)):
+            ecdf = ECDF(leaf['All'])
+            if not len(ecdf):
+                continue
+            self.ecdfs.append({
+                'family': family, 'direction': link_direction, **self._labels(names, keys),
+                'count': len(ecdf), 'n_dropped': ecdf.n_dropped,
+                # Values at evenly spaced cumulative probabilities 0..1
+                'x': [_number(value) for value in ecdf.quantile(self.probabilities)],
+            })
+        self._seen(family, link_direction)
+
+    def add_counts(self, family, link_direction, data, names):
+        """
+        Count rows of a {level: ... {category: count}} mapping with the level
+        names given; percentages are within the innermost group, as in the
+        bar figures
+        """
+        groups = {}
+        for keys, count in leaves(data, len(names)):
+            groups.setdefault(keys[:-1], []).append((keys[-1], int(count)))
+        for keys, categories in groups.items():
+            total = sum(count for _, count in categories)
+            labels = self._labels(names[:-1], keys)
+            if 'band' in labels and labels['band'] not in self.index.band_types:
+                # Per-NR-band tables: keep the NR band and add its class
+                labels['nr_band'] = labels.pop('band')
+                labels['band'] = self.index.band_class(labels['nr_band'])
+            for category, count in categories:
+                if names[-1] == 'ca_label':
+                    labels['ccs'] = self._ccs(category)
+                self.counts.add(family=family, direction=link_direction, **labels, category=str(category),
+                                count=count, percentage=_number(count / total * 100) if total else 0.0)
+        self._seen(family, link_direction)
+
+    def load(self):
+        for family in BOX_FAMILIES:
+            for link_direction in LINK_DIRECTIONS:
+                path = self._path(family, link_direction)
+                if path:
+                    self._by_band(path, lambda data: self.add_boxes(family, link_direction, data))
+        for family in ECDF_FAMILIES:
+            for link_direction in LINK_DIRECTIONS:
+                path = self._path(family, link_direction)
+                if path:
+                    self._by_band(path, lambda data: self.add_ecdfs(family, link_direction, data))
+
+        cube_filename = cube_path(self.pkl_dir)
+        cube = load_cube(cube_filename) if cube_filename else None
+        for link_direction in LINK_DIRECTIONS:
+            self._load_counts(cube, link_direction)
+
+    def _load_counts(self, cube, link_direction):
+        views = {
+            'bar_ca_type_distribution': (('operator', 'band', 'ca_label'),
+                                         lambda: ca_type_distribution(cube, link_direction)),
+            'bar_mimo_layer_all_cells': (('operator', 'cell', 'band', 'layer'),
+                                         lambda: mimo_cell_distribution(cube, 'layer', link_direction)),
+            'bar_mimo_mode_all_cells': (('operator', 'cell', 'band', 'mimo_mode'),
+                                        lambda: mimo_cell_distribution(cube, 'mimo_mode', link_direction)),
+        }
+        for family, (names, view) in views.items():
+            path = self._path(family, link_direction)
+            if cube is not None:
+                self.add_counts(family, link_direction, view(), names)
+            elif path:
+                self.add_counts(family, link_direction, load_counts(path), names)
+
+        # CA layer figures: layer counts per band class, operator and CA type
+        names = ('band', 'operator', 'ca_type', 'layer')
+        path = self._path('bar_ca_layer', link_direction)
+        if cube is not None:
+            counts = ca_layer_counts(cube, self.index.band_class, link_direction)
+            data = {band: {operator: {ca_type: leaf['counts'] for ca_type, leaf in ca_data.items()}
+                           for operator, ca_data in band_data.items()}
+                    for band, band_data in counts.items()}
+        elif path:
+            data = {}
+
+            def add_layers(band_data):
+                for (band, operator, ca_type), leaf in leaves(band_data, 3):
+                    layers, layer_counts = np.unique(leaf['values'], return_counts=True)
+                    if len(layers):
+                        data.setdefault(band, {}).setdefault(operator, {})[ca_type] = {
+                            _number(layer): int(count) for layer, count in zip(layers, layer_counts)}
+            self._by_band(path, add_layers)
+        else:
+            return
+        self.add_counts('bar_ca_layer', link_direction, data, names)
+
+    def to_json(self, title):
+        return {
+            'title': title,
+            'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'bands': list(self.index.band_types),
+            'operators': list(self.index.all_operators),
+            'ca_types': [[ca_type, self.index.ca_to_num.get(ca_type)] for ca_type in self.index.ca_types],
+            'families': self.families,
+            'ecdf_points': len(self.probabilities) - 1,
+            'boxes': self.boxes.to_json(),
+            'ecdfs': self.ecdfs,
+            'counts': self.counts.to_json(),
+        }
+
+def write_dashboard(payload, output_path):
+    with open(TEMPLATE_PATH, encoding='utf-8') as f:
+        template = f.read()
+    # '</' would end the embedding <script> element early
+    data = json.dumps(payload, separators=(',', ':'), allow_nan=False).replace('</', '<\\/')
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(f'{output_path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(template.replace(DATA_PLACEHOLDER, data))
+    os.replace(f'{output_path}.tmp', output_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an offline HTML dashboard of the figure statistics')
+    parser.add_argument('--pkl-dir', default=pkl_root())
+    parser.add_argument('--output', help='HTML file (default: <plots>/dashboard<suffix>.html)')
+    parser.add_argument('--ecdf-points', type=int, default=100, help='Quantiles kept per ECDF curve')
+    parser.add_argument('--title', default='Figure statistics')
+    args = parser.parse_args()
+    if args.ecdf_points < 1:
+        parser.error('--ecdf-points must be at least 1')
+
+    output = args.output or os.path.join(plots_root(), f'dashboard{figure_suffix()}.html')
+    start = time.perf_counter()
+    export = DashboardExport(args.pkl_dir, args.ecdf_points)
+    export.load()
+    if not export.families:
+        logger.error(f"No figure pickles found in {args.pkl_dir}")
+        sys.exit(1)
+    write_dashboard(export.to_json(args.title), output)
+    logger.info(f"Saved {output} ({len(export.boxes.rows)} boxes, {len(export.ecdfs)} ECDFs, "
+                f"{len(export.counts.rows)} counts; {os.path.getsize(output) / 1024:.0f} KiB) "
+                f"in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Split the per-sample pickles under pkl/ into one partition per band.
+
+Each file is validated against its schema, and each band is written with
+typed leaves to <family>_<dl|ul>/<band>.pkl next to it. The scripts then
+load one band at a time (see load_bands in scripts/common/data.py). A full
+rebuild then peaks at the largest band rather than the whole file. The
+original pickles are left in place. Partitions split from an earlier
+version of their pickle are ignored, so re-run this after regenerating
+data.
+"""
+import os
+import sys
+import glob
+import logging
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import is_sample_pickle, partition_dir, write_band_partitions
+from common.paths import pkl_root
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('partition_pickles')
+
+def main():
+    parser = argparse.ArgumentParser(description='Split the pkl/ sample pickles into per-band partitions')
+    parser.add_argument('pickles', nargs='*',
+                        help='Pickles to partition (default: every sample pickle under pkl/)')
+    parser.add_argument('--output-dir', help='Write the partitions here instead of next to the pickles')
+    args = parser.parse_args()
+
+    pickles = args.pickles or sorted(glob.glob(os.path.join(pkl_root(), '*.pkl')))
+    pickles = [path for path in pickles if is_sample_pickle(path)]
+    if not pickles:
+        logger.warning("No sample pickles to partition")
+        return
+
+    for path in pickles:
+        output = os.path.join(args.output_dir, os.path.basename(path)) if args.output_dir else path
+        sizes = write_band_partitions(path, output)
+        logger.info(f"{os.path.basename(path)} -> {os.path.basename(partition_dir(output))}/: " +
+                    ', '.join(f"{band_type} {size / 1e6:.2f} MB" for band_type, size in sizes.items()))
+
+if __name__ == "__main__":
+    main()
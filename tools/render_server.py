@@ -0,0 +1,195 @@
+"""
+Long-running render server for interactive figure iteration.
+
+Keeps the Python interpreter, the imported plotting scripts, the loaded pkl/
+inputs and the matplotlib style warm between renders. Requests are JSON
+documents POSTed to /render on a local HTTP port:
+
+    {"script": "cdf_tput", "function": "main"}
+
+    {"script": "cdf_tput", "function": "plot_cdf_tput",
+     "data": {"pkl": "cdf_tput_dl.pkl", "band": "Low"},
+     "kwargs": {"band_type": "Low", "tput_modes": ["Tput_0", "Tput_1"]},
+     "format": "png"}
+
+"data" names the pickle (and optionally the band) whose contents are passed as
+the first positional argument of the function. The response lists the written
+figures, which can be fetched back with GET /outputs/<file name>.
+
+Scripts and matplotlibrc are re-read automatically when they change on disk.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import matplotlib
+matplotlib.use('Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import enable_pickle_cache, is_sample_pickle, load_bands, load_counts, load_samples
+from common.output import figure_dir, record_outputs
+from common.paths import pkl_root, plots_root
+from common.report import reset_report, skipped_figures
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('render_server')
+
+CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.svg': 'image/svg+xml',
+}
+
+class RenderContext:
+    """
+    Warm state shared by all requests: imported scripts and the applied style
+    """
+    def __init__(self):
+        self.modules = {}
+        self.style_path = os.path.join(SCRIPTS_DIR, 'matplotlibrc')
+        self.style_mtime = None
+        enable_pickle_cache()
+
+    def refresh_style(self):
+        if not os.path.exists(self.style_path):
+            return
+        mtime = os.stat(self.style_path).st_mtime_ns
+        if mtime != self.style_mtime:
+            matplotlib.rcdefaults()
+            matplotlib.rc_file(self.style_path)
+            self.style_mtime = mtime
+            logger.info(f"Applied style from {self.style_path}")
+
+    def get_module(self, script):
+        script_path = os.path.join(SCRIPTS_DIR, f'{script}.py')
+        if not os.path.exists(script_path):
+            raise ValueError(f"Unknown script: {script}")
+
+        mtime = os.stat(script_path).st_mtime_ns
+        cached = self.modules.get(script)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        if cached is None:
+            module = importlib.import_module(script)
+        else:
+            module = importlib.reload(cached[1])
+            logger.info(f"Reloaded script: {script}")
+        # Importing a script applies its own style; re-apply ours on top
+        self.style_mtime = None
+        self.modules[script] = (mtime, module)
+        return module
+
+    def render(self, request):
+        script = request.get('script')
+        if not script:
+            raise ValueError("Request is missing 'script'")
+        module = self.get_module(script)
+        self.refresh_style()
+
+        function_name = request.get('function', 'main')
+        function = getattr(module, function_name, None)
+        if not callable(function):
+            raise ValueError(f"{script} has no function {function_name}")
+
+        args = []
+        data_spec = request.get('data')
+        if data_spec:
+            pkl_filename = os.path.join(pkl_root(), data_spec['pkl'])
+            band_type = data_spec.get('band')
+            if band_type and is_sample_pickle(pkl_filename):
+                # Only the requested band is read when the pickle is partitioned
+                data = load_bands(pkl_filename)[band_type]
+            else:
+                data = load_samples(pkl_filename) if is_sample_pickle(pkl_filename) else load_counts(pkl_filename)
+                if band_type:
+                    data = data[band_type]
+            args.append(data)
+
+        reset_report()
+        start = time.perf_counter()
+        with record_outputs(request.get('format')) as outputs:
+            function(*args, **request.get('kwargs', {}))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return {
+            'outputs': [os.path.basename(path) for path in outputs],
+            'skipped': [{'figure': figure, 'reason': reason} for figure, reason in skipped_figures()],
+            'elapsed_ms': round(elapsed_ms, 1),
+        }
+
+class RenderHandler(BaseHTTPRequestHandler):
+    context = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_json(404, {'error': f'Unknown endpoint: {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            result = self.context.render(request)
+        except Exception as e:
+            logger.exception("Render failed")
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(200, result)
+
+    def do_GET(self):
+        if not self.path.startswith('/outputs/'):
+            self._send_json(404, {'error': f'Unknown endpoint: {self.path}'})
+            return
+        name = os.path.basename(self.path[len('/outputs/'):])
+        # save_figure() writes previews (PAM_PREVIEW_DPI) to plots/preview/
+        path = os.path.join(figure_dir(plots_root()), name)
+        if not os.path.isfile(path):
+            self._send_json(404, {'error': f'No such output: {name}'})
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream'))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve figure renders from a warm interpreter')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    # Single-threaded on purpose: pyplot state is not thread-safe
+    RenderHandler.context = RenderContext()
+    server = HTTPServer(('127.0.0.1', args.port), RenderHandler)
+    logger.info(f"Render server listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
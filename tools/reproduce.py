@@ -0,0 +1,399 @@
+"""
+Render all figure jobs (see scripts/common/jobs.py) on a process pool and
+write a JSON report of what each job produced, skipped and failed.
+
+    python3 tools/reproduce.py --strict --workers 4
+    python3 tools/reproduce.py --pkl-dir /data/variant_a/pkl --plots-dir /data/variant_a/plots
+    python3 tools/reproduce.py --all-variants
+    python3 tools/reproduce.py --variant with_integrity --variant raw box_ca_tput
+    python3 tools/reproduce.py --preview
+
+Every run gets its own directory (runs/<timestamp>-<pid>/ by default) with
+report.json and one JSON-lines log per job (logs/<variant>/<job>.jsonl),
+captured in the worker and written by the driver, so concurrent runs never
+share a file. The input and output roots default to pkl/, plots/ and logs/ of
+this checkout and are passed to the workers as PAM_PKL_DIR, PAM_PLOTS_DIR and
+PAM_LOGS_DIR (see scripts/common/paths.py).
+
+--variant and --all-variants render the dataset variants of
+scripts/variants.toml (input root, output root and figure name suffix) in
+one run. The workers keep loaded pickles in memory, so a pickle shared by
+several variants is read once per worker, and a job whose inputs are the
+same files with the same suffix in two variants is rendered once and its
+figures copied to the other variant.
+
+Before any job starts, the inputs of every job are checked: a job none of
+whose pickles exist is skipped, and existing pickles get the manifest check
+of scripts/common/schema.py, whose errors fail the job. With --strict (or
+PAM_STRICT=1) a missing input, a schema error or a failed figure stops the run: jobs that have not started
+are cancelled and the ones in flight are left to finish. The exit status is
+non-zero whenever a job failed.
+
+--preview renders every figure as a low-DPI PNG (--preview-dpi, default 40)
+into <plots>/preview/ instead of the publication PDFs, skipping the tight
+bounding box pass, and writes a contact sheet of the thumbnails,
+<plots>/preview/index.html, grouped by job.
+
+--layout fixed (PAM_LAYOUT, see scripts/common/layout.py) computes the
+margins and the tight bounding box once per figure layout in each worker and
+reuses them for every later figure with the same layout, which then saves in
+a single draw; the figures are the same as with the default --layout tight.
+
+--reproducible (PAM_REPRODUCIBLE=1, see scripts/common/output.py) writes
+byte-reproducible figures: no creation date (or the one of SOURCE_DATE_EPOCH)
+and a fixed SVG salt, and a figure that did not change leaves its file, and
+so its hash and mtime, untouched.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import traceback
+import multiprocessing
+from html import escape
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import matplotlib
+matplotlib.use('Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import enable_pickle_cache, input_exists, input_signature, pickle_family
+from common.jobs import FIGURE_JOBS, JobFailed, run_job
+from common.layout import LAYOUT_MODES, layout_mode
+from common.output import DEFAULT_PREVIEW_DPI, figure_dir
+from common.schema import SchemaError, check_header
+from common.variants import DEFAULT_CONFIG_PATH, current_variant, load_variants
+
+# Console logging is set up in main() only: workers re-import this module and
+# their records go to the per-job logs instead of the shared terminal
+logger = logging.getLogger('reproduce')
+
+def preflight(job, variant):
+    """
+    (status, problem) of a job whose inputs keep it from running, or None if
+    it can run. A job with several inputs needs only one of them (a family
+    pickle or the count cube); a job with none of them is 'skipped', one whose
+    pickle fails the manifest check has 'failed'.
+    """
+    if not job.inputs:
+        return None
+    present = [name for name in job.inputs if input_exists(os.path.join(variant.pkl_dir, name))]
+    if not present:
+        return 'skipped', f"input not found: {' or '.join(job.inputs)}"
+    for name in present:
+        path = os.path.join(variant.pkl_dir, name)
+        if not os.path.exists(path):
+            # Band partitions only; each band is validated as it is loaded
+            continue
+        try:
+            check_header(path, pickle_family(name))
+        except SchemaError as e:
+            return 'failed', str(e)
+    return None
+
+def input_key(job, variant):
+    """
+    What the job's figures depend on besides the code: the pickles it reads
+    (resolved through symlinks, with their size and mtime, or those of their
+    band partition index) or, for jobs without pickle inputs, the drive logs
+    directory, plus the figure name suffix. Two variants with the same key
+    get identical figures.
+    """
+    if not job.inputs:
+        return (os.path.realpath(variant.logs_dir), variant.suffix)
+    files = []
+    for name in job.inputs:
+        signature = input_signature(os.path.join(variant.pkl_dir, name))
+        if signature is not None:
+            files.append(signature)
+    return (tuple(files), variant.suffix)
+
+def copy_outputs(outputs, source, variant):
+    """
+    Copy figures rendered for source, and the stats files written next to
+    them, into the plots directory of variant
+    """
+    source_dir, target_dir = figure_dir(source.plots_dir), figure_dir(variant.plots_dir)
+    if os.path.realpath(source_dir) == os.path.realpath(target_dir):
+        return
+    os.makedirs(target_dir, exist_ok=True)
+    for name in outputs:
+        stem = os.path.splitext(name)[0]
+        for path in glob.glob(os.path.join(glob.escape(source_dir), f'{glob.escape(stem)}.*')):
+            if os.path.splitext(os.path.basename(path))[0] == stem:
+                shutil.copy2(path, target_dir)
+
+def error_entry(job, variant, status, error, trace=None, log=None):
+    return {'job': job.name, 'variant': variant.name, 'script': job.script, 'status': status,
+            'error': error, 'traceback': trace, 'log': log or []}
+
+def result_entry(job, variant, result):
+    status = 'failed' if result['failed'] else 'ok'
+    return {'job': job.name, 'variant': variant.name, 'script': job.script, 'status': status,
+            'error': None, 'traceback': None, **result}
+
+def exception_entry(job, variant, e):
+    if isinstance(e, JobFailed):
+        return error_entry(job, variant, 'failed', e.error, e.trace, e.log)
+    # Raised outside the job itself, e.g. a worker that died
+    return error_entry(job, variant, 'failed', f'{type(e).__name__}: {e}', ''.join(traceback.format_exception(type(e), e, e.__traceback__)))
+
+def reused_entry(job, variant, source, source_entry):
+    """
+    Entry of a job whose figures were copied from the same job of source
+    """
+    if source_entry['status'] != 'ok':
+        return error_entry(job, variant, source_entry['status'],
+                           f"shares its inputs with variant {source.name}, where it {source_entry['status']}")
+    return {**source_entry, 'variant': variant.name, 'elapsed_s': 0.0, 'log': [], 'reused_from': source.name}
+
+def run_jobs(jobs, variants, workers, strict):
+    """
+    Run the jobs of every variant on a process pool; returns one report entry
+    per (variant name, job name)
+    """
+    entries = {}
+    runnable = []
+    for variant in variants:
+        for job in jobs:
+            check = preflight(job, variant)
+            if check is None:
+                runnable.append((variant, job))
+                continue
+            status, problem = check
+            # A pickle that fails its schema fails the run either way; only a
+            # missing input is skipped outside strict mode
+            status = 'failed' if strict else status
+            entries[variant.name, job.name] = error_entry(job, variant, status, problem)
+            log = logger.error if status == 'failed' else logger.warning
+            log(f"{job.name} ({variant.name}): {problem}")
+    if strict and entries:
+        for variant, job in runnable:
+            entries[variant.name, job.name] = error_entry(job, variant, 'cancelled', None)
+        return entries
+
+    # Render each job once per distinct set of inputs; the other variants
+    # reading the same files get a copy of the figures
+    renders = {}
+    reused = []
+    for variant, job in runnable:
+        source = renders.setdefault((job.name, input_key(job, variant)), variant)
+        if source is not variant:
+            reused.append((variant, job, source))
+
+    context = multiprocessing.get_context('spawn')
+    # Keep pickles in memory across the jobs of a worker when several
+    # variants may read the same files
+    initializer = enable_pickle_cache if len(variants) > 1 else None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initializer)
+    try:
+        futures = {}
+        for (job_name, _), variant in renders.items():
+            job = next(job for job in jobs if job.name == job_name)
+            futures[pool.submit(run_job, job, strict, variant)] = (variant, job)
+        pending = set(futures)
+        stop = False
+        while pending and not stop:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                variant, job = futures[future]
+                label = f"{job.name} ({variant.name})" if len(variants) > 1 else job.name
+                try:
+                    result = future.result()
+                except Exception as e:
+                    entries[variant.name, job.name] = exception_entry(job, variant, e)
+                    logger.error(f"{label} failed: {entries[variant.name, job.name]['error']}")
+                    stop = stop or strict
+                    continue
+                entries[variant.name, job.name] = result_entry(job, variant, result)
+                if result['failed']:
+                    logger.error(f"{label}: {len(result['failed'])} figure(s) failed")
+                elif not result['outputs']:
+                    logger.warning(f"{label} wrote no figures")
+                else:
+                    logger.info(f"{label}: {len(result['outputs'])} figure(s) in {result['elapsed_s']:.1f}s")
+        if stop:
+            logger.error("Stopping after the first failure, cancelling the remaining jobs")
+            for future in pending:
+                future.cancel()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    # Jobs that were already running when the run stopped have finished by now
+    for future, (variant, job) in futures.items():
+        if (variant.name, job.name) in entries:
+            continue
+        if future.cancelled():
+            entries[variant.name, job.name] = error_entry(job, variant, 'cancelled', None)
+        elif future.exception() is not None:
+            entries[variant.name, job.name] = exception_entry(job, variant, future.exception())
+        else:
+            entries[variant.name, job.name] = result_entry(job, variant, future.result())
+
+    for variant, job, source in reused:
+        source_entry = entries[source.name, job.name]
+        if source_entry['status'] == 'ok':
+            copy_outputs(source_entry['outputs'], source, variant)
+            logger.info(f"{job.name} ({variant.name}): copied {len(source_entry['outputs'])} figure(s) "
+                        f"from {source.name}")
+        entries[variant.name, job.name] = reused_entry(job, variant, source, source_entry)
+    return entries
+
+def write_contact_sheet(variant, job_reports):
+    """
+    index.html next to the preview PNGs of a variant: every thumbnail, linked
+    to its full-size file, grouped by job
+    """
+    preview_dir = figure_dir(variant.plots_dir)
+    sections = []
+    for entry in job_reports:
+        figures = [name for name in entry.get('outputs', []) if os.path.exists(os.path.join(preview_dir, name))]
+        if not figures:
+            continue
+        cells = ''.join(f'<figure><a href="{escape(name)}"><img src="{escape(name)}" loading="lazy"></a>'
+                        f'<figcaption>{escape(os.path.splitext(name)[0])}</figcaption></figure>'
+                        for name in sorted(figures))
+        sections.append(f'<h2>{escape(entry["job"])} <small>{entry["status"]}</small></h2><div class="sheet">{cells}</div>')
+    if not sections:
+        return None
+    path = os.path.join(preview_dir, 'index.html')
+    with open(path, 'w') as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Preview: {escape(variant.name)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1em; }}
+h2 {{ font-size: 1.1em; margin: 1.2em 0 0.4em; }} h2 small {{ color: #888; font-weight: normal; }}
+.sheet {{ display: flex; flex-wrap: wrap; gap: 8px; }}
+figure {{ margin: 0; width: 240px; }} img {{ width: 240px; border: 1px solid #ddd; }}
+figcaption {{ font-size: 11px; word-break: break-all; }}
+</style></head>
+<body><h1>Preview: {escape(variant.name)}</h1>
+{''.join(sections)}
+</body></html>
+""")
+    return path
+
+def write_run(run_dir, report, job_reports):
+    """
+    report.json plus one JSON-lines log per job; the report points at the logs
+    """
+    for entry in job_reports:
+        records = entry.pop('log', [])
+        log_dir = os.path.join(run_dir, 'logs', entry['variant'])
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, f"{entry['job'].replace(':', '-')}.jsonl")
+        with open(log_path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        entry['log'] = os.path.relpath(log_path, run_dir)
+    with open(os.path.join(run_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+def select_variants(args, parser):
+    if not (args.variant or args.all_variants):
+        # Spawned workers inherit the environment, so the roots reach every script
+        for option, variable in ((args.pkl_dir, 'PAM_PKL_DIR'), (args.plots_dir, 'PAM_PLOTS_DIR'), (args.logs_dir, 'PAM_LOGS_DIR')):
+            if option:
+                os.environ[variable] = os.path.abspath(option)
+        return [current_variant()]
+
+    if args.pkl_dir or args.plots_dir or args.logs_dir:
+        parser.error('--pkl-dir, --plots-dir and --logs-dir cannot be combined with variants')
+    try:
+        variants = load_variants(args.variants_config)
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot read variants: {e}")
+    if args.all_variants:
+        return list(variants.values())
+    unknown = [name for name in args.variant if name not in variants]
+    if unknown:
+        parser.error(f"Unknown variant {unknown[0]!r} (expected one of {', '.join(variants)})")
+    return [variants[name] for name in dict.fromkeys(args.variant)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Render all figures and report failures')
+    parser.add_argument('jobs', nargs='*', help='Job or script names to run (default: all)')
+    parser.add_argument('--strict', action='store_true', default=os.environ.get('PAM_STRICT') == '1',
+                        help='Stop at the first missing input or failed figure')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--pkl-dir', help='Input pickles (default: pkl/ or PAM_PKL_DIR)')
+    parser.add_argument('--plots-dir', help='Figure output directory (default: plots/ or PAM_PLOTS_DIR)')
+    parser.add_argument('--logs-dir', help='Drive logs (default: logs/ or PAM_LOGS_DIR)')
+    parser.add_argument('--variant', action='append', default=[], help='Dataset variant to render (repeatable)')
+    parser.add_argument('--all-variants', action='store_true', help='Render every dataset variant')
+    parser.add_argument('--variants-config', default=DEFAULT_CONFIG_PATH, help='Dataset variants (default: scripts/variants.toml)')
+    parser.add_argument('--run-dir', help='Report and per-job logs of this run (default: runs/<timestamp>-<pid>)')
+    parser.add_argument('--preview', action='store_true', help='Render low-DPI PNG previews and a contact sheet instead of PDFs')
+    parser.add_argument('--preview-dpi', type=int, default=DEFAULT_PREVIEW_DPI, help=f'Resolution of the previews (default: {DEFAULT_PREVIEW_DPI})')
+    parser.add_argument('--layout', choices=LAYOUT_MODES, help='Figure layout mode (default: tight or PAM_LAYOUT)')
+    parser.add_argument('--reproducible', action='store_true', default=os.environ.get('PAM_REPRODUCIBLE') == '1',
+                        help='Write byte-reproducible figures and keep unchanged files untouched')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    variants = select_variants(args, parser)
+    if args.preview:
+        if args.preview_dpi < 1:
+            parser.error('--preview-dpi must be at least 1')
+        # Inherited by the spawned workers, read by common.output.save_figure
+        os.environ['PAM_PREVIEW_DPI'] = str(args.preview_dpi)
+    if args.layout:
+        os.environ['PAM_LAYOUT'] = args.layout
+    if args.reproducible:
+        os.environ['PAM_REPRODUCIBLE'] = '1'
+    run_dir = args.run_dir or os.path.join(REPO_DIR, 'runs', f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+    jobs = [job for job in FIGURE_JOBS if not args.jobs or job.name in args.jobs or job.script in args.jobs]
+    if not jobs:
+        logger.error(f"No jobs match {', '.join(args.jobs)}")
+        sys.exit(2)
+
+    for variant in variants:
+        logger.info(f"Rendering {len(jobs)} job(s) of {variant.name}: {variant.pkl_dir} -> {variant.plots_dir}")
+    start = time.perf_counter()
+    entries = run_jobs(jobs, variants, args.workers, args.strict)
+    job_reports = [entries[variant.name, job.name] for variant in variants for job in jobs]
+    counts = {}
+    for entry in job_reports:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    report = {
+        'status': 'failed' if counts.get('failed') else 'ok',
+        'strict': args.strict,
+        'preview_dpi': args.preview_dpi if args.preview else None,
+        'layout': layout_mode(),
+        'reproducible': args.reproducible,
+        'variants': [variant._asdict() for variant in variants],
+        'elapsed_s': round(time.perf_counter() - start, 3),
+        'counts': counts,
+        'jobs': job_reports,
+    }
+    if args.preview:
+        for variant in variants:
+            sheet = write_contact_sheet(variant, [entry for entry in job_reports if entry['variant'] == variant.name])
+            if sheet:
+                logger.info(f"Preview contact sheet: {sheet}")
+    write_run(run_dir, report, job_reports)
+
+    logger.info(f"{', '.join(f'{n} {status}' for status, n in sorted(counts.items()))} "
+                f"in {report['elapsed_s']:.1f}s; report and job logs in {run_dir}")
+    for entry in job_reports:
+        if entry['status'] == 'failed':
+            figures = ', '.join(failure['figure'] for failure in entry.get('failed', []))
+            logger.error(f"  FAILED {entry['job']} ({entry['variant']}): {figures or entry['error']} (log: {entry['log']})")
+    if report['status'] != 'ok':
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
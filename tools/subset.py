@@ -0,0 +1,122 @@
+"""
+Cut a subset of the campaign from the sample store and render it.
+
+    python3 tools/subset.py --where city=Chicago --output-dir pkl/subsets/chicago
+    python3 tools/subset.py --where date=2025-03-01..2025-03-07 --where device=S21,S22 \
+        --output-dir pkl/subsets/week1 --plots-dir plots/subsets/week1
+
+Filters are tag=label, tag=a,b,c or tag=first..last (inclusive, e.g. ISO
+dates) over the tags of scripts/common/store.py; all of them must match.
+The selected samples are written as the DL and UL per-family pickles the
+store can rebuild (see STORE_FAMILIES), with their manifest, so the directory can also
+be rendered later as a dataset variant (scripts/variants.toml). With
+--plots-dir the figures fed by those pickles are rendered right away.
+"""
+import os
+import sys
+import time
+import pickle
+import logging
+import argparse
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import LINK_DIRECTIONS
+from common.jobs import FIGURE_JOBS, JobFailed, run_job
+from common.paths import figure_suffix, logs_root, pkl_root
+from common.schema import manifest_entry, validate, write_manifest
+from common.store import STORE_FAMILIES, STORE_FILENAME, load_store, parse_filters
+from common.variants import Variant
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('subset')
+# fontTools logs every font subsetting step at INFO while PDFs are saved
+logging.getLogger('fontTools').setLevel(logging.WARNING)
+
+def write_subset(store, rows, output_dir):
+    """
+    Write the DL and UL family pickles of the selected rows; returns the
+    written file names
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    direction_codes = store.tags['direction'].codes[rows]
+    written = {}
+    for link_direction in LINK_DIRECTIONS:
+        direction_rows = rows[np.isin(direction_codes, store.codes_of('direction', [link_direction]))]
+        if not len(direction_rows):
+            continue
+        for family in STORE_FAMILIES:
+            data = store.family_data(family, direction_rows)
+            if not data:
+                logger.warning(f"{family} ({link_direction}): no samples in the subset")
+                continue
+            filename = f'{family}_{link_direction.lower()}.pkl'
+            path = os.path.join(output_dir, filename)
+            validate(data, family, path)
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+            written[filename] = manifest_entry(data, family, path)
+    write_manifest(output_dir, written)
+    return list(written)
+
+def render_subset(output_dir, plots_dir, suffix):
+    """
+    Render, in this process, every job that reads one of the subset pickles
+    """
+    variant = Variant('subset', output_dir, plots_dir, logs_root(), suffix)
+    jobs = [job for job in FIGURE_JOBS if any(os.path.exists(os.path.join(output_dir, name)) for name in job.inputs)]
+    failed = 0
+    for job in jobs:
+        try:
+            result = run_job(job, variant=variant)
+        except JobFailed as e:
+            logger.error(f"{job.name} failed: {e.error}")
+            failed += 1
+            continue
+        failed += bool(result['failed'])
+        logger.info(f"{job.name}: {len(result['outputs'])} figure(s) in {result['elapsed_s']:.1f}s")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Write (and render) the pickles of a campaign subset')
+    parser.add_argument('--where', action='append', default=[], metavar='TAG=VALUE',
+                        help='Filter, e.g. city=Chicago, device=S21,S22 or date=2025-03-01..2025-03-07 (repeatable)')
+    parser.add_argument('--store', default=os.path.join(pkl_root(), STORE_FILENAME))
+    parser.add_argument('--output-dir', required=True, help='Directory for the subset pickles')
+    parser.add_argument('--plots-dir', help='Render the subset figures into this directory')
+    parser.add_argument('--suffix', default=figure_suffix(), help='Figure name suffix (default: PAM_FIGURE_SUFFIX)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        logger.error(f"Sample store not found: {args.store} (build it with tools/build_store.py)")
+        sys.exit(1)
+    store = load_store(args.store)
+    try:
+        filters = parse_filters(store, args.where)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    rows = store.select(**filters)
+    logger.info(f"Selected {len(rows)} of {store.size} samples in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if not len(rows):
+        logger.error("No samples match the filters")
+        sys.exit(1)
+
+    written = write_subset(store, rows, args.output_dir)
+    logger.info(f"Wrote {len(written)} pickle(s) to {args.output_dir}")
+    if args.plots_dir and render_subset(os.path.abspath(args.output_dir), os.path.abspath(args.plots_dir), args.suffix):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Check the pickles under pkl/ against the schemas in scripts/common/schema.py.
+
+Every pickle of a known family is loaded and validated; the first problem of
+each file is reported with the path of the offending key or leaf. With
+--write-manifest the manifest read by the loaders before unpickling
+(pkl/manifest.json) is refreshed for the files that pass. Exits non-zero if
+any file fails.
+"""
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import load_pickle, pickle_family
+from common.paths import pkl_root
+from common.schema import SCHEMAS, SchemaError, manifest_entry, validate, write_manifest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('validate_pickles')
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate pkl/ pickles against their family schemas')
+    parser.add_argument('pickles', nargs='*', help='Pickles to check (default: every pickle under pkl/)')
+    parser.add_argument('--write-manifest', action='store_true',
+                        help='Record the files that pass in the manifest next to them')
+    args = parser.parse_args()
+
+    pickles = args.pickles or sorted(glob.glob(os.path.join(pkl_root(), '*.pkl')))
+    failed = 0
+    entries = {}
+    for path in pickles:
+        family = pickle_family(path)
+        if family not in SCHEMAS:
+            logger.info(f"{os.path.basename(path)}: no schema for family {family}, skipping")
+            continue
+        start = time.perf_counter()
+        data = load_pickle(path)
+        try:
+            validate(data, family, path)
+        except SchemaError as e:
+            logger.error(str(e))
+            failed += 1
+            continue
+        logger.info(f"{os.path.basename(path)}: OK ({family} v{SCHEMAS[family].version}, "
+                    f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+        entries.setdefault(os.path.dirname(os.path.abspath(path)), {})[os.path.basename(path)] = \
+            manifest_entry(data, family, path)
+
+    if args.write_manifest:
+        for pkl_dir, dir_entries in entries.items():
+            write_manifest(pkl_dir, dir_entries)
+            logger.info(f"Updated manifest in {pkl_dir} ({len(dir_entries)} file(s))")
+    if failed:
+        logger.error(f"{failed} pickle(s) failed validation")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
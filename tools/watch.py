@@ -0,0 +1,152 @@
+"""
+Watch pkl/, logs/, scripts/ and scripts/matplotlibrc and keep plots/ current.
+
+Each change is mapped to the figure jobs that depend on it (see
+scripts/common/jobs.py): a pickle or one of its band partitions re-renders
+the figures built from it, a drive log re-renders the figures drawn from the
+logs, a script re-renders its own figures, and matplotlibrc, operators.toml,
+variants.toml or scripts/common/ re-render everything. Changes arriving within the debounce
+window are coalesced into a single rebuild, which runs on a process pool.
+"""
+import os
+import sys
+import time
+import glob
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from common.data import LINK_DIRECTIONS, PARTITION_INDEX_FILENAME, partition_dir
+from common.jobs import FIGURE_JOBS, jobs_for_input, jobs_for_logs, jobs_for_script, run_job
+from common.paths import logs_root, pkl_root
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('watch')
+
+# Changes to these re-render every figure
+CONFIG_FILES = ('matplotlibrc', 'operators.toml', 'variants.toml')
+
+def input_pickles():
+    return sorted({name for job in FIGURE_JOBS for name in job.inputs})
+
+def watched_files():
+    patterns = [
+        os.path.join(pkl_root(), '*.pkl'),
+        os.path.join(SCRIPTS_DIR, '*.py'),
+        os.path.join(SCRIPTS_DIR, 'common', '*.py'),
+    ]
+    patterns += [os.path.join(SCRIPTS_DIR, name) for name in CONFIG_FILES]
+    # Band partitions (see load_bands in scripts/common/data.py)
+    for name in input_pickles():
+        partitions = partition_dir(os.path.join(pkl_root(), name))
+        patterns += [os.path.join(partitions, '*.pkl'), os.path.join(partitions, PARTITION_INDEX_FILENAME)]
+    # Drive logs, logs/<dl|ul>/<operator>/*.csv[.gz]
+    patterns += [os.path.join(logs_root(), direction.lower(), '*', '*.csv*') for direction in LINK_DIRECTIONS]
+    files = []
+    for pattern in patterns:
+        files.extend(glob.glob(pattern))
+    return files
+
+def snapshot():
+    mtimes = {}
+    for path in watched_files():
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
+def changed_paths(before, after):
+    return {path for path in set(before) | set(after) if before.get(path) != after.get(path)}
+
+def affected_jobs(paths):
+    """
+    Map changed files to the figure jobs that depend on them
+    """
+    jobs = {}
+    partition_dirs = {partition_dir(os.path.join(pkl_root(), name)): name for name in input_pickles()}
+    logs_dir = os.path.join(logs_root(), '')
+    for path in paths:
+        name = os.path.basename(path)
+        parent = os.path.dirname(path)
+        if name in CONFIG_FILES or os.path.basename(parent) == 'common':
+            matched = FIGURE_JOBS
+        elif parent in partition_dirs:
+            # A band partition of pkl/<family>_<dl|ul>.pkl
+            matched = jobs_for_input(partition_dirs[parent])
+        elif path.startswith(logs_dir):
+            matched = jobs_for_logs()
+        elif name.endswith('.pkl'):
+            matched = jobs_for_input(name)
+        elif name.endswith('.py'):
+            matched = jobs_for_script(os.path.splitext(name)[0])
+        else:
+            matched = []
+        for job in matched:
+            jobs[job.name] = job
+    return list(jobs.values())
+
+def rebuild(jobs, workers):
+    # Fresh spawned workers per rebuild so edited scripts are re-imported
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+                logger.info(f"Rebuilt {job.name} ({', '.join(p + '*' for p in job.outputs)})")
+                for failure in result['failed']:
+                    logger.error(f"  {failure['figure']} failed: {failure['error']}")
+            except Exception as e:
+                logger.error(f"Job {job.name} failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-render affected figures when inputs change')
+    parser.add_argument('--interval', type=float, default=0.5, help='Polling interval in seconds')
+    parser.add_argument('--debounce', type=float, default=1.0, help='Quiet period before a rebuild starts')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    current = snapshot()
+    logger.info(f"Watching {len(current)} files")
+    try:
+        while True:
+            time.sleep(args.interval)
+            latest = snapshot()
+            pending = changed_paths(current, latest)
+            if not pending:
+                continue
+
+            # Coalesce bursts of changes: wait until nothing changed for a full debounce window
+            quiet_since = time.monotonic()
+            while time.monotonic() - quiet_since < args.debounce:
+                time.sleep(args.interval)
+                newer = snapshot()
+                more = changed_paths(latest, newer)
+                if more:
+                    pending |= more
+                    quiet_since = time.monotonic()
+                latest = newer
+            current = latest
+
+            jobs = affected_jobs(pending)
+            logger.info(f"{len(pending)} changed file(s) -> {len(jobs)} job(s): {', '.join(sorted(j.name for j in jobs))}")
+            if jobs:
+                rebuild(jobs, args.workers)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()